@@ -0,0 +1,47 @@
+"""
+Порівняння затримки глибокої сторінки: OFFSET проти keyset-курсора.
+
+    python -m benchmarks.bench_contact_pagination --rows 200000 --page 1000
+"""
+
+import asyncio
+
+from sqlalchemy import select
+
+from benchmarks.common import parser, setup_database, seed_contacts, measure, report
+from src.database.models import Contact
+from src.repository.contacts import ContactRepository
+
+
+async def main(args):
+    engine, session_factory = await setup_database(args.database_url)
+    user = await seed_contacts(session_factory, args.rows)
+    skip = args.page * args.limit
+
+    async with session_factory() as session:
+        repo = ContactRepository(session)
+        # ID останнього контакту попередньої сторінки — те, що клієнт отримав би в курсорі
+        after_id = await session.scalar(
+            select(Contact.id)
+            .where(Contact.user_id == user.id)
+            .order_by(Contact.id)
+            .offset(skip - 1)
+            .limit(1)
+        )
+
+        offset_page = await repo.get_contacts(skip, args.limit, user)
+        cursor_page = await repo.get_contacts_after(after_id, args.limit, user)
+        assert [c.id for c in offset_page] == [c.id for c in cursor_page]
+
+        print(f"rows={args.rows} page={args.page} limit={args.limit}")
+        report("offset", await measure(lambda: repo.get_contacts(skip, args.limit, user), args.repeat))
+        report("cursor", await measure(lambda: repo.get_contacts_after(after_id, args.limit, user), args.repeat))
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    p = parser(__doc__, rows=200_000)
+    p.add_argument("--page", type=int, default=1000)
+    p.add_argument("--limit", type=int, default=100)
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,55 @@
+"""
+Порівняння пошуку контактів: OR з чотирьох ILIKE '%q%' проти індексованого пошуку.
+
+    python -m benchmarks.bench_contact_search --rows 1000000
+"""
+
+import asyncio
+
+from sqlalchemy import select, or_
+
+from benchmarks.common import parser, setup_database, seed_contacts, measure, report
+from src.database.models import Contact
+from src.repository.contacts import ContactRepository
+
+
+def legacy_search(session, query, user, limit):
+    """
+    Попередня реалізація: жоден індекс не обслуговує такий предикат
+    """
+    stmt = select(Contact).filter(
+        Contact.user_id == user.id,
+        or_(
+            Contact.first_name.ilike(f"%{query}%"),
+            Contact.last_name.ilike(f"%{query}%"),
+            Contact.email.ilike(f"%{query}%"),
+            Contact.phone.ilike(f"%{query}%"),
+        ),
+    ).limit(limit)
+    return session.execute(stmt)
+
+
+async def main(args):
+    engine, session_factory = await setup_database(args.database_url)
+    user = await seed_contacts(session_factory, args.rows)
+
+    async with session_factory() as session:
+        repo = ContactRepository(session)
+        print(f"rows={args.rows} query={args.query!r} limit={args.limit}")
+        report(
+            "ilike (legacy)",
+            await measure(lambda: legacy_search(session, args.query, user, args.limit), args.repeat),
+        )
+        report(
+            "indexed",
+            await measure(lambda: repo.search_contacts(args.query, user, limit=args.limit), args.repeat),
+        )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    p = parser(__doc__, rows=1_000_000)
+    p.add_argument("--query", default="First12345")
+    p.add_argument("--limit", type=int, default=20)
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Затримка змін контактів: попередній шаблон (SELECT + зміна + commit + refresh)
+проти одного запиту INSERT/UPDATE/DELETE ... RETURNING.
+
+    python -m benchmarks.bench_contact_writes --rows 10000 --repeat 500
+"""
+
+import asyncio
+import itertools
+from datetime import date
+
+from sqlalchemy import select
+
+from benchmarks.common import parser, setup_database, seed_contacts, measure, report
+from src.database.models import Contact
+from src.repository.contacts import ContactRepository
+from src.schemas.contact import ContactCreate, ContactUpdate
+
+
+class LegacyContactRepository(ContactRepository):
+    """
+    Попередня реалізація змін: два-три звернення до бази на операцію
+    """
+
+    async def _get(self, contact_id, user):
+        result = await self.db.execute(
+            select(Contact).filter_by(id=contact_id, user_id=user.id)
+        )
+        return result.scalar_one_or_none()
+
+    async def create_contact(self, body, user):
+        contact = Contact(**body.model_dump(), user_id=user.id)
+        self.db.add(contact)
+        await self.db.commit()
+        await self.db.refresh(contact)
+        return contact
+
+    async def update_contact(self, contact_id, body, user):
+        contact = await self._get(contact_id, user)
+        if contact:
+            for key, value in body.model_dump(exclude_unset=True).items():
+                setattr(contact, key, value)
+            await self.db.commit()
+            await self.db.refresh(contact)
+        return contact
+
+    async def delete_contact(self, contact_id, user):
+        contact = await self._get(contact_id, user)
+        if contact:
+            await self.db.delete(contact)
+            await self.db.commit()
+        return contact
+
+
+async def run(name, repo, user, ids, counter, repeat):
+    def new_contact():
+        n = next(counter)
+        return ContactCreate(
+            first_name="Bench",
+            last_name=name,
+            email=f"{name}{n}@bench.com",
+            phone=f"+381{n:09d}",
+            birthday=date(1990, 1, 1),
+        )
+
+    update_ids = itertools.cycle(ids)
+    delete_ids = iter(ids)
+    partial = ContactUpdate.model_construct(_fields_set={"first_name"}, first_name="Renamed")
+
+    report(f"{name} create", await measure(lambda: repo.create_contact(new_contact(), user), repeat))
+    report(
+        f"{name} update",
+        await measure(lambda: repo.update_contact(next(update_ids), partial, user), repeat),
+    )
+    report(
+        f"{name} delete",
+        await measure(lambda: repo.delete_contact(next(delete_ids), user), repeat),
+    )
+
+
+async def main(args):
+    engine, session_factory = await setup_database(args.database_url)
+    user = await seed_contacts(session_factory, args.rows)
+    counter = itertools.count()
+
+    async with session_factory() as session:
+        ids = (await session.scalars(select(Contact.id).order_by(Contact.id))).all()
+    half = len(ids) // 2
+    print(f"rows={args.rows} repeat={args.repeat}")
+    for name, cls, chunk in (
+        ("legacy", LegacyContactRepository, ids[:half]),
+        ("returning", ContactRepository, ids[half:]),
+    ):
+        async with session_factory() as session:
+            await run(name, cls(session), user, chunk, counter, args.repeat)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    p = parser(__doc__, rows=10_000)
+    p.set_defaults(repeat=500)
+    asyncio.run(main(p.parse_args()))
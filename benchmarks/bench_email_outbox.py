@@ -0,0 +1,130 @@
+"""
+Пропускна здатність відправлення листів на локальному aiosmtpd: нове з'єднання
+FastMail на кожен лист проти черги email_outbox з пулом SMTP-з'єднань.
+
+    python -m benchmarks.bench_email_outbox --messages 500 --handshake-ms 50
+
+Затримка --handshake-ms додається до EHLO і імітує встановлення з'єднання
+з віддаленим сервером (TCP, TLS, автентифікація).
+"""
+
+import asyncio
+import time
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import FastMail, MessageSchema, MessageType
+
+from benchmarks.common import parser, setup_database
+from src.repository.email_outbox import EmailOutboxRepository
+from src.services.email import OutboxWorker, SMTPPool, conf
+
+
+class Inbox:
+    def __init__(self, handshake: float):
+        self.handshake = handshake
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+async def fastmail_per_message(port: int, messages: int, concurrency: int):
+    """
+    Попередня поведінка: кожен лист — окремий FastMail і нове з'єднання
+    """
+    config = conf.model_copy(
+        update={
+            "MAIL_SERVER": "127.0.0.1",
+            "MAIL_PORT": port,
+            "MAIL_STARTTLS": False,
+            "MAIL_SSL_TLS": False,
+            "USE_CREDENTIALS": False,
+        }
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i: int):
+        message = MessageSchema(
+            subject="Password reset request",
+            recipients=[f"user{i}@example.com"],
+            template_body={"reset_link": "http://bench/password-reset/confirm?token=x"},
+            subtype=MessageType.html,
+        )
+        async with semaphore:
+            await FastMail(config).send_message(message, template_name="reset_password.html")
+
+    await asyncio.gather(*(send(i) for i in range(messages)))
+
+
+async def outbox(port: int, messages: int, pool_size: int, batch_size: int, database_url):
+    """
+    Черга: листи записуються в email_outbox, процес відправляє їх партіями
+    """
+    engine, session_factory = await setup_database(database_url)
+    async with session_factory() as session:
+        repository = EmailOutboxRepository(session)
+        for i in range(messages):
+            await repository.enqueue(
+                "reset_password", f"user{i}@example.com", {"host": "http://bench/"}
+            )
+
+    pool = SMTPPool(pool_size, "127.0.0.1", port)
+    worker = OutboxWorker(
+        session_factory,
+        pool,
+        batch_size=batch_size,
+        lease_seconds=60,
+        max_attempts=3,
+        retry_base=1,
+        retry_max=1,
+    )
+    start = time.perf_counter()
+    while await worker.run_once():
+        pass
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()
+    await pool.close()
+    await engine.dispose()
+    return elapsed, stats
+
+
+async def main(args):
+    inbox = Inbox(args.handshake_ms / 1000)
+    controller = Controller(inbox, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        print(f"messages={args.messages} handshake={args.handshake_ms}ms")
+
+        start = time.perf_counter()
+        await fastmail_per_message(args.port, args.messages, args.pool_size)
+        elapsed = time.perf_counter() - start
+        label = f"FastMail per message, concurrency {args.pool_size}"
+        print(f"{label:<40}{args.messages / elapsed:8.1f} msg/s")
+
+        elapsed, stats = await outbox(
+            args.port, args.messages, args.pool_size, args.batch_size, args.database_url
+        )
+        label = f"outbox, pool of {args.pool_size}"
+        print(
+            f"{label:<40}{args.messages / elapsed:8.1f} msg/s  "
+            f"(connects={stats['connects']}, reuses={stats['reuses']})"
+        )
+    finally:
+        controller.stop()
+    assert inbox.received == 2 * args.messages
+
+
+if __name__ == "__main__":
+    p = parser(__doc__, rows=0)
+    p.add_argument("--messages", type=int, default=500, help="Кількість листів")
+    p.add_argument("--handshake-ms", type=float, default=50, help="Затримка встановлення з'єднання")
+    p.add_argument("--pool-size", type=int, default=4, help="Розмір пулу SMTP-з'єднань")
+    p.add_argument("--batch-size", type=int, default=50, help="Розмір партії черги")
+    p.add_argument("--port", type=int, default=8025, help="Порт aiosmtpd")
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,64 @@
+"""
+Швидкість рендерингу листів: шаблон через fastapi-mail (нове оточення Jinja
+і EmailMessage на кожен лист) проти попередньо скомпільованого EmailRenderer.
+
+    python -m benchmarks.bench_email_render --messages 2000
+"""
+
+import json
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+
+from benchmarks.common import parser
+from src.conf.config import settings
+from src.database.models import EmailOutbox
+from src.services.email import SUBJECTS, conf, render_batch, template_context
+
+
+def fastmail_render(entry: EmailOutbox) -> bytes:
+    """
+    Попередня поведінка: шаблон завантажується й компілюється для кожного листа
+    """
+    context = template_context(entry.template, entry.recipient, json.loads(entry.payload))
+    html = conf.template_engine().get_template(f"{entry.template}.html").render(**context)
+    message = EmailMessage()
+    message["Subject"] = SUBJECTS[entry.template]
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = entry.recipient
+    message.set_content(html, subtype="html")
+    return message.as_bytes()
+
+
+def entries(count: int):
+    templates = ("verify_email", "reset_password")
+    return [
+        EmailOutbox(
+            template=templates[i % 2],
+            recipient=f"user{i}@example.com",
+            payload=json.dumps({"username": f"user{i}", "host": "http://bench/"}),
+        )
+        for i in range(count)
+    ]
+
+
+def main(args):
+    batch = entries(args.messages)
+
+    start = time.perf_counter()
+    for entry in batch:
+        fastmail_render(entry)
+    elapsed = time.perf_counter() - start
+    print(f"{'fastmail template per message':<32}{args.messages / elapsed:10.0f} msg/s")
+
+    start = time.perf_counter()
+    rendered = render_batch(batch)
+    elapsed = time.perf_counter() - start
+    assert not any(isinstance(message, Exception) for message in rendered)
+    print(f"{'precompiled renderer, batch':<32}{args.messages / elapsed:10.0f} msg/s")
+
+
+if __name__ == "__main__":
+    p = parser(__doc__, rows=0)
+    p.add_argument("--messages", type=int, default=2000, help="Кількість листів")
+    main(p.parse_args())
@@ -0,0 +1,100 @@
+"""
+Затримка GET /contacts під час сплеску логінів: bcrypt у циклі подій проти пулу хешування.
+
+    python -m benchmarks.bench_login_burst --logins 32
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import parser, setup_database, seed_contacts, report
+from main import app
+from src.database.db import get_db
+from src.services.auth import Hash, get_current_user
+from src.services.hashing import password_hasher
+
+
+async def contacts_latency(
+    client: httpx.AsyncClient, stop: asyncio.Event, samples: list, interval: float
+):
+    """
+    Запитує сторінку контактів за фіксованим розкладом, поки не буде встановлено stop.
+    Затримка рахується від запланованого часу відправлення, тож блокування
+    циклу подій враховується, навіть якщо запит не встиг стартувати вчасно
+    """
+
+    async def one(scheduled: float):
+        response = await client.get("/contacts/", params={"limit": 20})
+        response.raise_for_status()
+        samples.append(time.perf_counter() - scheduled)
+
+    tasks = []
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        tasks.append(asyncio.create_task(one(scheduled)))
+        scheduled += interval
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+    await asyncio.gather(*tasks)
+
+
+async def login_burst(logins: int, hashed: str, blocking: bool):
+    """
+    Імітує одночасні логіни: кожен перевіряє пароль bcrypt
+    """
+    hasher = Hash()
+
+    async def login():
+        if blocking:
+            # Попередня поведінка: синхронний bcrypt прямо в обробнику
+            hasher.verify_password("password", hashed)
+        else:
+            await hasher.verify_password_async("password", hashed)
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+
+
+async def run(client, logins: int, hashed: str, blocking=None, interval=0.02):
+    samples, stop = [], asyncio.Event()
+    reader = asyncio.create_task(contacts_latency(client, stop, samples, interval))
+    await asyncio.sleep(0.2)
+    if blocking is not None:
+        await login_burst(logins, hashed, blocking)
+    await asyncio.sleep(0.2)
+    stop.set()
+    await reader
+    return samples
+
+
+async def main(args):
+    engine, session_factory = await setup_database(args.database_url)
+    user = await seed_contacts(session_factory, args.rows)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    hashed = Hash().get_password_hash("password")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(
+            f"logins={args.logins} executor={password_hasher.executor_type} "
+            f"workers={password_hasher.workers}"
+        )
+        report("/contacts idle", await run(client, args.logins, hashed))
+        report("/contacts + bcrypt in loop", await run(client, args.logins, hashed, True))
+        report("/contacts + hashing pool", await run(client, args.logins, hashed, False))
+
+    app.dependency_overrides.clear()
+    password_hasher.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    p = parser(__doc__, rows=1_000)
+    p.add_argument("--logins", type=int, default=32, help="Кількість одночасних логінів")
+    asyncio.run(main(p.parse_args()))
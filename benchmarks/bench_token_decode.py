@@ -0,0 +1,71 @@
+"""
+Накладні витрати автентифікації на запит: python-jose jwt.decode проти кешу
+перевірених токенів і повний get_current_user з теплим кешем користувача.
+
+    python -m benchmarks.bench_token_decode --repeat 10000
+"""
+
+import argparse
+import asyncio
+import time
+
+from jose import jwt
+
+from benchmarks.common import report
+from src.conf.config import settings
+from src.database.models import User, UserRole
+from src.repository.users import user_cache_keys, user_l1_cache, user_to_dict
+from src.services.auth import create_access_token, get_current_user, token_codec
+
+
+def sample(fn, repeat: int) -> list:
+    fn()  # прогрів
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def sample_async(fn, repeat: int) -> list:
+    await fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main(args):
+    user = User(
+        id=1,
+        username="bench",
+        email="bench@example.com",
+        hashed_password="x",
+        confirmed=True,
+        role=UserRole.USER,
+    )
+    for key in user_cache_keys(user):
+        user_l1_cache.set(key, user_to_dict(user))
+    token = create_access_token({"sub": user.email}, settings.JWT_EXPIRATION_SECONDS)
+
+    report(
+        "jose jwt.decode",
+        sample(
+            lambda: jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]),
+            args.repeat,
+        ),
+    )
+    report("token_codec.decode (cached)", sample(lambda: token_codec.decode(token), args.repeat))
+    report(
+        "get_current_user (warm)",
+        await sample_async(lambda: get_current_user(token=token, db=None), args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--repeat", type=int, default=10_000, help="Кількість повторів вимірювання")
+    asyncio.run(main(p.parse_args()))
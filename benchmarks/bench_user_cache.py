@@ -0,0 +1,62 @@
+"""
+Визначення користувача: запит до БД проти влучання в Redis і в кеш процесу.
+
+    python -m benchmarks.bench_user_cache --redis-url redis://localhost:6379/15
+
+Потрібен запущений Redis; бенчмарк використовує лише ключі user:* обраної бази.
+"""
+
+import asyncio
+import json
+
+from redis.asyncio import Redis
+
+from benchmarks.common import parser, setup_database, seed_contacts, measure, report
+from src.conf.config import settings
+from src.repository.users import UserRepository, encode_user_record, user_l1_cache
+
+
+async def main(args):
+    engine, session_factory = await setup_database(args.database_url)
+    user = await seed_contacts(session_factory, args.rows)
+    redis = Redis.from_url(args.redis_url, decode_responses=True)
+
+    async with session_factory() as session:
+        repo = UserRepository(session, redis, session_factory)
+
+        async def db_path():
+            return await repo._select_user(username=user.username)
+
+        async def redis_hit():
+            user_l1_cache.clear()
+            return await repo.get_user_by_username(user.username)
+
+        async def l1_hit():
+            return await repo.get_user_by_username(user.username)
+
+        await repo.get_user_by_username(user.username)  # заповнює кеш
+        legacy = json.dumps(
+            {
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "avatar_url": user.avatar_url,
+                "confirmed": user.confirmed,
+            }
+        )
+        print(
+            f"record bytes: legacy x3={len(legacy) * 3} "
+            f"versioned={len(encode_user_record(user, 0.0, 0.0))}"
+        )
+        report("db", await measure(db_path, args.repeat))
+        report("redis hit", await measure(redis_hit, args.repeat))
+        report("l1 hit", await measure(l1_hit, args.repeat))
+
+    await redis.aclose()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    p = parser(__doc__, rows=0)
+    p.add_argument("--redis-url", default=settings.REDIS_URL)
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,102 @@
+"""
+Спільні допоміжні функції для бенчмарків.
+
+Бенчмарки запускаються з кореня проєкту, наприклад::
+
+    python -m benchmarks.bench_contact_pagination --rows 200000
+
+За замовчуванням використовується тимчасова база SQLite; щоб виміряти
+PostgreSQL, передайте ``--database-url postgresql+asyncpg://...``.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database.models import Base, Contact, User
+
+
+def parser(description: str, rows: int) -> argparse.ArgumentParser:
+    """
+    Створює парсер аргументів зі спільними для бенчмарків опціями
+    """
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--database-url", default=None, help="URL бази даних для вимірювань")
+    p.add_argument("--rows", type=int, default=rows, help="Кількість контактів у таблиці")
+    p.add_argument("--repeat", type=int, default=50, help="Кількість повторів вимірювання")
+    return p
+
+
+async def setup_database(url: str = None):
+    """
+    Створює рушій і чисту схему. Повертає (engine, session_factory)
+    """
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="contacts-bench-"), "bench.db")
+        url = f"sqlite+aiosqlite:///{path}"
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def seed_contacts(session_factory, rows: int, batch: int = 10_000) -> User:
+    """
+    Створює користувача та заповнює таблицю контактів синтетичними даними
+    """
+    async with session_factory() as session:
+        user = User(
+            username="bench", email="bench@example.com", hashed_password="x", confirmed=True
+        )
+        session.add(user)
+        await session.commit()
+
+        start = date(1960, 1, 1)
+        for offset in range(0, rows, batch):
+            values = [
+                {
+                    "first_name": f"First{i}",
+                    "last_name": f"Last{i % 997}",
+                    "email": f"contact{i}@example.com",
+                    "phone": f"+380{i:09d}",
+                    "birthday": start + timedelta(days=i % 18000),
+                    "user_id": user.id,
+                }
+                for i in range(offset, min(offset + batch, rows))
+            ]
+            await session.execute(insert(Contact), values)
+            await session.commit()
+        return user
+
+
+async def measure(fn: Callable[[], Awaitable], repeat: int) -> List[float]:
+    """
+    Виконує корутину repeat разів і повертає затримки в секундах
+    """
+    await fn()  # прогрів
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name: str, samples: List[float]) -> None:
+    """
+    Друкує p50/p99 затримки в мілісекундах
+    """
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{name:<32} p50={statistics.median(ordered) * 1000:8.3f} ms  "
+        f"p99={p99 * 1000:8.3f} ms  n={len(ordered)}"
+    )
@@ -1,21 +1,50 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi import Limiter
-from slowapi.middleware import SlowAPIMiddleware
 from src.api import auth, users, contacts, utils
 from src.conf.config import settings
+from src.database.redis import init_redis, close_redis, get_redis
+from src.repository.users import user_cache_invalidator
+from src.services.email import DRAIN_OUTBOX_JOB, outbox_worker
+from src.services.hashing import password_hasher
+from src.services.jobs import job_queue
+from src.services.revocation import revocation_store
+from src.services.upload_file import (
+    BodySizeLimitMiddleware,
+    MULTIPART_OVERHEAD,
+    avatar_processor,
+)
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Спільний пул з'єднань з Redis на весь час роботи додатку
+    await init_redis()
+    # Інвалідації кешу користувачів від інших процесів
+    await user_cache_invalidator.start(get_redis())
+    # Періодична синхронізація фільтра відкликаних токенів
+    await revocation_store.start()
+    # Фонові задачі; листи з email_outbox відправляються і періодично,
+    # щоб підхопити відкладені повтори
+    if settings.EMAIL_OUTBOX_WORKER:
+        job_queue.every(settings.EMAIL_OUTBOX_POLL_SECONDS, DRAIN_OUTBOX_JOB)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await outbox_worker.close()
+    await revocation_store.stop()
+    await user_cache_invalidator.stop()
+    await close_redis()
+    password_hasher.shutdown()
+    avatar_processor.shutdown()
 
-limiter = Limiter(key_func=get_remote_address)
 
 app = FastAPI(
     title=settings.app_title,
     description=settings.app_description,
     version=settings.app_version,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan,
 )
 
 # CORS
@@ -26,21 +55,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
-# Rate limiting
-app.state.limiter = limiter
-app.add_exception_handler(
-    RateLimitExceeded,
-    lambda request, exc: JSONResponse(
-        status_code=429,
-        content={"detail": "Забагато запитів, спробуйте пізніше"},
-    ),
+# Тіло запиту з аватаром обмежується до розбору форми
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={"/users/avatar": settings.AVATAR_MAX_BYTES + MULTIPART_OVERHEAD},
 )
 
-# SlowAPI middleware
-app.add_middleware(SlowAPIMiddleware)
-
 # Routers
 app.include_router(auth.router, prefix="/auth")
 app.include_router(users.router, prefix="/users")
@@ -0,0 +1,48 @@
+"""Add contacts search index (pg_trgm on PostgreSQL, FTS5 on SQLite)
+
+Revision ID: 45a97e72f820
+Revises: f052b7c16217
+Create Date: 2026-10-17 10:02:18.774310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.models import SQLITE_SEARCH_DDL
+
+
+# revision identifiers, used by Alembic.
+revision: str = "45a97e72f820"
+down_revision: Union[str, None] = "f052b7c16217"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_DOCUMENT = "(first_name || ' ' || last_name || ' ' || email || ' ' || phone)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX ix_contacts_search_trgm ON contacts "
+            f"USING gin ({SEARCH_DOCUMENT} gin_trgm_ops)"
+        )
+    elif dialect == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(sa.text(statement))
+        op.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_contacts_search_trgm")
+    elif dialect == "sqlite":
+        for trigger in ("contacts_fts_ai", "contacts_fts_ad", "contacts_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS contacts_fts")
@@ -0,0 +1,28 @@
+"""Add avatar_hash to users
+
+Revision ID: 4c00c4f77c0d
+Revises: 3c8683969a2b
+Create Date: 2026-10-17 18:05:37.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4c00c4f77c0d"
+down_revision: Union[str, None] = "3c8683969a2b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("users", sa.Column("avatar_hash", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "avatar_hash")
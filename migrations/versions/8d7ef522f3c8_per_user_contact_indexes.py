@@ -0,0 +1,39 @@
+"""Add (user_id, id) index and per-user unique email/phone on contacts
+
+Revision ID: 8d7ef522f3c8
+Revises: 45a97e72f820
+Create Date: 2026-10-17 11:20:03.418552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d7ef522f3c8"
+down_revision: Union[str, None] = "45a97e72f820"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_contacts_user_id_id", "contacts", ["user_id", "id"], unique=False)
+    op.create_index(
+        "uq_contacts_user_id_email", "contacts", ["user_id", "email"], unique=True
+    )
+    op.create_index(
+        "uq_contacts_user_id_phone", "contacts", ["user_id", "phone"], unique=True
+    )
+    op.drop_index("ix_contacts_email", table_name="contacts")
+    op.drop_index("ix_contacts_phone", table_name="contacts")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_contacts_phone", "contacts", ["phone"], unique=True)
+    op.create_index("ix_contacts_email", "contacts", ["email"], unique=True)
+    op.drop_index("uq_contacts_user_id_phone", table_name="contacts")
+    op.drop_index("uq_contacts_user_id_email", table_name="contacts")
+    op.drop_index("ix_contacts_user_id_id", table_name="contacts")
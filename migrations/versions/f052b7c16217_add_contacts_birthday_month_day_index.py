@@ -0,0 +1,35 @@
+"""Add month-day expression index for upcoming birthdays
+
+Revision ID: f052b7c16217
+Revises: c878aafd2c19
+Create Date: 2026-10-17 09:12:40.512093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.models import month_day
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f052b7c16217"
+down_revision: Union[str, None] = "c878aafd2c19"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_contacts_user_id_birthday_md",
+        "contacts",
+        [sa.column("user_id"), month_day(sa.column("birthday"))],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_contacts_user_id_birthday_md", table_name="contacts")
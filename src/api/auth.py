@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, BackgroundTasks
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.schemas.user import UserCreate, Token, UserResponse, RequestEmail, UserUpdate
@@ -6,15 +7,22 @@ from src.schemas.user import PasswordResetRequest, PasswordResetConfirm, Refresh
 from src.services.auth import (
     create_access_token,
     create_refresh_token,
-    verify_token,
+    verify_refresh_token,
+    revoke_token,
+    oauth2_scheme,
     Hash,
     get_email_from_token,
     get_current_user,
     get_current_admin_user
 )
-from src.services.auth import create_password_reset_token, verify_password_reset_token
+from src.services.auth import verify_password_reset_token
 from src.services.users import UserService
-from src.services.email import send_email, send_password_reset_email
+from src.services.rate_limit import rate_limit
+from src.services.email import (
+    queue_password_reset_email,
+    queue_verification_email,
+    schedule_outbox_drain,
+)
 from src.database.db import get_db
 from src.database.models import User
 
@@ -23,11 +31,13 @@ router = APIRouter(tags=["auth"])
 
 
 @router.post(
-    "/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED
+    "/register",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit("auth.register"))],
 )
 async def register_user(
     user_data: UserCreate,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
@@ -49,15 +59,18 @@ async def register_user(
             status_code=status.HTTP_409_CONFLICT,
             detail="Користувач з таким іменем вже існує",
         )
-    user_data.password = Hash().get_password_hash(user_data.password)
-    new_user = await user_service.create_user(user_data)
-    background_tasks.add_task(
-        send_email, new_user.email, new_user.username, request.base_url
+    user_data.password = await Hash().get_password_hash_async(user_data.password)
+    # Лист додається в ту саму транзакцію, що й користувач: create_user
+    # фіксує обидва записи разом, тож лист не загубиться між ними
+    await queue_verification_email(
+        db, user_data.email, user_data.username, request.base_url, commit=False
     )
+    new_user = await user_service.create_user(user_data)
+    await schedule_outbox_drain()
     return new_user
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(rate_limit("auth.login"))])
 async def login_user(
     form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ):
@@ -66,7 +79,9 @@ async def login_user(
     """
     user_service = UserService(db)
     user = await user_service.get_user_by_username(form_data.username)
-    if not user or not Hash().verify_password(form_data.password, user.hashed_password):
+    if not user or not await Hash().verify_password_async(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неправильний логін або пароль",
@@ -94,7 +109,7 @@ async def refresh_access_token(body: RefreshTokenRequest):
     Оновлення токену доступу за допомогою refresh токену
     """
     try:
-        email = verify_token(body.refresh_token)
+        email = await verify_refresh_token(body.refresh_token)
     except HTTPException:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
@@ -102,6 +117,22 @@ async def refresh_access_token(body: RefreshTokenRequest):
     return {"access_token": new_access_token, "token_type": "bearer"}
 
 
+@router.post("/logout")
+async def logout_user(
+    body: Optional[RefreshTokenRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Вихід користувача: відкликає поточний токен доступу і, якщо передано,
+    refresh токен цього ж користувача
+    """
+    await revoke_token(token)
+    if body is not None:
+        await revoke_token(body.refresh_token, subject=current_user.email)
+    return {"message": "Ви вийшли з системи"}
+
+
 @router.get("/confirmed_email/{token}")
 async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
@@ -120,10 +151,9 @@ async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     return {"message": "Електронну пошту підтверджено"}
 
 
-@router.post("/request_email")
+@router.post("/request_email", dependencies=[Depends(rate_limit("auth.request_email"))])
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
@@ -136,9 +166,7 @@ async def request_email(
     if user.confirmed:
         return {"message": "Ваша електронна пошта вже підтверджена"}
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, request.base_url
-        )
+        await queue_verification_email(db, user.email, user.username, request.base_url)
     return {"message": "Перевірте свою електронну пошту для підтвердження"}
 
 
@@ -168,10 +196,12 @@ async def update_current_user(
     return updated_user
 
 
-@router.post("/password-reset/request")
+@router.post(
+    "/password-reset/request",
+    dependencies=[Depends(rate_limit("auth.password_reset"))],
+)
 async def request_password_reset(
     body: PasswordResetRequest,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
@@ -190,10 +220,7 @@ async def request_password_reset(
             detail="Електронна пошта не підтверджена",
         )
 
-    reset_token = create_password_reset_token({"sub": user.email})
-    reset_link = str(request.base_url) + f"password-reset/confirm?token={reset_token}"
-
-    background_tasks.add_task(send_password_reset_email, user.email, reset_link)
+    await queue_password_reset_email(db, user.email, request.base_url)
 
     return {
         "message": "Якщо користувач з такою електронною поштою існує, лист буде надіслано."
@@ -220,7 +247,7 @@ async def confirm_password_reset(
     if not user:
         raise HTTPException(status_code=404, detail="Користувач не знайдений")
 
-    hashed_password = Hash().get_password_hash(body.new_password)
+    hashed_password = await Hash().get_password_hash_async(body.new_password)
     await user_service.update_user(user.id, {"hashed_password": hashed_password})
 
     return {"message": "Пароль успішно змінено"}
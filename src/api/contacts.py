@@ -1,55 +1,132 @@
-from typing import List
-from fastapi import APIRouter, Depends, status, HTTPException, Response
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query, Request, status, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.db import (
+    get_read_db,
+    get_read_session_factory,
+    get_session_factory,
+    recent_writes,
+)
 from src.services.auth import get_current_user, get_db
-from src.repository.contacts import ContactRepository
-from src.schemas.contact import ContactCreate, ContactUpdate, ContactResponse
+from src.repository.contacts import (
+    ContactRepository,
+    decode_cursor,
+    encode_cursor,
+    is_unique_violation,
+)
+from src.schemas.contact import (
+    ContactCreate,
+    ContactUpdate,
+    ContactResponse,
+    ContactImportResult,
+    ContactBatchUpdate,
+    ContactBatchDelete,
+    ContactBatchOutcome,
+    ContactBatchResult,
+)
+from src.services.contact_export import EXPORT_MEDIA_TYPES, EXPORT_SERIALIZERS
+from src.services.contact_import import (
+    ContactImporter,
+    CSV_MEDIA_TYPES,
+    NDJSON_MEDIA_TYPES,
+    iter_csv_rows,
+    iter_ndjson_rows,
+)
 from src.database.models import User
+from src.conf.config import settings
 
 router = APIRouter(tags=["contacts"])
 
 
-def get_contact_repo(db: AsyncSession = Depends(get_db)) -> ContactRepository:
+def get_contact_repo(
+    db: AsyncSession = Depends(get_db), read_db: AsyncSession = Depends(get_read_db)
+) -> ContactRepository:
     """
     Функція для отримання репозиторію контактів
     """
-    return ContactRepository(db)
+    return ContactRepository(db, read_db)
 
 
 @router.get("/", response_model=List[ContactResponse])
 async def list_contacts(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     user: User = Depends(get_current_user),
     repo: ContactRepository = Depends(get_contact_repo),
 ):
     """
-    Отримання списку контактів з пагінацією
+    Отримання списку контактів з пагінацією.
+    Якщо переданий cursor, використовується keyset-пагінація замість skip.
+    Курсор наступної сторінки повертається в заголовку X-Next-Cursor
     """
-    return await repo.get_contacts(skip=skip, limit=limit, user=user)
+    if cursor is not None:
+        try:
+            after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Невірний курсор")
+        contacts = await repo.get_contacts_after(after_id, limit=limit, user=user)
+    else:
+        contacts = await repo.get_contacts(skip=skip, limit=limit, user=user)
+
+    if contacts and len(contacts) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(contacts[-1].id)
+    return contacts
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    user: User = Depends(get_current_user),
+    primary_factory=Depends(get_session_factory),
+    read_factory=Depends(get_read_session_factory),
+):
+    """
+    Потоковий експорт усіх контактів користувача у форматі NDJSON або CSV
+    """
+    owner = User(id=user.id)
+    session_factory = primary_factory if recent_writes.is_recent(user.id) else read_factory
+
+    async def body():
+        async with session_factory() as session:
+            contacts = ContactRepository(session).stream_contacts(owner)
+            async for chunk in EXPORT_SERIALIZERS[format](contacts):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'},
+    )
 
 
 @router.get("/search", response_model=List[ContactResponse])
 async def search_contacts(
-    query: str,
+    query: str = Query(..., min_length=1, max_length=100),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
     user: User = Depends(get_current_user),
     repo: ContactRepository = Depends(get_contact_repo),
 ):
     """
-    Пошук контактів за запитом
+    Пошук контактів за запитом, впорядкований за релевантністю
     """
-    return await repo.search_contacts(query=query, user=user)
+    return await repo.search_contacts(query=query, user=user, skip=skip, limit=limit)
 
 
 @router.get("/upcoming-birthdays", response_model=List[ContactResponse])
 async def get_upcoming_birthdays(
+    days: int = Query(settings.BIRTHDAY_WINDOW_DAYS, ge=0, le=366),
     user: User = Depends(get_current_user),
     repo: ContactRepository = Depends(get_contact_repo),
 ):
     """
     Отримання контактів з найближчими днями народження
     """
-    return await repo.get_upcoming_birthdays(user=user)
+    return await repo.get_upcoming_birthdays(user=user, days=days)
 
 
 @router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
@@ -64,6 +141,85 @@ async def create_new_contact(
     return await repo.create_contact(contact, user)
 
 
+@router.post("/import", response_model=ContactImportResult)
+async def import_contacts(
+    request: Request,
+    user: User = Depends(get_current_user),
+    repo: ContactRepository = Depends(get_contact_repo),
+):
+    """
+    Масовий імпорт контактів з потоку CSV (text/csv) або NDJSON (application/x-ndjson).
+    Рядки з помилками або конфліктами не переривають імпорт і повертаються у звіті
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type in CSV_MEDIA_TYPES:
+        rows = iter_csv_rows(request.stream())
+    elif media_type in NDJSON_MEDIA_TYPES:
+        rows = iter_ndjson_rows(request.stream())
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Підтримуються лише text/csv та application/x-ndjson",
+        )
+    importer = ContactImporter(
+        repo,
+        user,
+        settings.CONTACT_IMPORT_BATCH_SIZE,
+        settings.CONTACT_IMPORT_MAX_ISSUES,
+    )
+    return await importer.run(rows)
+
+
+@router.patch("/batch", response_model=ContactBatchResult)
+async def update_contacts_batch(
+    body: ContactBatchUpdate,
+    user: User = Depends(get_current_user),
+    repo: ContactRepository = Depends(get_contact_repo),
+):
+    """
+    Пакетне часткове оновлення контактів в одній транзакції
+    """
+    changes = {item.id: item.changes.model_dump(exclude_unset=True) for item in body.items}
+    try:
+        updated = await repo.update_contacts(changes.items(), user)
+    except IntegrityError as exc:
+        if not is_unique_violation(exc):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Контакт з таким email або телефоном вже існує",
+        )
+    return ContactBatchResult(
+        results=[
+            ContactBatchOutcome(
+                id=contact_id, status="updated" if contact_id in updated else "not_found"
+            )
+            for contact_id in changes
+        ]
+    )
+
+
+@router.delete("/batch", response_model=ContactBatchResult)
+async def delete_contacts_batch(
+    body: ContactBatchDelete,
+    user: User = Depends(get_current_user),
+    repo: ContactRepository = Depends(get_contact_repo),
+):
+    """
+    Пакетне видалення контактів одним запитом
+    """
+    ids = list(dict.fromkeys(body.ids))
+    deleted = await repo.delete_contacts(ids, user)
+    return ContactBatchResult(
+        results=[
+            ContactBatchOutcome(
+                id=contact_id, status="deleted" if contact_id in deleted else "not_found"
+            )
+            for contact_id in ids
+        ]
+    )
+
+
 @router.put("/{contact_id}", response_model=ContactResponse)
 async def update_existing_contact(
     contact_id: int,
@@ -1,7 +1,5 @@
-from fastapi import APIRouter, Depends, Request, UploadFile, File
+from fastapi import APIRouter, Depends, UploadFile, File
 
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
@@ -9,20 +7,20 @@ from src.schemas.user import UserResponse
 from src.conf.config import settings
 from src.services.auth import get_current_user, get_current_admin_user
 from src.services.users import UserService
+from src.services.rate_limit import rate_limit
 from src.services.upload_file import UploadFileService
 
 
 router = APIRouter(tags=["users"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 @router.get(
     "/me",
     response_model=UserResponse,
     description="No more than 10 requests per minute",
+    dependencies=[Depends(rate_limit("users.me"))],
 )
-@limiter.limit("10/minute")
-async def me(request: Request, user: UserResponse = Depends(get_current_user)):
+async def me(user: UserResponse = Depends(get_current_user)):
     """
     Отримання інформації про поточного користувача
     """
@@ -36,13 +34,18 @@ async def update_avatar_user(
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Оновлення аватара користувача (доступно лише адміністраторам)
+    Оновлення аватара користувача (доступно лише адміністраторам).
+    Якщо файл збігається з поточним аватаром, він не завантажується повторно
     """
-    avatar_url = await UploadFileService(
+    avatar_url, avatar_hash = await UploadFileService(
         settings.CLD_NAME, settings.CLD_API_KEY, settings.CLD_API_SECRET
-    ).upload_file(file, user.username)
+    ).upload_file(file, user.username, user.avatar_hash)
+    if avatar_url is None:
+        return user
 
     user_service = UserService(db)
-    updated_user = await user_service.update_avatar_url(user.email, avatar_url)
+    updated_user = await user_service.update_avatar_url(
+        user.email, avatar_url, avatar_hash
+    )
 
     return updated_user
@@ -1,7 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from src.database.db import get_db
+from src.database.db import get_db, get_pool_stats, read_engine
+from src.database.redis import get_redis_pool_stats
+from src.database.models import User
+from src.repository.users import user_cache_stats
+from src.services.auth import get_current_admin_user, token_codec
+from src.services.email import outbox_worker
+from src.services.hashing import password_hasher
+from src.services.jobs import job_queue
+from src.services.rate_limit import rate_limiter
+from src.services.revocation import revocation_store
 
 router = APIRouter(tags=["utils"])
 
@@ -31,3 +40,41 @@ async def healthchecker(db: AsyncSession = Depends(get_db)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error connecting to the database",
         )
+
+
+@router.get(
+    "/metrics",
+    summary="Метрики додатку",
+    description="Повертає стан пулів з'єднань з базою даних і Redis, кешів користувачів і токенів, відкликаних токенів, обмежувача запитів, відправлення листів, черги фонових задач та пулу хешування паролів (лише для адміністратора).",
+)
+async def metrics(current_user: User = Depends(get_current_admin_user)):
+    """
+    Повертає внутрішні метрики додатку для налаштування розмірів пулів.
+    """
+    stats = {"db_pool": get_pool_stats()}
+    if read_engine is not None:
+        stats["db_read_pool"] = get_pool_stats(read_engine)
+    stats["redis_pool"] = get_redis_pool_stats()
+    stats["user_cache"] = user_cache_stats()
+    stats["password_hashing"] = password_hasher.stats()
+    stats["token_cache"] = token_codec.stats()
+    stats["revocation"] = revocation_store.stats()
+    stats["rate_limit"] = rate_limiter.stats()
+    stats["email_outbox"] = outbox_worker.stats()
+    stats["jobs"] = await job_queue.stats()
+    return stats
+
+
+@router.get(
+    "/jobs/{job_id}",
+    summary="Стан фонової задачі",
+    description="Повертає стан задачі з черги фонових задач (лише для адміністратора).",
+)
+async def job_status(job_id: str, current_user: User = Depends(get_current_admin_user)):
+    """
+    Повертає стан фонової задачі за її ID.
+    """
+    job = await job_queue.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задачу не знайдено")
+    return job
@@ -1,5 +1,7 @@
+import os
+from typing import Dict, Literal, Optional
 from pydantic_settings import BaseSettings
-from pydantic import ConfigDict, EmailStr
+from pydantic import ConfigDict, EmailStr, Field
 
 
 class Settings(BaseSettings):
@@ -7,11 +9,54 @@ class Settings(BaseSettings):
     Налаштування додатку
     """
     DATABASE_URL: str
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DATABASE_READ_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
+
     app_title: str = "Contacts API"
     app_description: str = "REST API для управління контактами"
     app_version: str = "1.0.0"
     debug: bool = False
 
+    BIRTHDAY_WINDOW_DAYS: int = 7
+    CONTACT_IMPORT_BATCH_SIZE: int = 1000
+    # Скільки рядків з помилками описується у звіті імпорту; решта лише рахується
+    CONTACT_IMPORT_MAX_ISSUES: int = 100
+    USER_L1_CACHE_TTL: float = 30.0
+    USER_L1_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_SIZE: int = 10000
+    REVOCATION_FILTER_CAPACITY: int = 100000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_SYNC_SECONDS: float = 5.0
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    # Половина ядер: решта лишається циклу подій та іншим обробникам
+    PASSWORD_HASH_WORKERS: int = Field(
+        default_factory=lambda: max(1, (os.cpu_count() or 2) // 2)
+    )
+    # Скільки обчислень може чекати на вільний потік; понад це запит отримує 503
+    PASSWORD_HASH_MAX_QUEUED: int = 64
+    # Ліміти запитів на маршрути: назва політики -> "кількість/період"
+    RATE_LIMITS: Dict[str, str] = {
+        "auth.register": "5/minute",
+        "auth.login": "10/minute",
+        "auth.request_email": "3/minute",
+        "auth.password_reset": "3/minute",
+        "users.me": "10/minute",
+    }
+    RATE_LIMIT_LEASE_SECONDS: float = 1.0
+    RATE_LIMIT_LEASE_DIVISOR: int = 20
+
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_SECONDS: int = 3600
@@ -28,9 +73,43 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool
     VALIDATE_CERTS: bool
 
+    # Черга фонових задач: "memory" — у пам'яті процесу, "redis" — спільна й стійка до перезапусків
+    JOB_QUEUE_BACKEND: Literal["memory", "redis"] = "memory"
+    JOB_QUEUE_WORKERS: int = 4
+    JOB_QUEUE_MAXSIZE: int = 1000
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: float = 1.0
+    # Задача, не завершена за цей час, вважається втраченою і повертається в чергу (Redis)
+    JOB_VISIBILITY_SECONDS: float = 300.0
+    JOB_POLL_SECONDS: float = 0.5
+    JOB_STATUS_TTL: float = 3600.0
+
+    # Фонова відправка листів з черги email_outbox
+    EMAIL_OUTBOX_WORKER: bool = True
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_POLL_SECONDS: float = 2.0
+    EMAIL_OUTBOX_LEASE_SECONDS: float = 120.0
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    EMAIL_RETRY_BASE_SECONDS: float = 5.0
+    EMAIL_RETRY_MAX_SECONDS: float = 900.0
+    SMTP_POOL_SIZE: int = 4
+    SMTP_TIMEOUT: float = 30.0
+    # Довше простояле з'єднання сервер міг уже закрити, тож його не використовуємо
+    SMTP_IDLE_SECONDS: float = 30.0
+
     CLD_NAME: str
     CLD_API_KEY: str
     CLD_API_SECRET: str
+    AVATAR_MAX_BYTES: int = 5 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    # Аватар зменшується локально до квадрата AVATAR_SIZE і перекодовується
+    AVATAR_SIZE: int = 250
+    AVATAR_FORMAT: Literal["webp", "jpeg"] = "webp"
+    AVATAR_QUALITY: int = 85
+    AVATAR_WORKERS: int = 2
+    # Більші зображення відхиляються ще до декодування (захист від "бомб":
+    # кілька мегабайтів PNG можуть розпакуватися в гігабайти пікселів)
+    AVATAR_MAX_PIXELS: int = 4096 * 4096
 
     model_config = ConfigDict(env_file=".env", extra="ignore")
 
@@ -1,14 +1,113 @@
+import time
+import threading
+from fastapi import Depends
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from src.conf.config import settings
+from src.services.metrics import Histogram, LATENCY_BUCKETS
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул з'єднань, який вимірює час очікування на вільне з'єднання
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram(LATENCY_BUCKETS)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
+
+def engine_options(url: str) -> dict:
+    """
+    Формує параметри рушія бази даних з налаштувань додатку
+    :param url: URL бази даних
+    :return: Словник параметрів для create_async_engine
+    """
+    options = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    # SQLite в пам'яті працює лише зі StaticPool, розмір пулу там не має сенсу
+    if make_url(url).database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 AsyncSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=engine,
+    class_=AsyncSession,
 )
 
+# Необов'язкова репліка лише для читання
+read_engine = None
+ReadSessionLocal = None
+if settings.DATABASE_READ_URL:
+    read_engine = create_async_engine(
+        settings.DATABASE_READ_URL, **engine_options(settings.DATABASE_READ_URL)
+    )
+    ReadSessionLocal = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        bind=read_engine,
+        class_=AsyncSession,
+    )
+
+
+class RecentWrites:
+    """
+    Відстежує користувачів, які нещодавно змінювали дані, щоб їхні читання
+    протягом вікна read-your-writes йшли на основну базу, а не на репліку.
+    Стан зберігається в межах процесу
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._deadlines = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int) -> None:
+        """
+        Позначає, що користувач щойно змінив дані
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._deadlines[user_id] = now + self.window
+            if len(self._deadlines) > 10_000:
+                self._deadlines = {k: v for k, v in self._deadlines.items() if v > now}
+
+    def is_recent(self, user_id: int) -> bool:
+        """
+        Чи змінював користувач дані протягом вікна read-your-writes
+        """
+        deadline = self._deadlines.get(user_id)
+        return deadline is not None and deadline > time.monotonic()
+
+
+recent_writes = RecentWrites(settings.READ_YOUR_WRITES_SECONDS)
+
 Base = declarative_base()
 
 
@@ -18,3 +117,55 @@ async def get_db():
             yield session
         finally:
             await session.close()
+
+
+async def get_read_db(db: AsyncSession = Depends(get_db)):
+    """
+    Сесія для читання: репліка, якщо вона налаштована, інакше основна сесія
+    """
+    if ReadSessionLocal is None:
+        yield db
+        return
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def get_session_factory():
+    """
+    Повертає фабрику сесій для відповідей, які читають з бази даних вже після
+    завершення обробника (наприклад, потокових), коли сесія з get_db закрита
+    """
+    return AsyncSessionLocal
+
+
+def get_read_session_factory(primary=Depends(get_session_factory)):
+    """
+    Фабрика сесій для читання: репліка, якщо вона налаштована, інакше основна
+    """
+    return ReadSessionLocal or primary
+
+
+def get_pool_stats(target=None) -> dict:
+    """
+    Повертає поточний стан пулу з'єднань
+    :param target: Рушій, для якого потрібна статистика (за замовчуванням основний)
+    :return: Словник зі статистикою пулу
+    """
+    pool = (target or engine).pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return {"pool": type(pool).__name__}
+
+    stats = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+    }
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        stats["wait_time"] = pool.wait_time.snapshot()
+    return stats
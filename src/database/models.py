@@ -1,15 +1,53 @@
 from typing import Optional, List
 from enum import Enum
-from sqlalchemy import Integer, String, Boolean, ForeignKey, Enum as SqlEnum
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    DateTime,
+    Enum as SqlEnum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    event,
+    func,
+    literal_column,
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from sqlalchemy.sql.sqltypes import Date, Text
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.orm import DeclarativeBase
 from src.database.db import Base
-from datetime import date
+from datetime import date, datetime
 
 class Base(DeclarativeBase):
     pass
 
+
+class month_day(FunctionElement):
+    """
+    Ключ місяць-день дати у вигляді цілого MMDD (наприклад, 229 для 29 лютого).
+    Компілюється в детерміновані вирази для PostgreSQL і SQLite, тому по ньому
+    можна будувати індекси на виразах
+    """
+    type = Integer()
+    name = "month_day"
+    inherit_cache = True
+
+
+@compiles(month_day)
+def _compile_month_day(element, compiler, **kw):
+    arg = compiler.process(element.clauses, **kw)
+    # Дужки обов'язкові, щоб вираз можна було використати в CREATE INDEX
+    return f"(CAST(EXTRACT(MONTH FROM {arg}) * 100 + EXTRACT(DAY FROM {arg}) AS INTEGER))"
+
+
+@compiles(month_day, "sqlite")
+def _compile_month_day_sqlite(element, compiler, **kw):
+    arg = compiler.process(element.clauses, **kw)
+    return f"CAST(strftime('%m%d', {arg}) AS INTEGER)"
+
 class UserRole(str, Enum):
     """
     Перерахування ролей користувача
@@ -31,6 +69,8 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column(String(100), nullable=False)
     confirmed: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     avatar_url: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # SHA-256 завантаженого аватара: повторне завантаження того самого файлу пропускається
+    avatar_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     contacts: Mapped[List["Contact"]] = relationship(
         "Contact", back_populates="user", cascade="all, delete"
@@ -38,6 +78,42 @@ class User(Base):
     role: Mapped[str] = mapped_column(SqlEnum(UserRole), default=UserRole.USER, nullable=False)
 
 
+class EmailStatus(str, Enum):
+    """
+    Стан листа у черзі на відправлення
+    """
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class EmailOutbox(Base):
+    """
+    Лист у черзі на відправлення (outbox). Обробники запитів лише додають
+    запис, а відправляє листи фоновий процес. Час зберігається в UTC
+    """
+    __tablename__ = "email_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    template: Mapped[str] = mapped_column(String(50), nullable=False)
+    recipient: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(
+        String(10), nullable=False, default=EmailStatus.PENDING.value
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now()
+    )
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+# Вибірка наступної партії: листи, що очікують, у порядку готовності
+Index("ix_email_outbox_status_next_attempt_at", EmailOutbox.status, EmailOutbox.next_attempt_at)
+
+
 class Contact(Base):
     """
     Модель контакту для бази даних
@@ -47,10 +123,83 @@ class Contact(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     first_name: Mapped[str] = mapped_column(String(50), nullable=False)
     last_name: Mapped[str] = mapped_column(String(50), nullable=False)
-    email: Mapped[str] = mapped_column(String(100), nullable=False, unique=True, index=True)
-    phone: Mapped[str] = mapped_column(String(30), nullable=False, unique=True, index=True)
+    email: Mapped[str] = mapped_column(String(100), nullable=False)
+    phone: Mapped[str] = mapped_column(String(30), nullable=False)
     birthday: Mapped[date] = mapped_column(Date, nullable=False)
     additional_data: Mapped[str] = mapped_column(Text, nullable=True)
 
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     user: Mapped["User"] = relationship("User", back_populates="contacts")
+
+
+# Усі запити до контактів фільтрують за user_id; (user_id, id) обслуговує
+# пагінацію, а email і телефон унікальні в межах адресної книги користувача
+Index("ix_contacts_user_id_id", Contact.user_id, Contact.id)
+Index("uq_contacts_user_id_email", Contact.user_id, Contact.email, unique=True)
+Index("uq_contacts_user_id_phone", Contact.user_id, Contact.phone, unique=True)
+
+# Індекс на виразі для пошуку найближчих днів народження без повного сканування
+Index("ix_contacts_user_id_birthday_md", Contact.user_id, month_day(Contact.birthday))
+
+
+# Текст, по якому ведеться пошук контактів: ім'я, прізвище, email і телефон.
+# Роздільник — літерал, а не параметр, щоб вираз у запиті збігався з індексом
+_space = literal_column("' '", String)
+search_document = (
+    Contact.first_name + _space + Contact.last_name + _space + Contact.email + _space + Contact.phone
+)
+
+# PostgreSQL: триграмний GIN-індекс обслуговує ILIKE '%q%' та ранжування similarity()
+Index(
+    "ix_contacts_search_trgm",
+    search_document.label("search_document"),
+    postgresql_using="gin",
+    postgresql_ops={"search_document": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+event.listen(
+    Contact.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+# SQLite: зовнішньо-контентна таблиця FTS5 з триграмним токенізатором,
+# яку синхронізують тригери на таблиці contacts
+SQLITE_SEARCH_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+        first_name, last_name, email, phone,
+        content='contacts', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN
+        INSERT INTO contacts_fts(rowid, first_name, last_name, email, phone)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN
+        INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email, phone)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN
+        INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email, phone)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone);
+        INSERT INTO contacts_fts(rowid, first_name, last_name, email, phone)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.phone);
+    END
+    """,
+)
+
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(
+        Contact.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite")
+    )
+event.listen(
+    Contact.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect="sqlite"),
+)
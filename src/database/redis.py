@@ -0,0 +1,73 @@
+from typing import Optional
+from redis.asyncio import BlockingConnectionPool, Redis
+from src.conf.config import settings
+
+redis_pool: Optional[BlockingConnectionPool] = None
+redis_client: Optional[Redis] = None
+
+
+def create_redis_pool() -> BlockingConnectionPool:
+    """
+    Створює пул з'єднань з Redis з налаштувань додатку.
+    Якщо всі з'єднання зайняті, запит чекає на вільне не довше REDIS_POOL_TIMEOUT
+    :return: Пул з'єднань
+    """
+    return BlockingConnectionPool.from_url(
+        settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        decode_responses=True,
+    )
+
+
+async def init_redis() -> None:
+    """
+    Відкриває спільний пул з'єднань з Redis (під час запуску додатку)
+    """
+    global redis_pool
+    if redis_pool is None:
+        redis_pool = create_redis_pool()
+
+
+async def close_redis() -> None:
+    """
+    Закриває всі з'єднання спільного пулу (під час зупинки додатку)
+    """
+    global redis_pool, redis_client
+    redis_client = None
+    if redis_pool is not None:
+        pool, redis_pool = redis_pool, None
+        await pool.aclose()
+
+
+def get_redis() -> Redis:
+    """
+    Повертає спільний клієнт Redis поверх спільного пулу з'єднань.
+    Клієнт бере з'єднання з пулу на кожну команду, тож його можна використовувати
+    з різних запитів одночасно; створення клієнта на кожен запит помітно дороге.
+    Поза життєвим циклом додатку (скрипти, бенчмарки) пул створюється при першому виклику
+    :return: Клієнт Redis
+    """
+    global redis_pool, redis_client
+    if redis_pool is None:
+        redis_pool = create_redis_pool()
+    if redis_client is None or redis_client.connection_pool is not redis_pool:
+        redis_client = Redis(connection_pool=redis_pool)
+    return redis_client
+
+
+def get_redis_pool_stats() -> dict:
+    """
+    Повертає поточний стан пулу з'єднань з Redis
+    :return: Словник зі статистикою пулу
+    """
+    if redis_pool is None:
+        return {"pool": None}
+    return {
+        "pool": type(redis_pool).__name__,
+        "max_connections": redis_pool.max_connections,
+        "in_use": len(redis_pool._in_use_connections),
+        "idle": len(redis_pool._available_connections),
+    }
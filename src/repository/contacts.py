@@ -1,18 +1,145 @@
-from typing import List, Optional
-from sqlalchemy import select, or_
+import base64
+import binascii
+import calendar
+import json
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import (
+    String,
+    cast,
+    literal,
+    select,
+    insert,
+    update,
+    delete,
+    or_,
+    case,
+    func,
+    literal_column,
+    table,
+    column,
+    text,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database.models import Contact, User
+from src.database.db import recent_writes
+from src.database.models import Contact, User, month_day, search_document
 from src.schemas.contact import ContactCreate, ContactUpdate
 from datetime import date, timedelta
 
 
+# Поля, унікальні в межах адресної книги користувача
+UNIQUE_CONTACT_FIELDS = ("email", "phone")
+
+
+def encode_cursor(contact_id: int) -> str:
+    """
+    Кодує позицію сторінки в непрозорий курсор
+    :param contact_id: ID останнього контакту на сторінці
+    :return: Курсор у форматі base64url
+    """
+    raw = json.dumps({"id": contact_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Декодує курсор, отриманий від клієнта
+    :param cursor: Курсор у форматі base64url
+    :return: ID останнього контакту попередньої сторінки
+    :raises ValueError: Якщо курсор пошкоджений
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        contact_id = json.loads(raw)["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(contact_id, int):
+        raise ValueError("Invalid cursor")
+    return contact_id
+
+
+# Таблиця FTS5, що індексує контакти в SQLite (див. SQLITE_SEARCH_DDL)
+contacts_fts = table("contacts_fts", column("rowid"))
+_fts = literal_column("contacts_fts")
+
+# Колонки, які заповнює масовий імпорт
+IMPORT_COLUMNS = (
+    "first_name", "last_name", "email", "phone", "birthday", "additional_data", "user_id"
+)
+
+# Тимчасова таблиця для COPY у PostgreSQL; рядки зникають після кожного commit
+_PG_IMPORT_TABLE_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS contacts_import (
+        first_name VARCHAR(50), last_name VARCHAR(50), email VARCHAR(100),
+        phone VARCHAR(30), birthday DATE, additional_data TEXT, user_id INTEGER
+    ) ON COMMIT DELETE ROWS
+"""
+_PG_IMPORT_INSERT = f"""
+    INSERT INTO contacts ({", ".join(IMPORT_COLUMNS)})
+    SELECT {", ".join(IMPORT_COLUMNS)} FROM contacts_import
+    ON CONFLICT DO NOTHING
+    RETURNING email
+"""
+
+# Триграмний індекс не допомагає для запитів, коротших за три символи
+MIN_INDEXED_QUERY_LENGTH = 3
+
+
+def _like_pattern(query: str) -> str:
+    """
+    Формує шаблон LIKE для пошуку підрядка, екрануючи спецсимволи
+    """
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def birthday_window(today: date, days: int) -> Tuple[int, int, bool]:
+    """
+    Обчислює межі вікна днів народження у вигляді ключів MMDD
+    :param today: Початкова дата вікна
+    :param days: Розмір вікна в днях
+    :return: (початковий ключ, кінцевий ключ, чи переходить вікно через кінець року)
+    """
+    end = today + timedelta(days=days)
+    start_md = today.month * 100 + today.day
+    end_md = end.month * 100 + end.day
+    # У невисокосний рік 29 лютого святкують 28 лютого
+    if (end.month, end.day) == (2, 28) and not calendar.isleap(end.year):
+        end_md = 229
+    wraps = end.year != today.year
+    return start_md, end_md, wraps
+
+
+def is_unique_violation(exc: IntegrityError) -> bool:
+    """
+    Чи спричинена помилка порушенням унікального індексу (а не, наприклад, NOT NULL)
+    """
+    sqlstate = getattr(exc.orig, "sqlstate", None)
+    if sqlstate is not None:
+        return sqlstate == "23505"
+    return "UNIQUE constraint failed" in str(exc.orig)
+
+
 class ContactRepository:
     """
     Клас для роботи з контактами
     """
 
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, read_session: Optional[AsyncSession] = None):
         self.db = session
+        self.read_db = read_session if read_session is not None else session
+
+    def reader(self, user: User) -> AsyncSession:
+        """
+        Сесія для читання даних користувача: репліка, якщо користувач не змінював
+        дані протягом вікна read-your-writes, інакше основна база
+        :param user: Об'єкт користувача
+        :return: Сесія для читання
+        """
+        if self.read_db is self.db or recent_writes.is_recent(user.id):
+            return self.db
+        return self.read_db
 
     async def get_contacts(self, skip: int, limit: int, user: User) -> List[Contact]:
         """
@@ -22,105 +149,298 @@ class ContactRepository:
         :param user: Об'єкт користувача
         :return: Список контактів
         """
-        stmt = select(Contact).filter_by(user_id=user.id).offset(skip).limit(limit)
-        result = await self.db.execute(stmt)
-        return (await result.scalars()).all()
+        stmt = (
+            select(Contact)
+            .filter_by(user_id=user.id)
+            .order_by(Contact.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        result = await self.reader(user).execute(stmt)
+        return result.scalars().all()
+
+    async def get_contacts_after(
+        self, after_id: Optional[int], limit: int, user: User
+    ) -> List[Contact]:
+        """
+        Отримує сторінку контактів користувача за курсором (keyset-пагінація).
+        Використовує предикат (user_id, id) > (user.id, after_id), тож вартість
+        не залежить від глибини сторінки
+        :param after_id: ID останнього контакту попередньої сторінки або None
+        :param limit: Кількість контактів, які потрібно отримати
+        :param user: Об'єкт користувача
+        :return: Список контактів
+        """
+        stmt = select(Contact).where(Contact.user_id == user.id)
+        if after_id is not None:
+            stmt = stmt.where(Contact.id > after_id)
+        stmt = stmt.order_by(Contact.id).limit(limit)
+        result = await self.reader(user).execute(stmt)
+        return result.scalars().all()
+
+    async def stream_contacts(
+        self, user: User, batch_size: int = 500
+    ) -> AsyncIterator[Contact]:
+        """
+        Потоково читає всі контакти користувача через серверний курсор,
+        тож пам'ять не залежить від розміру адресної книги
+        :param user: Об'єкт користувача
+        :param batch_size: Кількість рядків, що завантажуються за раз
+        :return: Асинхронний ітератор контактів
+        """
+        stmt = (
+            select(Contact)
+            .where(Contact.user_id == user.id)
+            .order_by(Contact.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.reader(user).stream_scalars(stmt)
+        async for contact in result:
+            yield contact
 
-    async def get_contact_by_id(self, contact_id: int, user: User) -> Optional[Contact]:
+    async def get_contact_by_id(
+        self, contact_id: int, user: User, primary: bool = False
+    ) -> Optional[Contact]:
         """
         Отримує контакт за ID
         :param contact_id: ID контакту
         :param user: Об'єкт користувача
+        :param primary: Читати з основної бази (для подальшої зміни контакту)
         :return: Об'єкт контакту або None, якщо не знайдено
         """
         stmt = select(Contact).filter_by(id=contact_id, user_id=user.id)
-        result = await self.db.execute(stmt)
-        return await result.scalar_one_or_none()
+        session = self.db if primary else self.reader(user)
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
 
     async def create_contact(self, body: ContactCreate, user: User) -> Contact:
         """
-        Створює новий контакт
+        Створює новий контакт одним запитом INSERT ... RETURNING
         :param body: Дані контакту для створення
         :param user: Об'єкт користувача
         :return: Об'єкт контакту
         """
-        contact = Contact(**body.model_dump(), user_id=user.id)
-        self.db.add(contact)
+        stmt = (
+            insert(Contact)
+            .values(**body.model_dump(), user_id=user.id)
+            .returning(Contact)
+        )
+        result = await self.db.execute(stmt)
+        contact = result.scalar_one()
         await self.db.commit()
-        await self.db.refresh(contact)
+        recent_writes.mark(user.id)
         return contact
 
+    async def bulk_create_contacts(self, rows: List[dict], user: User) -> Set[str]:
+        """
+        Створює пакет контактів одним запитом і фіксує транзакцію.
+        Рядки, що порушують унікальність email або телефону, пропускаються,
+        не перериваючи вставку решти пакета. У PostgreSQL дані завантажуються
+        через COPY у тимчасову таблицю
+        :param rows: Дані контактів (поля ContactCreate)
+        :param user: Об'єкт користувача
+        :return: Множина email створених контактів
+        """
+        if not rows:
+            return set()
+        values = [{**row, "user_id": user.id} for row in rows]
+
+        dialect = self.db.bind.dialect.name
+        if dialect == "postgresql":
+            await self.db.execute(text(_PG_IMPORT_TABLE_DDL))
+            connection = await self.db.connection()
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                "contacts_import",
+                records=[tuple(v[c] for c in IMPORT_COLUMNS) for v in values],
+                columns=IMPORT_COLUMNS,
+            )
+            result = await self.db.execute(text(_PG_IMPORT_INSERT))
+        else:
+            stmt = sqlite_insert(Contact).values(values).on_conflict_do_nothing()
+            result = await self.db.execute(stmt.returning(Contact.email))
+
+        created = set(result.scalars().all())
+        await self.db.commit()
+        recent_writes.mark(user.id)
+        return created
+
     async def update_contact(
         self, contact_id: int, body: ContactUpdate, user: User
     ) -> Optional[Contact]:
         """
-        Оновлює контакт за ID
+        Оновлює контакт за ID одним запитом UPDATE ... RETURNING
         :param contact_id: ID контакту
         :param body: Дані контакту для оновлення
         :param user: Об'єкт користувача
-        :return: Об'єкт контакту або None, якщо не знайдено
+        :return: Об'єкт контакту або None, якщо не знайдено
         """
-        contact = await self.get_contact_by_id(contact_id, user)
+        data = body.model_dump(exclude_unset=True)
+        if not data:
+            return await self.get_contact_by_id(contact_id, user, primary=True)
+
+        stmt = (
+            update(Contact)
+            .where(Contact.id == contact_id, Contact.user_id == user.id)
+            .values(**data)
+            .returning(Contact)
+        )
+        result = await self.db.execute(stmt)
+        contact = result.scalar_one_or_none()
+        await self.db.commit()
         if contact:
-            for key, value in body.model_dump(exclude_unset=True).items():
-                setattr(contact, key, value)
-            await self.db.commit()
-            await self.db.refresh(contact)
+            recent_writes.mark(user.id)
         return contact
 
     async def delete_contact(self, contact_id: int, user: User) -> Optional[Contact]:
         """
-        Видаляє контакт за ID
+        Видаляє контакт за ID одним запитом DELETE ... RETURNING
         :param contact_id: ID контакту
         :param user: Об'єкт користувача
-        :return: Об'єкт контакту або None, якщо не знайдено
+        :return: Об'єкт видаленого контакту або None, якщо не знайдено
         """
-        contact = await self.get_contact_by_id(contact_id, user)
+        stmt = (
+            delete(Contact)
+            .where(Contact.id == contact_id, Contact.user_id == user.id)
+            .returning(Contact)
+        )
+        result = await self.db.execute(stmt)
+        contact = result.scalar_one_or_none()
+        await self.db.commit()
         if contact:
-            await self.db.delete(contact)
-            await self.db.commit()
+            recent_writes.mark(user.id)
         return contact
 
-    async def search_contacts(self, query: str, user: User) -> List[Contact]:
+    async def update_contacts(
+        self, changes: Iterable[Tuple[int, dict]], user: User
+    ) -> Set[int]:
         """
-        Шукає контакти за запитом
-        :param query: Запит для пошуку
+        Оновлює кілька контактів в одній транзакції. Контакти з однаковим набором
+        змін оновлюються одним запитом UPDATE ... WHERE id IN (...).
+        Якщо email або телефон змінюється в кількох контактах, ці поля спершу
+        отримують тимчасові значення, тож обмін ними між контактами пакета
+        не порушує унікальність на проміжному кроці
+        :param changes: Пари (ID контакту, словник змін)
         :param user: Об'єкт користувача
-        :return: Список контактів
+        :return: Множина ID оновлених контактів
+        :raises IntegrityError: Якщо зміни порушують унікальність email або телефону
         """
-        stmt = select(Contact).filter(
-            Contact.user_id == user.id,
-            or_(
-                Contact.first_name.ilike(f"%{query}%"),
-                Contact.last_name.ilike(f"%{query}%"),
-                Contact.email.ilike(f"%{query}%"),
-                Contact.phone.ilike(f"%{query}%"),
-            ),
+        changes = list(changes)
+        groups: Dict[str, Tuple[dict, List[int]]] = {}
+        for contact_id, data in changes:
+            key = json.dumps(data, sort_keys=True, default=str)
+            groups.setdefault(key, (data, []))[1].append(contact_id)
+
+        updated = set()
+        try:
+            for field in UNIQUE_CONTACT_FIELDS:
+                ids = [contact_id for contact_id, data in changes if field in data]
+                if len(ids) < 2:
+                    continue
+                # "~<id>" не є ні email, ні телефоном і унікальне для кожного контакту
+                stmt = (
+                    update(Contact)
+                    .where(Contact.user_id == user.id, Contact.id.in_(ids))
+                    .values({field: literal("~") + cast(Contact.id, String)})
+                    .execution_options(synchronize_session=False)
+                )
+                await self.db.execute(stmt)
+            for data, ids in groups.values():
+                stmt = (
+                    update(Contact)
+                    .where(Contact.user_id == user.id, Contact.id.in_(ids))
+                    .values(**data)
+                    .returning(Contact.id)
+                    .execution_options(synchronize_session=False)
+                )
+                result = await self.db.execute(stmt)
+                updated.update(result.scalars().all())
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            raise
+        if updated:
+            recent_writes.mark(user.id)
+        return updated
+
+    async def delete_contacts(self, ids: Iterable[int], user: User) -> Set[int]:
+        """
+        Видаляє кілька контактів одним запитом DELETE ... WHERE id IN (...)
+        :param ids: ID контактів
+        :param user: Об'єкт користувача
+        :return: Множина ID видалених контактів
+        """
+        stmt = (
+            delete(Contact)
+            .where(Contact.user_id == user.id, Contact.id.in_(list(ids)))
+            .returning(Contact.id)
+            .execution_options(synchronize_session=False)
         )
         result = await self.db.execute(stmt)
-        return (await result.scalars()).all()
+        deleted = set(result.scalars().all())
+        await self.db.commit()
+        if deleted:
+            recent_writes.mark(user.id)
+        return deleted
 
-    async def get_upcoming_birthdays(self, user: User) -> List[Contact]:
+    async def search_contacts(
+        self, query: str, user: User, skip: int = 0, limit: int = 20
+    ) -> List[Contact]:
         """
-        Отримує контакти з найближчими днями народження
+        Шукає контакти за ім'ям, прізвищем, email або телефоном.
+        У PostgreSQL використовує триграмний індекс (pg_trgm), у SQLite — FTS5;
+        результати впорядковані за релевантністю
+        :param query: Запит для пошуку
         :param user: Об'єкт користувача
-        :return: Список контактів з найближчими днями народження
+        :param skip: Кількість результатів, які потрібно пропустити
+        :param limit: Максимальна кількість результатів
+        :return: Список контактів
         """
-        today = date.today()
-        end_date = today + timedelta(days=7)
+        session = self.reader(user)
+        dialect = session.bind.dialect.name
+        indexed = len(query) >= MIN_INDEXED_QUERY_LENGTH
 
         stmt = select(Contact).where(Contact.user_id == user.id)
-        result = await self.db.execute(stmt)
-        contacts = (await result.scalars()).all()
-
-        upcoming_contacts = []
-        for contact in contacts:
-            if contact.birthday:
-                try:
-                    bd_this_year = contact.birthday.replace(year=today.year)
-                except ValueError:
-                    continue
-                if today <= bd_this_year <= end_date:
-                    upcoming_contacts.append(contact)
+        if dialect == "sqlite" and indexed:
+            phrase = '"' + query.replace('"', '""') + '"'
+            stmt = (
+                stmt.join(contacts_fts, contacts_fts.c.rowid == Contact.id)
+                .where(_fts.match(phrase))
+                .order_by(func.bm25(_fts), Contact.id)
+            )
+        elif dialect == "postgresql":
+            stmt = stmt.where(
+                search_document.ilike(_like_pattern(query), escape="\\")
+            ).order_by(func.word_similarity(query, search_document).desc(), Contact.id)
+        else:
+            stmt = stmt.where(
+                search_document.ilike(_like_pattern(query), escape="\\")
+            ).order_by(Contact.id)
+
+        result = await session.execute(stmt.offset(skip).limit(limit))
+        return result.scalars().all()
 
-        return upcoming_contacts
+    async def get_upcoming_birthdays(self, user: User, days: int = 7) -> List[Contact]:
+        """
+        Отримує контакти з найближчими днями народження.
+        Фільтрація виконується в базі даних по індексованому ключу місяць-день,
+        з урахуванням переходу через кінець року та 29 лютого
+        :param user: Об'єкт користувача
+        :param days: Розмір вікна в днях, починаючи з сьогодні
+        :return: Список контактів, відсортований за датою найближчого дня народження
+        """
+        start_md, end_md, wraps = birthday_window(date.today(), days)
+        key = month_day(Contact.birthday)
+
+        if wraps:
+            in_window = or_(key >= start_md, key <= end_md)
+        else:
+            in_window = key.between(start_md, end_md)
+
+        stmt = (
+            select(Contact)
+            .where(Contact.user_id == user.id, in_window)
+            .order_by(case((key >= start_md, 0), else_=1), key, Contact.id)
+        )
+        result = await self.reader(user).execute(stmt)
+        return result.scalars().all()
@@ -0,0 +1,109 @@
+import json
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.models import EmailOutbox, EmailStatus
+
+
+def utcnow() -> datetime:
+    """
+    Поточний час UTC без часового поясу, як він зберігається в email_outbox
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class EmailOutboxRepository:
+    """
+    Репозиторій черги листів на відправлення
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.db = session
+
+    async def enqueue(
+        self, template: str, recipient: str, payload: dict, commit: bool = True
+    ) -> EmailOutbox:
+        """
+        Додає лист у чергу
+        :param template: Тип листа (назва шаблону)
+        :param recipient: Адреса отримувача
+        :param payload: Дані для шаблону
+        :param commit: False — лише додати запис у сесію, щоб він зберігся
+            в одній транзакції зі змінами, які зафіксує викликач
+        :return: Запис черги
+        """
+        now = utcnow()
+        entry = EmailOutbox(
+            template=template,
+            recipient=recipient,
+            payload=json.dumps(payload),
+            status=EmailStatus.PENDING.value,
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+        )
+        self.db.add(entry)
+        if commit:
+            await self.db.commit()
+        return entry
+
+    async def claim_batch(
+        self, limit: int, now: datetime, lease_until: datetime
+    ) -> List[EmailOutbox]:
+        """
+        Забирає партію готових до відправлення листів. Листи отримують оренду до
+        lease_until: якщо процес впаде, не відправивши їх, вони повернуться в
+        чергу після її закінчення. У PostgreSQL рядки, які вже забирає інший
+        процес, пропускаються (SKIP LOCKED)
+        :param limit: Максимальний розмір партії
+        :param now: Поточний час (UTC)
+        :param lease_until: Час закінчення оренди (UTC)
+        :return: Список листів
+        """
+        stmt = (
+            select(EmailOutbox)
+            .where(
+                EmailOutbox.status == EmailStatus.PENDING.value,
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        entries = list((await self.db.execute(stmt)).scalars().all())
+        for entry in entries:
+            entry.attempts += 1
+            entry.next_attempt_at = lease_until
+        await self.db.commit()
+        return entries
+
+    async def record_results(
+        self,
+        sent: Iterable[int],
+        failed: Iterable[Tuple[int, str, Optional[datetime]]],
+        now: datetime,
+    ) -> None:
+        """
+        Зберігає результати відправлення партії однією транзакцією
+        :param sent: ID відправлених листів
+        :param failed: (ID, помилка, час наступної спроби або None, якщо спроб більше не буде)
+        :param now: Поточний час (UTC)
+        """
+        sent = list(sent)
+        if sent:
+            await self.db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(sent))
+                .values(status=EmailStatus.SENT.value, sent_at=now, last_error=None)
+            )
+        for entry_id, error, next_attempt_at in failed:
+            values = {"last_error": error}
+            if next_attempt_at is None:
+                values["status"] = EmailStatus.FAILED.value
+            else:
+                values["next_attempt_at"] = next_attempt_at
+            await self.db.execute(
+                update(EmailOutbox).where(EmailOutbox.id == entry_id).values(**values)
+            )
+        await self.db.commit()
@@ -1,10 +1,35 @@
+import asyncio
 import json
-from typing import Optional
+import math
+import random
+import time
+import uuid
+from typing import Callable, Optional
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from redis.asyncio import Redis
-from src.database.models import User
+from src.conf.config import settings
+from src.database.models import User, UserRole
+from src.database.redis import get_redis
 from src.schemas.user import UserCreate
+from src.services.cache import CacheInvalidator, SingleFlight, TTLCache
+from src.services.metrics import Counters
+
+
+# Версія формату запису кешу; записи іншої версії видаляються при читанні
+USER_CACHE_VERSION = 3
+# Поля користувача в записі кешу в порядку зберігання. Містять усе, що потрібно
+# для логіну та /me, тож влучання в кеш не потребує запиту до бази даних
+USER_CACHE_FIELDS = (
+    "id",
+    "username",
+    "email",
+    "hashed_password",
+    "avatar_url",
+    "avatar_hash",
+    "confirmed",
+    "role",
+)
 
 
 def user_to_dict(user: User) -> dict:
@@ -12,84 +37,349 @@ def user_to_dict(user: User) -> dict:
     Перетворює об'єкт User в словник для кешування.
     Використовується для зберігання в Redis.
     """
+    return {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+
+
+def user_from_dict(data: dict) -> User:
+    """
+    Відновлює об'єкт User із закешованого словника
+    """
+    user = User(**data)
+    if user.role is not None:
+        user.role = UserRole(user.role)
+    return user
+
+
+def encode_user_record(user: User, exp: float, delta: float) -> str:
+    """
+    Серіалізує запис кешу в компактний JSON-масив:
+    [версія, exp, delta, поля USER_CACHE_FIELDS...]
+    """
+    values = [getattr(user, field) for field in USER_CACHE_FIELDS]
+    return json.dumps(
+        [USER_CACHE_VERSION, round(exp, 3), round(delta, 6), *values],
+        separators=(",", ":"),
+    )
+
+
+def decode_user_record(raw: str) -> Optional[dict]:
+    """
+    Розбирає запис кешу. Повертає None для записів іншої версії чи формату
+    :return: Словник {"user": {...}, "exp": ..., "delta": ...} або None
+    """
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    if (
+        not isinstance(data, list)
+        or len(data) != 3 + len(USER_CACHE_FIELDS)
+        or data[0] != USER_CACHE_VERSION
+    ):
+        return None
     return {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "avatar_url": user.avatar_url,
-        "confirmed": user.confirmed,
+        "user": dict(zip(USER_CACHE_FIELDS, data[3:])),
+        "exp": data[1],
+        "delta": data[2],
     }
 
 
+# Кеш користувачів у пам'яті процесу (перший рівень перед Redis) з тими ж
+# ключами, що й у Redis; інвалідації розсилаються між процесами через pub/sub
+USER_CACHE_CHANNEL = "user-cache:invalidate"
+user_l1_cache = TTLCache(settings.USER_L1_CACHE_SIZE, settings.USER_L1_CACHE_TTL)
+user_cache_invalidator = CacheInvalidator(user_l1_cache, USER_CACHE_CHANNEL)
+user_cache_metrics = Counters(
+    "l1_hit",
+    "l1_miss",
+    "redis_hit",
+    "db_fallback",
+    "miss",
+    "early_refresh",
+    "lock_wait",
+    "evicted",
+)
+
+
+def user_cache_stats() -> dict:
+    """
+    Повертає статистику кешу користувачів для метрик
+    :return: Лічильники, частка влучань у кеш процесу та затримка інвалідацій
+    """
+    stats = user_cache_metrics.snapshot()
+    lookups = stats["l1_hit"] + stats["l1_miss"]
+    stats["l1_size"] = len(user_l1_cache)
+    stats["l1_hit_ratio"] = round(stats["l1_hit"] / lookups, 4) if lookups else None
+    stats["invalidation_lag"] = user_cache_invalidator.lag.snapshot()
+    return stats
+
+
+USER_CACHE_TTL = 300
+# Розкид TTL, щоб записи, створені одночасно, не застарівали одночасно
+USER_CACHE_TTL_JITTER = 0.1
+# Схильність до дострокового оновлення (XFetch): більше значення — раніше оновлення
+USER_CACHE_REFRESH_BETA = 1.0
+USER_CACHE_LOCK_MS = 3000
+USER_CACHE_LOCK_POLL_SECONDS = 0.05
+USER_CACHE_LOCK_POLLS = 20
+# Спільний хеш-тег {user}: у Redis Cluster вказівники й записи потрапляють
+# в один слот, тож скрипт читає вказівник і запис за один запит
+USER_RECORD_PREFIX = "{user}:id:"
+USER_EMAIL_PREFIX = "{user}:email:"
+USER_USERNAME_PREFIX = "{user}:username:"
+
+# Завантаження одного ключа з бази даних одночасно виконується лише раз на процес
+user_flights = SingleFlight()
+
+# Розіменовує ключ-вказівник (email або username) на запис {user}:id:<id>
+# за один запит до Redis. Ключ запису будується в скрипті, але має той самий
+# хеш-тег, що й KEYS[1], тож у Redis Cluster він у тому ж слоті
+RESOLVE_POINTER_LUA = """
+local user_id = redis.call('GET', KEYS[1])
+if not user_id then
+    return nil
+end
+return redis.call('GET', ARGV[1] .. user_id)
+"""
+
+# Знімає блокування лише тоді, коли воно досі належить цьому власнику
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def should_refresh_early(record: dict, now: Optional[float] = None) -> bool:
+    """
+    Імовірнісне дострокове оновлення (XFetch): чим ближче кінець терміну
+    запису і чим довше його завантаження, тим імовірніше оновити його заздалегідь
+    :param record: Запис кешу з полями exp (час закінчення) та delta (час завантаження)
+    :param now: Поточний час (за замовчуванням time.time())
+    :return: True, якщо цей запит має оновити запис
+    """
+    now = time.time() if now is None else now
+    gap = -record["delta"] * USER_CACHE_REFRESH_BETA * math.log(1.0 - random.random())
+    return now + gap >= record["exp"]
+
+
+def session_factory_for(session: AsyncSession) -> Callable[[], AsyncSession]:
+    """
+    Фабрика коротких сесій на тому ж рушії, що й сесія запиту. Так спільні
+    завантаження йдуть у ту саму базу, що й get_db (разом з її підмінами)
+    :param session: Сесія запиту
+    :return: Фабрика сесій
+    """
+    return async_sessionmaker(bind=session.bind, expire_on_commit=False)
+
+
+def user_cache_keys(user) -> tuple:
+    """
+    Ключі кешу користувача: запис за ID та вказівники за email і username
+    """
+    return (
+        f"{USER_RECORD_PREFIX}{user.id}",
+        f"{USER_EMAIL_PREFIX}{user.email}",
+        f"{USER_USERNAME_PREFIX}{user.username}",
+    )
+
+
 class UserRepository:
     """
     Репозиторій для роботи з користувачами, використовує Redis для кешування
     та SQLAlchemy для роботи з базою даних.
+
+    У Redis зберігається один запис {user}:id:<id>, а ключі {user}:email:<email>
+    і {user}:username:<username> містять лише ID користувача.
     """
 
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        redis: Optional[Redis] = None,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+    ):
         self.db = session
-        self.redis = Redis(host="localhost", port=6379, decode_responses=True)
+        self.redis = redis or get_redis()
+        # Спільні завантаження з бази даних (single-flight) виконуються у власній
+        # короткій сесії: сесія запиту-ініціатора може закритися раніше за очікувачів
+        self.session_factory = session_factory or session_factory_for(session)
+        self._resolve_script = self.redis.register_script(RESOLVE_POINTER_LUA)
+        self._release_lock = self.redis.register_script(RELEASE_LOCK_LUA)
 
-    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+    async def _select_user(self, **filters) -> Optional[User]:
         """
-        Отримує користувача за ID, використовуючи кеш Redis.
+        Завантажує користувача з бази даних в обхід кешу (для подальших змін)
         """
-        cache_key = f"user:id:{user_id}"
-        cached = await self.redis.get(cache_key)
-        if cached:
-            user_dict = json.loads(cached)
-            return User(**user_dict)
+        result = await self.db.execute(select(User).filter_by(**filters))
+        return result.scalar_one_or_none()
 
-        stmt = select(User).filter_by(id=user_id)
-        result = await self.db.execute(stmt)
-        user = result.scalar_one_or_none()
+    async def _invalidate(self, keys: tuple) -> None:
+        """
+        Прибирає записи користувача з кешу: у цьому процесі одразу,
+        а в Redis та інших процесах — одним конвеєром з повідомленням у канал
+        """
+        user_cache_invalidator.invalidate_local(keys)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(*keys)
+        pipe.publish(USER_CACHE_CHANNEL, user_cache_invalidator.message(keys))
+        await pipe.execute()
 
-        if user:
-            await self.redis.set(cache_key, json.dumps(user_to_dict(user)), ex=300)
-        return user
+    async def _resolve_pointer(self, key: str) -> Optional[str]:
+        """
+        Розіменовує ключ-вказівник (email або username) на запис {user}:id:<id>
+        за один запит до Redis
+        """
+        return await self._resolve_script(keys=[key], args=[USER_RECORD_PREFIX])
 
-    async def get_user_by_email(self, email: str) -> Optional[User]:
+    async def _cache_get(self, key: str) -> Optional[dict]:
         """
-        Отримує користувача за email, використовуючи кеш Redis.
+        Читає запис кешу користувача з Redis за ключем запису або вказівником.
+        Запис має вигляд {"user": {...}, "exp": ..., "delta": ...}
         """
-        cache_key = f"user:email:{email}"
-        cached = await self.redis.get(cache_key)
-        if cached:
-            user_dict = json.loads(cached)
-            return User(**user_dict)
+        if key.startswith(USER_RECORD_PREFIX):
+            raw = await self.redis.get(key)
+        else:
+            raw = await self._resolve_pointer(key)
+        if not raw:
+            return None
+        record = decode_user_record(raw)
+        if record is None:
+            # Запис старого формату: видаляємо, його перезапише завантаження з БД
+            user_cache_metrics.inc("evicted")
+            await self.redis.delete(key)
+        return record
 
-        stmt = select(User).filter_by(email=email)
-        result = await self.db.execute(stmt)
-        user = result.scalar_one_or_none()
+    async def _cache_set(
+        self, user: User, delta: float = 0.0, invalidate: tuple = ()
+    ) -> None:
+        """
+        Записує запис користувача і вказівники на нього одним конвеєром
+        :param delta: Скільки тривало завантаження з бази даних, секунд
+        :param invalidate: Ключі змінених даних, які треба прибрати з кешів
+            усіх процесів; застарілі вказівники (наприклад, після зміни email)
+            видаляються з Redis
+        """
+        keys = user_cache_keys(user)
+        record_key, email_key, username_key = keys
+        invalidate = tuple(dict.fromkeys(invalidate))
+        stale = [k for k in invalidate if k not in keys]
+        ttl = USER_CACHE_TTL * random.uniform(
+            1 - USER_CACHE_TTL_JITTER, 1 + USER_CACHE_TTL_JITTER
+        )
+        record = encode_user_record(user, time.time() + ttl, delta)
+        ttl = int(ttl)
+        pipe = self.redis.pipeline(transaction=False)
+        if stale:
+            pipe.delete(*stale)
+        pipe.set(record_key, record, ex=ttl)
+        pipe.set(email_key, user.id, ex=ttl)
+        pipe.set(username_key, user.id, ex=ttl)
+        if invalidate:
+            user_cache_invalidator.invalidate_local(invalidate)
+            pipe.publish(USER_CACHE_CHANNEL, user_cache_invalidator.message(invalidate))
+        await pipe.execute()
 
-        if user:
-            await self.redis.set(cache_key, json.dumps(user_to_dict(user)), ex=300)
+    async def _load_user(
+        self, cache_key: str, filters: dict, stale: Optional[dict]
+    ) -> Optional[dict]:
+        """
+        Завантажує користувача з бази даних під коротким блокуванням у Redis,
+        щоб між процесами запит до бази виконував лише один з них.
+        Результат спільний для всіх очікувачів, тому це словник полів,
+        не прив'язаний до жодної сесії
+        """
+        lock_key = f"lock:{cache_key}"
+        token = uuid.uuid4().hex
+        locked = await self.redis.set(lock_key, token, nx=True, px=USER_CACHE_LOCK_MS)
+        if not locked:
+            # Запис уже оновлює інший процес: віддаємо наявне значення або чекаємо
+            if stale is not None:
+                return stale["user"]
+            user_cache_metrics.inc("lock_wait")
+            for _ in range(USER_CACHE_LOCK_POLLS):
+                await asyncio.sleep(USER_CACHE_LOCK_POLL_SECONDS)
+                record = await self._cache_get(cache_key)
+                if record:
+                    return record["user"]
+
+        try:
+            user_cache_metrics.inc("db_fallback")
+            start = time.perf_counter()
+            async with self.session_factory() as session:
+                result = await session.execute(select(User).filter_by(**filters))
+                user = result.scalar_one_or_none()
+            if user is None:
+                user_cache_metrics.inc("miss")
+                return None
+            await self._cache_set(user, delta=time.perf_counter() - start)
+            return user_to_dict(user)
+        finally:
+            if locked:
+                await self._release_lock(keys=[lock_key], args=[token])
+
+    async def _get_user(self, cache_key: str, **filters) -> Optional[User]:
+        cached = user_l1_cache.get(cache_key)
+        if cached is not None:
+            user_cache_metrics.inc("l1_hit")
+            return user_from_dict(cached)
+        user_cache_metrics.inc("l1_miss")
+
+        generation = user_cache_invalidator.generation
+        record = await self._cache_get(cache_key)
+        if record is not None and not should_refresh_early(record):
+            user_cache_metrics.inc("redis_hit")
+            user = user_from_dict(record["user"])
+        else:
+            if record is not None:
+                user_cache_metrics.inc("early_refresh")
+            data = await user_flights.do(
+                cache_key, lambda: self._load_user(cache_key, filters, record)
+            )
+            # Кожен виклик отримує власний об'єкт User
+            user = user_from_dict(data) if data is not None else None
+
+        if user is not None and generation == user_cache_invalidator.generation:
+            user_dict = user_to_dict(user)
+            for key in user_cache_keys(user):
+                user_l1_cache.set(key, user_dict)
         return user
 
-    async def get_user_by_username(self, username: str) -> Optional[User]:
+    async def get_principal(self, email: str) -> Optional[User]:
         """
-        Отримує користувача за username, використовуючи кеш Redis.
+        Визначає автентифікованого користувача за email через дворівневий кеш:
+        пам'ять процесу, потім Redis, і лише потім база даних.
         """
-        cache_key = f"user:username:{username}"
-        cached = await self.redis.get(cache_key)
-        if cached:
-            user_dict = json.loads(cached)
-            return User(**user_dict)
+        return await self._get_user(f"{USER_EMAIL_PREFIX}{email}", email=email)
 
-        stmt = select(User).filter_by(username=username)
-        result = await self.db.execute(stmt)
-        user = result.scalar_one_or_none()
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+        """
+        Отримує користувача за ID, використовуючи кеш Redis.
+        """
+        return await self._get_user(f"{USER_RECORD_PREFIX}{user_id}", id=user_id)
 
-        if user:
-            await self.redis.set(cache_key, json.dumps(user_to_dict(user)), ex=300)
-        return user
+    async def get_user_by_email(self, email: str) -> Optional[User]:
+        """
+        Отримує користувача за email, використовуючи кеш Redis.
+        """
+        return await self._get_user(f"{USER_EMAIL_PREFIX}{email}", email=email)
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        """
+        Отримує користувача за username, використовуючи кеш Redis.
+        """
+        return await self._get_user(
+            f"{USER_USERNAME_PREFIX}{username}", username=username
+        )
 
     async def create_user(self, user_data: UserCreate, avatar_url: str = None) -> User:
         """
         Створює нового користувача в базі даних та кешує його в Redis.
         """
         user_dict = user_data.model_dump()
+        # У UserCreate.password на цей момент уже хеш (див. register_user)
+        user_dict["hashed_password"] = user_dict.pop("password")
         if avatar_url:
             user_dict["avatar_url"] = avatar_url
         user = User(**user_dict)
@@ -97,65 +387,49 @@ class UserRepository:
         await self.db.commit()
         await self.db.refresh(user)
 
-        keys = [
-            f"user:id:{user.id}",
-            f"user:email:{user.email}",
-            f"user:username:{user.username}",
-        ]
-        for key in keys:
-            await self.redis.set(key, json.dumps(user_to_dict(user)), ex=300)
+        await self._cache_set(user)
         return user
 
     async def confirmed_email(self, email: str) -> None:
         """
         Підтверджує електронну адресу користувача.
         """
-        user = await self.get_user_by_email(email)
+        user = await self._select_user(email=email)
         if user:
             user.confirmed = True
             await self.db.commit()
 
-            await self.redis.delete(f"user:email:{email}")
-            await self.redis.delete(f"user:id:{user.id}")
-            await self.redis.delete(f"user:username:{user.username}")
+            await self._invalidate(user_cache_keys(user))
 
-    async def update_avatar_url(self, email: str, url: str) -> Optional[User]:
+    async def update_avatar_url(
+        self, email: str, url: str, avatar_hash: Optional[str] = None
+    ) -> Optional[User]:
         """
-        Оновлює URL аватара користувача за email.
+        Оновлює URL аватара користувача за email разом із хешем його вмісту.
         """
-        user = await self.get_user_by_email(email)
+        user = await self._select_user(email=email)
         if user:
             user.avatar_url = url
+            user.avatar_hash = avatar_hash
             await self.db.commit()
             await self.db.refresh(user)
 
-            keys = [
-                f"user:email:{email}",
-                f"user:id:{user.id}",
-                f"user:username:{user.username}",
-            ]
-            for key in keys:
-                await self.redis.set(key, json.dumps(user_to_dict(user)), ex=300)
+            await self._cache_set(user, invalidate=user_cache_keys(user))
         return user
 
     async def update_user(self, user_id: int, data: dict) -> Optional[User]:
         """
         Оновлює інформацію про користувача за його ID.
         """
-        user = await self.get_user_by_id(user_id)
+        user = await self._select_user(id=user_id)
         if user:
-            allowed_fields = {"username", "email", "avatar_url"}
+            old_keys = user_cache_keys(user)
+            allowed_fields = {"username", "email", "avatar_url", "hashed_password"}
             for key, value in data.items():
                 if key in allowed_fields:
                     setattr(user, key, value)
             await self.db.commit()
             await self.db.refresh(user)
 
-            keys = [
-                f"user:id:{user_id}",
-                f"user:email:{user.email}",
-                f"user:username:{user.username}",
-            ]
-            for key in keys:
-                await self.redis.set(key, json.dumps(user_to_dict(user)), ex=300)
+            await self._cache_set(user, invalidate=old_keys + user_cache_keys(user))
         return user
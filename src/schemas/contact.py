@@ -1,6 +1,6 @@
 from datetime import date
-from typing import Optional
-from pydantic import BaseModel, EmailStr, Field
+from typing import List, Literal, Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from pydantic import ConfigDict
 
 
@@ -32,9 +32,9 @@ class ContactUpdate(BaseModel):
 
     first_name: Optional[str] = Field(None, min_length=1, max_length=50)
     last_name: Optional[str] = Field(None, min_length=1, max_length=50)
-    email: Optional[EmailStr]
+    email: Optional[EmailStr] = None
     phone: Optional[str] = Field(None, min_length=10, max_length=30)
-    birthday: Optional[date]
+    birthday: Optional[date] = None
     additional_data: Optional[str] = Field(None, max_length=500)
 
 
@@ -46,3 +46,97 @@ class ContactResponse(ContactBase):
     id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# Поля, які в таблиці contacts не можуть бути NULL
+REQUIRED_CONTACT_FIELDS = ("first_name", "last_name", "email", "phone", "birthday")
+
+
+class ContactBatchUpdateItem(BaseModel):
+    """
+    Клас для часткового оновлення одного контакту в пакеті
+    """
+
+    id: int
+    changes: ContactUpdate
+
+    @model_validator(mode="after")
+    def check_changes(self):
+        if not self.changes.model_fields_set:
+            raise ValueError("changes must contain at least one field")
+        nulls = [
+            field
+            for field in REQUIRED_CONTACT_FIELDS
+            if field in self.changes.model_fields_set
+            and getattr(self.changes, field) is None
+        ]
+        if nulls:
+            raise ValueError(f"fields cannot be null: {', '.join(nulls)}")
+        return self
+
+
+class ContactBatchUpdate(BaseModel):
+    """
+    Клас для пакетного оновлення контактів
+    """
+
+    items: List[ContactBatchUpdateItem] = Field(..., min_length=1, max_length=1000)
+
+    @model_validator(mode="after")
+    def check_unique_ids(self):
+        seen, duplicates = set(), set()
+        for item in self.items:
+            (duplicates if item.id in seen else seen).add(item.id)
+        if duplicates:
+            raise ValueError(
+                f"duplicate contact ids: {', '.join(map(str, sorted(duplicates)))}"
+            )
+        return self
+
+
+class ContactBatchDelete(BaseModel):
+    """
+    Клас для пакетного видалення контактів
+    """
+
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class ContactBatchOutcome(BaseModel):
+    """
+    Клас для результату пакетної операції над одним контактом
+    """
+
+    id: int
+    status: Literal["updated", "deleted", "not_found"]
+
+
+class ContactBatchResult(BaseModel):
+    """
+    Клас для результату пакетної операції
+    """
+
+    results: List[ContactBatchOutcome]
+
+
+class ContactImportIssue(BaseModel):
+    """
+    Клас для опису рядка, який не вдалося імпортувати
+    """
+
+    row: int
+    status: Literal["conflict", "invalid"]
+    detail: str
+
+
+class ContactImportResult(BaseModel):
+    """
+    Клас для звіту про масовий імпорт контактів
+    """
+
+    created: int = 0
+    conflicts: int = 0
+    invalid: int = 0
+    issues: List[ContactImportIssue] = []
+    # True, якщо описано не всі рядки з помилками (див. conflicts та invalid)
+    issues_truncated: bool = False
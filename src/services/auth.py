@@ -1,35 +1,132 @@
+import hashlib
+import time
+import uuid
 from datetime import datetime, timedelta, UTC
 from typing import Optional
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import HTTPException, status, Depends
-from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
 from src.database.models import User, UserRole
 from src.database.db import get_db
+from src.services.cache import TTLCache
+from src.services.hashing import (
+    PasswordHasherBusy,
+    hash_password,
+    password_hasher,
+    pwd_context,
+    verify_password,
+)
+from src.services.metrics import Counters
+from src.services.revocation import revocation_store
+from src.services.users import UserService
 from src.conf.config import settings
 
 
+def hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервер перевантажений, спробуйте пізніше",
+        headers={"Retry-After": "1"},
+    )
+
+
 class Hash:
     """
     Клас для хешування паролів
     """
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
 
     def verify_password(self, plain_password, hashed_password):
         """
         Перевірка паролю
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return verify_password(plain_password, hashed_password)
 
     def get_password_hash(self, password: str):
         """
         Хешування паролю
         """
-        return self.pwd_context.hash(password)
+        return hash_password(password)
+
+    async def verify_password_async(self, plain_password, hashed_password) -> bool:
+        """
+        Перевірка паролю в пулі хешування, не блокуючи цикл подій
+        :raises HTTPException: 503, якщо черга на хешування переповнена
+        """
+        try:
+            return await password_hasher.verify(plain_password, hashed_password)
+        except PasswordHasherBusy:
+            raise hasher_busy()
+
+    async def get_password_hash_async(self, password: str) -> str:
+        """
+        Хешування паролю в пулі хешування, не блокуючи цикл подій
+        :raises HTTPException: 503, якщо черга на хешування переповнена
+        """
+        try:
+            return await password_hasher.hash(password)
+        except PasswordHasherBusy:
+            raise hasher_busy()
+
+
+class TokenCodec:
+    """
+    Кодування та перевірка JWT. Перевірені claims кешуються в пам'яті процесу
+    за дайджестом токена до моменту exp, тож повторні запити з тим самим
+    токеном не перераховують HMAC і не розбирають JSON
+    """
+
+    def __init__(self, secret: str, algorithm: str, cache_size: int):
+        self.secret = secret
+        self.algorithm = algorithm
+        self.metrics = Counters("hit", "miss")
+        self._cache = TTLCache(cache_size, ttl=settings.JWT_EXPIRATION_SECONDS)
+
+    def encode(self, claims: dict) -> str:
+        """
+        Підписує claims
+        :param claims: Дані токена
+        :return: JWT
+        """
+        return jwt.encode(claims, self.secret, algorithm=self.algorithm)
 
+    def decode(self, token: str) -> dict:
+        """
+        Перевіряє підпис і термін дії токена
+        :param token: JWT
+        :return: Claims токена
+        :raises JWTError: Якщо токен недійсний або прострочений
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        claims = self._cache.get(key)
+        if claims is not None:
+            self.metrics.inc("hit")
+            return dict(claims)
+
+        self.metrics.inc("miss")
+        claims = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        exp = claims.get("exp")
+        if exp is not None:
+            ttl = exp - time.time()
+            if ttl > 0:
+                self._cache.set(key, claims, ttl=ttl)
+        return dict(claims)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        """
+        Повертає статистику кешу перевірених токенів
+        """
+        return {**self.metrics.snapshot(), "size": len(self._cache)}
+
+
+token_codec = TokenCodec(
+    settings.JWT_SECRET, settings.JWT_ALGORITHM, settings.TOKEN_CACHE_SIZE
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -41,8 +138,8 @@ def create_access_token(data: dict, expires_delta: Optional[float] = None) -> st
         expire = datetime.now(UTC) + timedelta(seconds=expires_delta)
     else:
         expire = datetime.now(UTC) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    return token_codec.encode(to_encode)
 
 
 def create_refresh_token(data: dict) -> str:
@@ -51,16 +148,42 @@ def create_refresh_token(data: dict) -> str:
     expire = datetime.now(UTC) + timedelta(
         days=settings.JWT_REFRESH_EXPIRATION_DAYS
     )
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    return token_codec.encode(to_encode)
+
+
+async def revoke_token(token: str, subject: Optional[str] = None) -> Optional[dict]:
+    """
+    Відкликання токену до закінчення терміну його дії
+    :param token: JWT
+    :param subject: Якщо задано, відкликається лише токен цього користувача
+    :return: Claims відкликаного токену або None, якщо токен не відкликано
+    """
+    try:
+        claims = token_codec.decode(token)
+    except JWTError:
+        return None
+    if subject is not None and claims.get("sub") != subject:
+        return None
+    if claims.get("jti") and claims.get("exp"):
+        await revocation_store.revoke(claims["jti"], claims["exp"])
+    return claims
+
+
+async def verify_refresh_token(token: str) -> str:
+    """Перевірка refresh токену, включно з його відкликанням"""
+    email = verify_token(token)
+    if await revocation_store.is_revoked(token_codec.decode(token).get("jti")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked"
+        )
+    return email
 
 
 def verify_token(token: str) -> str:
     """Перевірка токену"""
     try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
-        )
+        payload = token_codec.decode(token)
         email = payload.get("sub")
         if email is None:
             raise HTTPException(
@@ -84,19 +207,17 @@ async def get_current_user(
     )
 
     try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
-        )
+        payload = token_codec.decode(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    result = await db.execute(select(User).filter(User.email == email))
-    scalars_result = await result.scalars()
-    user = scalars_result.first()
+    if await revocation_store.is_revoked(payload.get("jti")):
+        raise credentials_exception
 
+    user = await UserService(db).get_principal(email)
     if user is None:
         raise credentials_exception
     return user
@@ -110,9 +231,7 @@ def create_email_token(email: str) -> str:
 async def get_email_from_token(token: str):
     """Отримання електронної пошти з токену"""
     try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
-        )
+        payload = token_codec.decode(token)
         email = payload["sub"]
         return email
     except JWTError:
@@ -127,15 +246,13 @@ def create_password_reset_token(data: dict, expires_delta: int = 3600) -> str:
     to_encode = data.copy()
     expire = datetime.now(UTC) + timedelta(seconds=expires_delta)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    return token_codec.encode(to_encode)
 
 
 def verify_password_reset_token(token: str) -> str:
     """Перевірка токену для скидання паролю"""
     try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
-        )
+        payload = token_codec.decode(token)
         email = payload.get("sub")
         if email is None:
             raise HTTPException(
@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional
+from redis.asyncio import Redis
+from src.services.metrics import Histogram, LATENCY_BUCKETS
+
+
+class TTLCache:
+    """
+    Обмежений кеш у пам'яті процесу з витісненням LRU та часом життя записів
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Повертає значення або None, якщо запису немає чи він застарів
+        """
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Зберігає значення, витісняючи найдавніше використаний запис при переповненні
+        """
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, *keys: Hashable) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """
+    Об'єднує одночасні завантаження одного ключа в межах процесу:
+    перший виклик виконує завантаження, решта чекають на його результат
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Виконує fn для ключа або приєднується до вже запущеного виконання
+        :param key: Ключ, за яким об'єднуються виклики
+        :param fn: Функція без аргументів, що повертає корутину завантаження
+        :return: Результат завантаження
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Скасування одного з очікувачів не повинно зупиняти спільне завантаження
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class CacheInvalidator:
+    """
+    Розсилає та приймає інвалідації локального кешу через Redis pub/sub,
+    щоб кожен процес прибирав застарілі записи одразу після запису в іншому
+    """
+
+    def __init__(self, cache: TTLCache, channel: str, poll_interval: float = 1.0):
+        self.cache = cache
+        self.channel = channel
+        self.poll_interval = poll_interval
+        # Збільшується з кожною інвалідацією: завантаження, що почалось раніше,
+        # не повинно повертати в кеш значення, яке вже встигло застаріти
+        self.generation = 0
+        self.lag = Histogram(LATENCY_BUCKETS)
+        self._task: Optional[asyncio.Task] = None
+
+    def invalidate_local(self, keys: Iterable[Hashable]) -> None:
+        """
+        Прибирає записи з локального кешу цього процесу
+        """
+        self.generation += 1
+        self.cache.delete(*keys)
+
+    def message(self, keys: Iterable[str]) -> str:
+        """
+        Формує повідомлення інвалідації для публікації в канал
+        """
+        return json.dumps({"keys": list(keys), "ts": time.time()})
+
+    def handle(self, data: str) -> None:
+        """
+        Обробляє отримане повідомлення інвалідації
+        """
+        payload = json.loads(data)
+        self.invalidate_local(payload["keys"])
+        self.lag.observe(max(time.time() - payload["ts"], 0.0))
+
+    async def start(self, redis: Redis) -> None:
+        """
+        Запускає фонове прослуховування каналу інвалідацій
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(redis))
+
+    async def stop(self) -> None:
+        """
+        Зупиняє прослуховування каналу
+        """
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _listen(self, redis: Redis) -> None:
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    # Очікування з власним тайм-аутом, а не socket_timeout пулу:
+                    # тиша в каналі — норма, get_message тоді повертає None
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=self.poll_interval
+                    )
+                    if message is not None and message["type"] == "message":
+                        self.handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # З'єднання розірвано: поки підписки немає, інвалідації
+                # можуть загубитися, тому локальний кеш очищується повністю
+                self.generation += 1
+                self.cache.clear()
+                await asyncio.sleep(1.0)
+            finally:
+                with contextlib.suppress(Exception):
+                    await pubsub.aclose()
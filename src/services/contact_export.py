@@ -0,0 +1,52 @@
+import csv
+import io
+from typing import AsyncIterator
+from src.database.models import Contact
+from src.schemas.contact import ContactResponse
+
+EXPORT_FIELDS = list(ContactResponse.model_fields)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+async def ndjson_chunks(
+    contacts: AsyncIterator[Contact], rows_per_chunk: int = 500
+) -> AsyncIterator[str]:
+    """
+    Серіалізує контакти в NDJSON, групуючи рядки в чанки
+    """
+    lines = []
+    async for contact in contacts:
+        lines.append(ContactResponse.model_validate(contact).model_dump_json())
+        if len(lines) >= rows_per_chunk:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def csv_chunks(
+    contacts: AsyncIterator[Contact], rows_per_chunk: int = 500
+) -> AsyncIterator[str]:
+    """
+    Серіалізує контакти в CSV із заголовком, групуючи рядки в чанки
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    rows = 0
+    async for contact in contacts:
+        data = ContactResponse.model_validate(contact).model_dump(mode="json")
+        writer.writerow([data[field] for field in EXPORT_FIELDS])
+        rows += 1
+        if rows % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+EXPORT_SERIALIZERS = {"ndjson": ndjson_chunks, "csv": csv_chunks}
@@ -0,0 +1,145 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Tuple
+from pydantic import ValidationError
+from src.database.models import User
+from src.repository.contacts import ContactRepository
+from src.schemas.contact import ContactCreate, ContactImportIssue, ContactImportResult
+
+CSV_MEDIA_TYPES = {"text/csv", "application/csv"}
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Розбиває потік байтів UTF-8 на рядки, не завантажуючи його повністю в пам'ять
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Читає CSV з заголовком. Повертає пари (номер рядка даних, словник полів)
+    """
+    header = None
+    record = ""
+    row_number = 0
+    async for line in iter_lines(chunks):
+        record += line
+        # Поле в лапках може містити перенесення рядка — чекаємо на закриваючі лапки
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not any(v.strip() for v in values):
+            continue
+        if header is None:
+            header = [v.strip() for v in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, f"очікувалось {len(header)} полів, отримано {len(values)}"
+            continue
+        yield row_number, {k: (v if v != "" else None) for k, v in zip(header, values)}
+    if record.strip():
+        yield row_number + 1, "незакриті лапки в кінці файлу"
+
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Читає NDJSON. Повертає пари (номер рядка, словник полів)
+    """
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield row_number, "некоректний JSON"
+            continue
+        yield row_number, data if isinstance(data, dict) else "очікувався JSON-об'єкт"
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+class ContactImporter:
+    """
+    Потоковий імпорт контактів: валідує рядки через ContactCreate і вставляє
+    їх пакетами. У звіті описуються перші max_issues рядків, що не вдалося
+    імпортувати, решта лише рахується — звіт не росте разом з файлом
+    """
+
+    def __init__(
+        self, repo: ContactRepository, user: User, batch_size: int, max_issues: int = 100
+    ):
+        self.repo = repo
+        self.user = user
+        self.batch_size = batch_size
+        self.max_issues = max_issues
+        self.result = ContactImportResult()
+        self._batch: List[Tuple[int, Dict]] = []
+
+    def _issue(self, row: int, status: str, detail: str) -> None:
+        if status == "conflict":
+            self.result.conflicts += 1
+        else:
+            self.result.invalid += 1
+        if len(self.result.issues) >= self.max_issues:
+            self.result.issues_truncated = True
+            return
+        self.result.issues.append(ContactImportIssue(row=row, status=status, detail=detail))
+
+    async def _flush(self) -> None:
+        batch, self._batch = self._batch, []
+        unique, seen_email, seen_phone = [], set(), set()
+        for row, data in batch:
+            if data["email"] in seen_email or data["phone"] in seen_phone:
+                self._issue(row, "conflict", "дублікат email або телефону в межах імпорту")
+                continue
+            seen_email.add(data["email"])
+            seen_phone.add(data["phone"])
+            unique.append((row, data))
+
+        created = await self.repo.bulk_create_contacts([d for _, d in unique], self.user)
+        self.result.created += len(created)
+        for row, data in unique:
+            if data["email"] not in created:
+                self._issue(row, "conflict", "контакт з таким email або телефоном вже існує")
+
+    async def run(self, rows: AsyncIterator[Tuple[int, object]]) -> ContactImportResult:
+        """
+        Імпортує всі рядки потоку
+        :param rows: Асинхронний ітератор пар (номер рядка, дані або текст помилки)
+        :return: Звіт про імпорт
+        """
+        async for row, data in rows:
+            if isinstance(data, str):
+                self._issue(row, "invalid", data)
+                continue
+            try:
+                contact = ContactCreate.model_validate(data)
+            except ValidationError as e:
+                self._issue(row, "invalid", _describe(e))
+                continue
+            self._batch.append((row, contact.model_dump()))
+            if len(self._batch) >= self.batch_size:
+                await self._flush()
+        if self._batch:
+            await self._flush()
+        return self.result
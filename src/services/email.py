@@ -1,9 +1,24 @@
+import asyncio
+import contextlib
+import json
+import random
+import time
+from datetime import timedelta
 from pathlib import Path
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from aiosmtplib import SMTP, SMTPException, SMTPResponseException
+from fastapi_mail import ConnectionConfig
 from pydantic import EmailStr
-from src.services.auth import create_email_token
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.conf.config import settings
+from src.database.db import AsyncSessionLocal
+from src.database.models import EmailOutbox
+from src.repository.email_outbox import EmailOutboxRepository, utcnow
+from src.services.auth import create_email_token, create_password_reset_token
+from src.services.email_renderer import EmailRenderer
+from src.services.jobs import JobQueueFull, job_queue
+from src.services.metrics import Counters, Histogram, LATENCY_BUCKETS
 
 conf = ConnectionConfig(
     MAIL_USERNAME=settings.MAIL_USERNAME,
@@ -19,42 +34,350 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=Path(__file__).parent / "templates",
 )
 
+VERIFY_EMAIL = "verify_email"
+RESET_PASSWORD = "reset_password"
+DRAIN_OUTBOX_JOB = "email.drain_outbox"
 
-async def send_email(email: EmailStr, username: str, host: str):
+
+def template_context(template: str, recipient: str, payload: dict) -> dict:
     """
-    Функція для відправки електронної пошти
+    Формує дані для шаблону листа. Токени створюються в момент відправлення,
+    тож у черзі не зберігаються секрети, а затримка не скорочує їх дію
+    :param template: Тип листа
+    :param recipient: Адреса отримувача
+    :param payload: Дані, збережені в черзі
+    :return: Контекст шаблону
     """
-    try:
-        token_verification = create_email_token(email)
-        message = MessageSchema(
-            subject="Confirm your email",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": token_verification,
-            },
-            subtype=MessageType.html,
-        )
+    if template == VERIFY_EMAIL:
+        return {
+            "host": payload["host"],
+            "username": payload["username"],
+            "token": create_email_token(recipient),
+        }
+    if template == RESET_PASSWORD:
+        token = create_password_reset_token({"sub": recipient})
+        return {"reset_link": f"{payload['host']}password-reset/confirm?token={token}"}
+    raise ValueError(f"Невідомий шаблон листа: {template}")
+
+
+SUBJECTS = {
+    VERIFY_EMAIL: "Confirm your email",
+    RESET_PASSWORD: "Password reset request",
+}
+
+renderer = EmailRenderer(
+    conf.TEMPLATE_FOLDER, SUBJECTS, settings.MAIL_FROM_NAME, settings.MAIL_FROM
+)
+
+
+def render_email(entry: EmailOutbox) -> bytes:
+    """
+    Формує MIME-повідомлення для запису черги
+    :param entry: Запис черги
+    :return: Лист у байтах, готовий до відправлення
+    """
+    context = template_context(entry.template, entry.recipient, json.loads(entry.payload))
+    return renderer.render(entry.template, entry.recipient, context)
+
+
+def render_batch(entries: List[EmailOutbox]) -> List[Union[bytes, Exception]]:
+    """
+    Рендерить партію листів заздалегідь, до відправлення.
+    Помилка одного листа не зупиняє решту
+    :param entries: Записи черги
+    :return: Листи в байтах або помилки рендерингу в тому ж порядку
+    """
+    rendered = []
+    for entry in entries:
+        try:
+            rendered.append(render_email(entry))
+        except Exception as err:
+            rendered.append(err)
+    return rendered
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="verify_email.html")
-    except ConnectionErrors as err:
-        print(err)
+
+async def queue_verification_email(
+    db: AsyncSession, email: EmailStr, username: str, host: str, commit: bool = True
+) -> EmailOutbox:
+    """
+    Ставить у чергу лист для підтвердження електронної пошти
+    :param commit: False — лист зберігається разом з транзакцією викликача
+        (наприклад, зі створенням користувача); тоді після її фіксації
+        викликач сам викликає schedule_outbox_drain()
+    """
+    entry = await EmailOutboxRepository(db).enqueue(
+        VERIFY_EMAIL, email, {"username": username, "host": str(host)}, commit=commit
+    )
+    if commit:
+        await schedule_outbox_drain()
+    return entry
 
 
-async def send_password_reset_email(email: EmailStr, reset_link: str):
+async def queue_password_reset_email(
+    db: AsyncSession, email: EmailStr, host: str
+) -> EmailOutbox:
     """
-    Функція для відправки електронної пошти для скидання пароля
+    Ставить у чергу лист з посиланням для скидання пароля
     """
-    message = MessageSchema(
-        subject="Password reset request",
-        recipients=[email],
-        template_body={"reset_link": reset_link},
-        subtype=MessageType.html,
+    entry = await EmailOutboxRepository(db).enqueue(
+        RESET_PASSWORD, email, {"host": str(host)}
     )
-    try:
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="reset_password.html")
-    except ConnectionErrors as err:
-        print(err)
+    await schedule_outbox_drain()
+    return entry
+
+
+class SMTPPool:
+    """
+    Пул постійних SMTP-з'єднань. З'єднання (разом з TLS і автентифікацією)
+    встановлюється один раз і використовується для багатьох листів
+    """
+
+    def __init__(
+        self,
+        size: int,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+        timeout: float = 30.0,
+        idle_timeout: float = 30.0,
+    ):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._options = dict(
+            hostname=hostname,
+            port=port,
+            username=username,
+            password=password,
+            use_tls=use_tls,
+            start_tls=start_tls,
+            validate_certs=validate_certs,
+            timeout=timeout,
+        )
+        self.metrics = Counters("connects", "reuses", "discarded")
+        self._idle: List[Tuple[SMTP, float]] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_settings(cls) -> "SMTPPool":
+        return cls(
+            settings.SMTP_POOL_SIZE,
+            settings.MAIL_SERVER,
+            settings.MAIL_PORT,
+            username=settings.MAIL_USERNAME if settings.USE_CREDENTIALS else None,
+            password=settings.MAIL_PASSWORD if settings.USE_CREDENTIALS else None,
+            use_tls=settings.MAIL_SSL_TLS,
+            start_tls=settings.MAIL_STARTTLS,
+            validate_certs=settings.VALIDATE_CERTS,
+            timeout=settings.SMTP_TIMEOUT,
+            idle_timeout=settings.SMTP_IDLE_SECONDS,
+        )
+
+    @contextlib.asynccontextmanager
+    async def connection(self) -> AsyncIterator[SMTP]:
+        """
+        Видає з'єднання з пулу. З'єднання, на якому сталася помилка,
+        закривається, а не повертається в пул
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        async with self._semaphore:
+            smtp = await self._acquire()
+            try:
+                yield smtp
+            except BaseException:
+                self.metrics.inc("discarded")
+                smtp.close()
+                raise
+            self._idle.append((smtp, time.monotonic()))
+
+    async def _acquire(self) -> SMTP:
+        while self._idle:
+            smtp, released_at = self._idle.pop()
+            if smtp.is_connected and time.monotonic() - released_at < self.idle_timeout:
+                self.metrics.inc("reuses")
+                return smtp
+            await self._quit(smtp)
+        smtp = SMTP(**self._options)
+        await smtp.connect()
+        self.metrics.inc("connects")
+        return smtp
+
+    @staticmethod
+    async def _quit(smtp: SMTP) -> None:
+        try:
+            await smtp.quit()
+        except (SMTPException, OSError):
+            smtp.close()
+
+    async def close(self) -> None:
+        """
+        Закриває всі вільні з'єднання
+        """
+        idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            await self._quit(smtp)
+
+    def stats(self) -> dict:
+        return {**self.metrics.snapshot(), "size": self.size, "idle": len(self._idle)}
+
+
+class OutboxWorker:
+    """
+    Відправляє листи з черги email_outbox партіями через пул SMTP-з'єднань.
+    Запускається задачею черги фонових задач. Невдалі спроби повторюються з
+    експоненційною затримкою; після max_attempts спроб лист позначається як невдалий
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        pool: SMTPPool,
+        batch_size: int,
+        lease_seconds: float,
+        max_attempts: int,
+        retry_base: float,
+        retry_max: float,
+    ):
+        self.session_factory = session_factory
+        self.pool = pool
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.metrics = Counters("sent", "retried", "failed", "batches")
+        # Від постановки в чергу до успішного відправлення
+        self.delivery_lag = Histogram(LATENCY_BUCKETS)
+
+    def retry_delay(self, attempts: int) -> float:
+        """
+        Затримка перед наступною спробою: експоненційна з випадковим розкидом
+        :param attempts: Кількість уже зроблених спроб
+        """
+        delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _deliver(
+        self, entry: EmailOutbox, message: Union[bytes, Exception]
+    ) -> Optional[Tuple[str, bool]]:
+        """
+        Відправляє один лист
+        :param entry: Запис черги
+        :param message: Підготовлений лист або помилка його рендерингу
+        :return: None у разі успіху, інакше (помилка, чи є вона остаточною)
+        """
+        if isinstance(message, Exception):
+            return f"render: {message!r}", True
+        try:
+            async with self.pool.connection() as smtp:
+                await smtp.sendmail(renderer.sender, [entry.recipient], message)
+        except SMTPResponseException as err:
+            # 5xx — постійна відмова сервера, повтор нічого не змінить
+            return f"{err.code} {err.message}", err.code >= 500
+        except (SMTPException, OSError, asyncio.TimeoutError) as err:
+            return repr(err), False
+        return None
+
+    async def run_once(self) -> int:
+        """
+        Відправляє одну партію листів
+        :return: Кількість оброблених листів
+        """
+        async with self.session_factory() as session:
+            repository = EmailOutboxRepository(session)
+            now = utcnow()
+            batch = await repository.claim_batch(
+                self.batch_size, now, now + timedelta(seconds=self.lease_seconds)
+            )
+            if not batch:
+                return 0
+
+            messages = render_batch(batch)
+            results = await asyncio.gather(
+                *(self._deliver(entry, message) for entry, message in zip(batch, messages))
+            )
+
+            now = utcnow()
+            sent, failed = [], []
+            for entry, result in zip(batch, results):
+                if result is None:
+                    sent.append(entry.id)
+                    self.delivery_lag.observe((now - entry.created_at).total_seconds())
+                    continue
+                error, permanent = result
+                if permanent or entry.attempts >= self.max_attempts:
+                    failed.append((entry.id, error, None))
+                    self.metrics.inc("failed")
+                else:
+                    retry_at = now + timedelta(seconds=self.retry_delay(entry.attempts))
+                    failed.append((entry.id, error, retry_at))
+                    self.metrics.inc("retried")
+            await repository.record_results(sent, failed, now)
+
+        self.metrics.inc("sent", len(sent))
+        self.metrics.inc("batches")
+        return len(batch)
+
+    async def drain(self) -> int:
+        """
+        Відправляє партії, поки в черзі є готові листи
+        :return: Кількість оброблених листів
+        """
+        total = 0
+        while True:
+            processed = await self.run_once()
+            total += processed
+            # Неповна партія означає, що готових листів більше немає
+            if processed < self.batch_size:
+                return total
+
+    async def close(self) -> None:
+        """
+        Закриває SMTP-з'єднання (під час зупинки додатку)
+        """
+        await self.pool.close()
+
+    def stats(self) -> dict:
+        """
+        Повертає статистику відправлення та пулу SMTP-з'єднань
+        """
+        return {
+            **self.metrics.snapshot(),
+            "delivery_lag": self.delivery_lag.snapshot(),
+            "smtp_pool": self.pool.stats(),
+        }
+
+
+outbox_worker = OutboxWorker(
+    AsyncSessionLocal,
+    SMTPPool.from_settings(),
+    batch_size=settings.EMAIL_OUTBOX_BATCH_SIZE,
+    lease_seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS,
+    max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    retry_base=settings.EMAIL_RETRY_BASE_SECONDS,
+    retry_max=settings.EMAIL_RETRY_MAX_SECONDS,
+)
+
+
+@job_queue.job(DRAIN_OUTBOX_JOB)
+async def drain_outbox() -> None:
+    """
+    Задача черги: відправляє всі готові листи з email_outbox
+    """
+    await outbox_worker.drain()
+
+
+async def schedule_outbox_drain() -> None:
+    """
+    Ставить у чергу задачу відправлення листів. Поки така задача чекає
+    або виконується, нова не додається; якщо черга переповнена, листи відправить наступний
+    періодичний запуск
+    """
+    if not settings.EMAIL_OUTBOX_WORKER:
+        return
+    with contextlib.suppress(JobQueueFull, RedisError):
+        await job_queue.enqueue(DRAIN_OUTBOX_JOB, key=DRAIN_OUTBOX_JOB)
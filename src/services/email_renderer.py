@@ -0,0 +1,121 @@
+import base64
+from email.header import Header
+from email.utils import formataddr, formatdate, make_msgid
+from pathlib import Path
+from typing import Dict, Optional, Union
+from jinja2 import Environment, FileSystemLoader, Template, nodes, select_autoescape
+from markupsafe import escape
+
+
+class CompiledEmail:
+    """
+    Шаблон листа, підготовлений до відправлення: скомпільований шаблон Jinja,
+    його статичні частини та незмінні заголовки MIME
+    """
+
+    def __init__(self, template: Template, segments: Optional[list], headers: bytes):
+        self.template = template
+        # Чергування статичного тексту і назв змінних: [текст, змінна, текст, ...].
+        # None, якщо в шаблоні є щось, крім підстановки змінних
+        self.segments = segments
+        self.headers = headers
+
+    def render_html(self, context: dict) -> str:
+        if self.segments is None:
+            return self.template.render(**context)
+        parts = self.segments[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = escape(context.get(parts[i], ""))
+        return "".join(parts)
+
+
+def static_segments(env: Environment, source: str) -> Optional[list]:
+    """
+    Розбиває шаблон на статичний текст і змінні, якщо він складається лише з
+    підстановок виду {{ name }}. Такий шаблон рендериться простим з'єднанням рядків
+    :param env: Оточення Jinja
+    :param source: Текст шаблону
+    :return: Список [текст, змінна, текст, ...] або None
+    """
+    segments = [""]
+    for node in env.parse(source).body:
+        if not isinstance(node, nodes.Output):
+            return None
+        for child in node.nodes:
+            if isinstance(child, nodes.TemplateData):
+                segments[-1] += child.data
+            elif isinstance(child, nodes.Name):
+                segments.extend((child.name, ""))
+            else:
+                return None
+    return segments
+
+
+def encode_header(value: str) -> str:
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+
+class EmailRenderer:
+    """
+    Рендерить листи з шаблонів. Шаблони завантажуються й компілюються один раз
+    при створенні, а заголовки, спільні для всіх листів шаблону, кешуються,
+    тож на кожен лист лишається лише підстановка даних і кодування тіла
+    """
+
+    def __init__(
+        self,
+        folder: Union[str, Path],
+        subjects: Dict[str, str],
+        sender_name: Optional[str],
+        sender_email: str,
+    ):
+        self.env = Environment(
+            loader=FileSystemLoader(folder),
+            autoescape=select_autoescape(["html"]),
+            auto_reload=False,
+        )
+        self.sender = sender_email
+        self.domain = sender_email.rpartition("@")[2]
+        sender = formataddr((sender_name, sender_email))
+        self._compiled: Dict[str, CompiledEmail] = {}
+        for name, subject in subjects.items():
+            source, _, _ = self.env.loader.get_source(self.env, f"{name}.html")
+            headers = (
+                f"From: {sender}\r\n"
+                f"Subject: {encode_header(subject)}\r\n"
+                "MIME-Version: 1.0\r\n"
+                'Content-Type: text/html; charset="utf-8"\r\n'
+                "Content-Transfer-Encoding: base64\r\n"
+            )
+            self._compiled[name] = CompiledEmail(
+                self.env.get_template(f"{name}.html"),
+                static_segments(self.env, source),
+                headers.encode("ascii"),
+            )
+
+    def render_html(self, name: str, context: dict) -> str:
+        """
+        Рендерить HTML-тіло листа
+        :param name: Назва шаблону
+        :param context: Дані для шаблону
+        """
+        return self._compiled[name].render_html(context)
+
+    def render(self, name: str, recipient: str, context: dict) -> bytes:
+        """
+        Рендерить повний лист у форматі MIME, готовий до передачі по SMTP
+        :param name: Назва шаблону
+        :param recipient: Адреса отримувача
+        :param context: Дані для шаблону
+        :return: Лист у байтах
+        """
+        if "\r" in recipient or "\n" in recipient:
+            raise ValueError("Некоректна адреса отримувача")
+        compiled = self._compiled[name]
+        body = base64.encodebytes(compiled.render_html(context).encode("utf-8"))
+        headers = (
+            f"To: {recipient}\r\n"
+            f"Date: {formatdate(usegmt=True)}\r\n"
+            f"Message-ID: {make_msgid(domain=self.domain)}\r\n\r\n"
+        )
+        return compiled.headers + headers.encode("ascii") + body.replace(b"\n", b"\r\n")
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+from passlib.context import CryptContext
+from src.conf.config import settings
+from src.services.metrics import Histogram, LATENCY_BUCKETS
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    """
+    Хешує пароль (синхронно, блокує потік на час обчислення bcrypt)
+    """
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """
+    Перевіряє пароль (синхронно, блокує потік на час обчислення bcrypt)
+    """
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Черга на хешування переповнена
+    """
+
+
+class PasswordHasher:
+    """
+    Виконує bcrypt у пулі потоків або процесів, щоб не блокувати цикл подій.
+    Одночасно в пул передається не більше workers обчислень: решта чекає на
+    семафорі, а коли таких більше за max_queued, нові відхиляються одразу
+    """
+
+    def __init__(self, executor: str, workers: int, max_queued: int):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Невідомий тип пулу для хешування: {executor}")
+        self.executor_type = executor
+        self.workers = workers
+        self.max_queued = max_queued
+        # Час самого обчислення і час очікування на вільний потік окремо
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running = 0
+        self._queued = 0
+        self._peak_queued = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.executor_type == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hash"
+                    )
+            return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Семафор прив'язаний до циклу подій, тож для нового циклу створюється новий
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _run(self, fn: Callable, *args):
+        semaphore = self._get_semaphore()
+        with self._lock:
+            if semaphore.locked():
+                if self._queued >= self.max_queued:
+                    self._rejected += 1
+                    raise PasswordHasherBusy()
+                self._peak_queued = max(self._peak_queued, self._queued + 1)
+            self._queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            with self._lock:
+                self._queued -= 1
+        self.queue_wait.observe(time.perf_counter() - queued_at)
+
+        with self._lock:
+            self._running += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), fn, *args
+            )
+        finally:
+            self.duration.observe(time.perf_counter() - start)
+            with self._lock:
+                self._running -= 1
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        """
+        Хешує пароль у пулі
+        :param password: Пароль у відкритому вигляді
+        :return: Хеш bcrypt
+        :raises PasswordHasherBusy: Якщо черга на хешування переповнена
+        """
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: Optional[str]) -> bool:
+        """
+        Перевіряє пароль у пулі
+        :param plain_password: Пароль у відкритому вигляді
+        :param hashed_password: Збережений хеш
+        :return: True, якщо пароль правильний
+        :raises PasswordHasherBusy: Якщо черга на хешування переповнена
+        """
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        """
+        Повертає стан пулу: виконувані та ті, що чекають у черзі, обчислення
+        :return: Словник зі статистикою
+        """
+        with self._lock:
+            running, queued = self._running, self._queued
+            peak_queued, rejected = self._peak_queued, self._rejected
+        return {
+            "executor": self.executor_type,
+            "workers": self.workers,
+            "running": running,
+            "queued": queued,
+            "peak_queued": peak_queued,
+            "max_queued": self.max_queued,
+            "rejected": rejected,
+            "queue_wait": self.queue_wait.snapshot(),
+            "duration": self.duration.snapshot(),
+        }
+
+    def shutdown(self) -> None:
+        """
+        Зупиняє пул (під час зупинки додатку)
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_EXECUTOR,
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_MAX_QUEUED,
+)
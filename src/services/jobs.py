@@ -0,0 +1,506 @@
+import asyncio
+import contextlib
+import json
+import math
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from src.conf.config import settings
+from src.database.redis import get_redis
+from src.services.cache import TTLCache
+from src.services.metrics import Counters, Histogram, LATENCY_BUCKETS
+
+JOBS_PENDING_KEY = "jobs:pending"
+# Задачі, які виконуються, з часом, після якого вони вважаються втраченими
+JOBS_PROCESSING_KEY = "jobs:processing"
+# Задачі, відкладені до повторної спроби, з часом готовності
+JOBS_DELAYED_KEY = "jobs:delayed"
+JOB_STATUS_PREFIX = "jobs:status:"
+JOB_KEY_PREFIX = "jobs:key:"
+
+# Додає задачу, якщо черга не переповнена і задачі з тим самим ключем ще немає.
+# Повертає 1 — додано, 0 — дублікат, -1 — черга переповнена
+ENQUEUE_LUA = """
+if #KEYS == 2 and not redis.call('SET', KEYS[2], '1', 'NX', 'EX', ARGV[3]) then
+    return 0
+end
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+    if #KEYS == 2 then
+        redis.call('DEL', KEYS[2])
+    end
+    return -1
+end
+redis.call('LPUSH', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Забирає задачу з черги, запам'ятовуючи її серед тих, що виконуються
+CLAIM_LUA = """
+local payload = redis.call('RPOP', KEYS[1])
+if not payload then
+    return false
+end
+redis.call('ZADD', KEYS[2], ARGV[1], payload)
+return payload
+"""
+
+# Повертає в чергу відкладені задачі, час яких настав, і задачі процесів,
+# що не завершили їх вчасно (наприклад, впали)
+REQUEUE_LUA = """
+local moved = 0
+for i = 1, 2 do
+    local due = redis.call('ZRANGEBYSCORE', KEYS[i], '-inf', ARGV[1], 'LIMIT', 0, 100)
+    for _, payload in ipairs(due) do
+        redis.call('ZREM', KEYS[i], payload)
+        redis.call('LPUSH', KEYS[3], payload)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+
+class JobQueueFull(Exception):
+    """
+    Черга задач переповнена: задачу не прийнято
+    """
+
+
+class Job:
+    """
+    Задача черги: назва обробника та його аргументи
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kwargs: Optional[dict] = None,
+        key: Optional[str] = None,
+        id: Optional[str] = None,
+        attempts: int = 0,
+        enqueued_at: Optional[float] = None,
+    ):
+        self.id = id or uuid.uuid4().hex
+        self.name = name
+        self.kwargs = kwargs or {}
+        self.key = key
+        self.attempts = attempts
+        self.enqueued_at = enqueued_at or time.time()
+        # Рядок, під яким задача зберігається в Redis
+        self.payload: Optional[str] = None
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {
+                "id": self.id,
+                "name": self.name,
+                "kwargs": self.kwargs,
+                "key": self.key,
+                "attempts": self.attempts,
+                "enqueued_at": self.enqueued_at,
+            }
+        )
+
+    @classmethod
+    def loads(cls, payload: str) -> "Job":
+        job = cls(**json.loads(payload))
+        job.payload = payload
+        return job
+
+
+class MemoryBackend:
+    """
+    Черга в пам'яті процесу: задачі втрачаються під час перезапуску
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        # Ключі задач, що чекають у черзі, виконуються або чекають повтору
+        self._keys = set()
+        self._retries: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.maxsize)
+
+    def stop(self) -> None:
+        self._queue = None
+        self._keys.clear()
+        for task in self._retries:
+            task.cancel()
+
+    async def push(self, job: Job) -> bool:
+        if job.key is not None and job.key in self._keys:
+            return False
+        self.start()
+        if self._queue.full():
+            raise JobQueueFull(job.name)
+        self._queue.put_nowait(job)
+        if job.key is not None:
+            self._keys.add(job.key)
+        return True
+
+    async def pop(self) -> Job:
+        return await self._queue.get()
+
+    async def ack(self, job: Job) -> None:
+        self._keys.discard(job.key)
+
+    async def retry(
+        self,
+        job: Job,
+        delay: float,
+        on_drop: Optional[Callable[[Job], Awaitable]] = None,
+    ) -> None:
+        task = asyncio.create_task(self._requeue(job, delay, on_drop))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue(
+        self, job: Job, delay: float, on_drop: Optional[Callable[[Job], Awaitable]]
+    ) -> None:
+        await asyncio.sleep(delay)
+        if self._queue is None:
+            return
+        if self._queue.full():
+            # Повтор не вмістився: задача завершується, ключ звільняється
+            self._keys.discard(job.key)
+            if on_drop is not None:
+                await on_drop(job)
+            return
+        self._queue.put_nowait(job)
+
+    async def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+
+class RedisBackend:
+    """
+    Черга в Redis, спільна для всіх процесів. Задача лишається в Redis, поки
+    її не виконано, тож після перезапуску або падіння процесу вона не губиться
+    """
+
+    def __init__(self, maxsize: int, visibility_timeout: float, poll_interval: float):
+        self.maxsize = maxsize
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.redis: Optional[Redis] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._last_requeue = 0.0
+        self._scripts: Dict[str, Callable] = {}
+        self._scripts_client: Optional[Redis] = None
+
+    def client(self) -> Redis:
+        return self.redis or get_redis()
+
+    def _script(self, source: str) -> Callable:
+        redis = self.client()
+        if self._scripts_client is not redis:
+            self._scripts = {}
+            self._scripts_client = redis
+        if source not in self._scripts:
+            self._scripts[source] = redis.register_script(source)
+        return self._scripts[source]
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+
+    def stop(self) -> None:
+        self._wake = None
+
+    async def push(self, job: Job) -> bool:
+        keys = [JOBS_PENDING_KEY]
+        if job.key is not None:
+            keys.append(f"{JOB_KEY_PREFIX}{job.key}")
+        added = await self._script(ENQUEUE_LUA)(
+            keys=keys,
+            args=[job.dumps(), self.maxsize, max(1, math.ceil(self.visibility_timeout))],
+        )
+        if added < 0:
+            raise JobQueueFull(job.name)
+        if added and self._wake is not None:
+            self._wake.set()
+        return bool(added)
+
+    async def pop(self) -> Job:
+        while True:
+            now = time.time()
+            if now - self._last_requeue >= self.poll_interval:
+                self._last_requeue = now
+                await self._script(REQUEUE_LUA)(
+                    keys=[JOBS_DELAYED_KEY, JOBS_PROCESSING_KEY, JOBS_PENDING_KEY],
+                    args=[now],
+                )
+            payload = await self._script(CLAIM_LUA)(
+                keys=[JOBS_PENDING_KEY, JOBS_PROCESSING_KEY],
+                args=[now + self.visibility_timeout],
+            )
+            if payload:
+                return Job.loads(payload)
+            self._wake.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+
+    async def ack(self, job: Job) -> None:
+        pipe = self.client().pipeline(transaction=True)
+        pipe.zrem(JOBS_PROCESSING_KEY, job.payload)
+        if job.key is not None:
+            pipe.delete(f"{JOB_KEY_PREFIX}{job.key}")
+        await pipe.execute()
+
+    async def retry(
+        self,
+        job: Job,
+        delay: float,
+        on_drop: Optional[Callable[[Job], Awaitable]] = None,
+    ) -> None:
+        # Відкладені задачі не обмежені maxsize, тож on_drop не викликається
+        pipe = self.client().pipeline(transaction=True)
+        pipe.zrem(JOBS_PROCESSING_KEY, job.payload)
+        pipe.zadd(JOBS_DELAYED_KEY, {job.dumps(): time.time() + delay})
+        if job.key is not None:
+            # Ключ тримається до завершення задачі, включно з очікуванням повтору
+            pipe.expire(
+                f"{JOB_KEY_PREFIX}{job.key}",
+                math.ceil(delay + self.visibility_timeout),
+            )
+        await pipe.execute()
+
+    async def depth(self) -> int:
+        return await self.client().llen(JOBS_PENDING_KEY)
+
+
+class JobQueue:
+    """
+    Черга фонових задач з пулом обробників у циклі подій. Кількість одночасних
+    задач обмежена кількістю обробників, розмір черги — maxsize: переповнена
+    черга відхиляє нові задачі (JobQueueFull), а не накопичує їх без меж.
+    Невдалі задачі повторюються з експоненційною затримкою
+    """
+
+    def __init__(
+        self,
+        backend,
+        workers: int,
+        max_attempts: int,
+        retry_base: float,
+        status_ttl: float,
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.handlers: Dict[str, Callable[..., Awaitable]] = {}
+        self.metrics = Counters(
+            "enqueued", "duplicates", "rejected", "succeeded", "retried", "failed"
+        )
+        # Від постановки в чергу до початку виконання
+        self.wait_time = Histogram(LATENCY_BUCKETS)
+        self.run_time = Histogram(LATENCY_BUCKETS)
+        self.running = 0
+        self._statuses = TTLCache(100_000, status_ttl)
+        self._periodic: Dict[str, float] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def job(self, name: str):
+        """
+        Декоратор, що реєструє обробник задачі
+        :param name: Назва задачі
+        """
+
+        def register(fn: Callable[..., Awaitable]):
+            self.handlers[name] = fn
+            return fn
+
+        return register
+
+    def every(self, interval: float, name: str) -> None:
+        """
+        Ставить задачу в чергу періодично, поки черга працює
+        :param interval: Інтервал у секундах
+        :param name: Назва задачі
+        """
+        self._periodic[name] = interval
+
+    async def enqueue(self, name: str, key: Optional[str] = None, **kwargs) -> Optional[str]:
+        """
+        Ставить задачу в чергу
+        :param name: Назва зареєстрованої задачі
+        :param key: Ключ унікальності: поки задача з таким ключем чекає в черзі або виконується, нова не додається
+        :param kwargs: Аргументи обробника (мають серіалізуватися в JSON)
+        :return: ID задачі або None, якщо така задача вже в черзі
+        :raises JobQueueFull: Якщо черга переповнена
+        """
+        if name not in self.handlers:
+            raise ValueError(f"Невідома задача: {name}")
+        job = Job(name, kwargs, key)
+        try:
+            added = await self.backend.push(job)
+        except JobQueueFull:
+            self.metrics.inc("rejected")
+            raise
+        if not added:
+            self.metrics.inc("duplicates")
+            return None
+        self.metrics.inc("enqueued")
+        await self._set_status(job, "queued")
+        return job.id
+
+    async def status(self, job_id: str) -> Optional[dict]:
+        """
+        Повертає стан задачі
+        :param job_id: ID задачі
+        :return: Словник зі станом або None, якщо задача невідома
+        """
+        status = self._statuses.get(job_id)
+        if status is None and isinstance(self.backend, RedisBackend):
+            with contextlib.suppress(RedisError):
+                raw = await self.backend.client().get(f"{JOB_STATUS_PREFIX}{job_id}")
+                status = json.loads(raw) if raw else None
+        return status
+
+    async def _set_status(self, job: Job, state: str, error: Optional[str] = None) -> None:
+        status = {
+            "id": job.id,
+            "name": job.name,
+            "status": state,
+            "attempts": job.attempts,
+            "enqueued_at": job.enqueued_at,
+            "updated_at": time.time(),
+            "error": error,
+        }
+        self._statuses.set(job.id, status)
+        if isinstance(self.backend, RedisBackend):
+            with contextlib.suppress(RedisError):
+                await self.backend.client().set(
+                    f"{JOB_STATUS_PREFIX}{job.id}",
+                    json.dumps(status),
+                    ex=int(self._statuses.ttl),
+                )
+
+    async def run_job(self, job: Job) -> None:
+        """
+        Виконує одну задачу: у разі помилки планує повтор або позначає її невдалою
+        """
+        job.attempts += 1
+        self.wait_time.observe(max(time.time() - job.enqueued_at, 0.0))
+        await self._set_status(job, "running")
+        self.running += 1
+        start = time.perf_counter()
+        try:
+            await self.handlers[job.name](**job.kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            if job.attempts < self.max_attempts:
+                self.metrics.inc("retried")
+                await self.backend.retry(
+                    job, self.retry_base * 2 ** (job.attempts - 1), self._retry_dropped
+                )
+                await self._set_status(job, "retrying", repr(err))
+            else:
+                self.metrics.inc("failed")
+                await self.backend.ack(job)
+                await self._set_status(job, "failed", repr(err))
+        else:
+            self.metrics.inc("succeeded")
+            await self.backend.ack(job)
+            await self._set_status(job, "succeeded")
+        finally:
+            self.running -= 1
+            self.run_time.observe(time.perf_counter() - start)
+
+    async def _retry_dropped(self, job: Job) -> None:
+        """
+        Повтор не вмістився в переповнену чергу: задача вважається невдалою
+        """
+        self.metrics.inc("rejected")
+        self.metrics.inc("failed")
+        await self._set_status(job, "failed", "queue full")
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await self.backend.pop()
+                if job.name not in self.handlers:
+                    await self.backend.ack(job)
+                    await self._set_status(job, "failed", "unknown job")
+                    continue
+                await self.run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Збій сховища черги не повинен зупиняти обробник
+                await asyncio.sleep(1)
+
+    async def _tick(self, name: str, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            with contextlib.suppress(JobQueueFull, RedisError):
+                await self.enqueue(name, key=name)
+
+    async def start(self) -> None:
+        """
+        Запускає обробники та періодичні задачі
+        """
+        if self._tasks:
+            return
+        self.backend.start()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks += [
+            asyncio.create_task(self._tick(name, interval))
+            for name, interval in self._periodic.items()
+        ]
+
+    async def stop(self) -> None:
+        """
+        Зупиняє обробники. Задачі, що не встигли виконатися, лишаються
+        в Redis; у черзі в пам'яті вони втрачаються
+        """
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self.backend.stop()
+
+    async def stats(self) -> dict:
+        """
+        Повертає глибину черги, кількість задач, що виконуються, та лічильники
+        """
+        try:
+            depth = await self.backend.depth()
+        except RedisError:
+            depth = None
+        return {
+            **self.metrics.snapshot(),
+            "backend": type(self.backend).__name__,
+            "workers": self.workers,
+            "running": self.running,
+            "depth": depth,
+            "wait_time": self.wait_time.snapshot(),
+            "run_time": self.run_time.snapshot(),
+        }
+
+
+def create_backend():
+    if settings.JOB_QUEUE_BACKEND == "redis":
+        return RedisBackend(
+            settings.JOB_QUEUE_MAXSIZE,
+            settings.JOB_VISIBILITY_SECONDS,
+            settings.JOB_POLL_SECONDS,
+        )
+    return MemoryBackend(settings.JOB_QUEUE_MAXSIZE)
+
+
+job_queue = JobQueue(
+    create_backend(),
+    workers=settings.JOB_QUEUE_WORKERS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_base=settings.JOB_RETRY_BASE_SECONDS,
+    status_ttl=settings.JOB_STATUS_TTL,
+)
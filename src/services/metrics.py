@@ -0,0 +1,75 @@
+import bisect
+import threading
+from typing import Dict, Sequence
+
+
+class Histogram:
+    """
+    Проста гістограма з фіксованими межами кошиків (у секундах).
+    Потокобезпечна, щоб її можна було оновлювати з потоків пулу з'єднань.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Реєструє одне спостереження
+        :param value: Значення спостереження
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        """
+        Повертає кумулятивний знімок гістограми
+        :return: Словник з кошиками, кількістю та сумою спостережень
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        buckets: Dict[str, int] = {}
+        running = 0
+        for bound, value in zip(self.buckets, counts):
+            running += value
+            buckets[f"le_{bound}"] = running
+        buckets["le_inf"] = count
+        return {"buckets": buckets, "count": count, "sum": round(total, 6)}
+
+
+class Counters:
+    """
+    Набір іменованих лічильників
+    """
+
+    def __init__(self, *names: str):
+        self._values: Dict[str, int] = {name: 0 for name in names}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        """
+        Збільшує лічильник
+        :param name: Назва лічильника
+        :param amount: Величина приросту
+        """
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def get(self, name: str) -> int:
+        return self._values.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values)
+
+
+# Межі кошиків для затримок: від 1 мс до 10 с
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
@@ -0,0 +1,213 @@
+import math
+import time
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from src.conf.config import settings
+from src.database.redis import get_redis
+from src.services.cache import TTLCache
+from src.services.metrics import Counters
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Ковзне вікно з двох фіксованих: лічильник попереднього вікна зважується
+# часткою, що ще потрапляє у ковзне. Видає до ARGV[4] дозволів за раз.
+# Спершу повертає ARGV[5] невикористаних дозволів попереднього пакета
+# у вікно KEYS[3], з якого їх було видано (якщо воно ще не застаріло).
+# Повертає {видано, через скільки мс повторити}
+SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local unused = tonumber(ARGV[5])
+if unused > 0 then
+    local charged = tonumber(redis.call('GET', KEYS[3]) or '0')
+    unused = math.min(unused, charged)
+    if unused > 0 then
+        redis.call('DECRBY', KEYS[3], unused)
+    end
+end
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local elapsed = now % window
+local used = math.floor(previous * (window - elapsed) / window) + current
+local granted = math.min(requested, limit - used)
+if granted <= 0 then
+    return {0, window - elapsed}
+end
+redis.call('INCRBY', KEYS[1], granted)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {granted, 0}
+"""
+
+
+class RatePolicy:
+    """
+    Політика обмеження: не більше limit запитів за window секунд
+    """
+
+    def __init__(self, name: str, limit: int, window: float, lease_divisor: int):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        # Скільки дозволів процес бере з Redis за раз; для малих лімітів — по одному
+        self.lease_size = max(1, limit // lease_divisor)
+        # Пакет живе не довше, ніж потрібно, щоб витратити його на межі ліміту
+        self.lease_seconds = window / lease_divisor
+
+    @classmethod
+    def parse(cls, name: str, spec: str, lease_divisor: int) -> "RatePolicy":
+        """
+        Створює політику з рядка виду "10/minute"
+        """
+        try:
+            count, period = spec.split("/")
+            return cls(name, int(count), PERIODS[period.strip()], lease_divisor)
+        except (ValueError, KeyError):
+            raise ValueError(f"Некоректний ліміт для {name}: {spec!r}")
+
+
+class RateLimiter:
+    """
+    Розподілений обмежувач частоти запитів. Лічильники ковзного вікна
+    зберігаються в Redis і спільні для всіх процесів. Кожен процес отримує
+    дозволи пакетами й витрачає їх локально, тож більшість запитів не
+    звертається до Redis. Невикористаний залишок простроченого пакета
+    повертається в Redis разом із запитом наступного, тож повільний клієнт
+    не витрачає ліміт даремно. Якщо Redis недоступний, запити пропускаються
+    """
+
+    def __init__(
+        self,
+        policies: Dict[str, str],
+        lease_seconds: float,
+        lease_divisor: int,
+        cache_size: int = 100_000,
+    ):
+        self.policies = {
+            name: RatePolicy.parse(name, spec, lease_divisor)
+            for name, spec in policies.items()
+        }
+        self.lease_seconds = lease_seconds
+        self.redis: Optional[Redis] = None
+        self.metrics = Counters(
+            "allowed_local", "allowed_redis", "denied", "returned", "redis_errors"
+        )
+        # (політика, ідентифікатор) -> [залишок дозволів, через скільки повторити,
+        # коли пакет спливає (monotonic), ключ вікна, з якого видано пакет].
+        # Запис живе довше за пакет, поки вікно, з якого його видано, ще в Redis,
+        # щоб залишок можна було повернути
+        longest = max((p.window for p in self.policies.values()), default=60)
+        self._leases = TTLCache(cache_size, ttl=longest * 2)
+        self._script = None
+        self._script_client: Optional[Redis] = None
+        self._skip_redis_until = 0.0
+
+    def _sliding_window(self):
+        redis = self.redis or get_redis()
+        if self._script_client is not redis:
+            self._script = redis.register_script(SLIDING_WINDOW_LUA)
+            self._script_client = redis
+        return self._script
+
+    async def hit(self, name: str, identity: str) -> Tuple[bool, float]:
+        """
+        Реєструє запит за політикою name
+        :param name: Назва політики
+        :param identity: Ідентифікатор клієнта (наприклад, IP)
+        :return: (чи дозволено, через скільки секунд повторити)
+        """
+        policy = self.policies.get(name)
+        if policy is None:
+            return True, 0.0
+
+        key = (name, identity)
+        now = time.monotonic()
+        lease = self._leases.get(key)
+        if lease is not None and lease[2] > now:
+            if lease[0] > 0:
+                lease[0] -= 1
+                if lease[0] == 0:
+                    self._leases.delete(key)
+                self.metrics.inc("allowed_local")
+                return True, 0.0
+            self.metrics.inc("denied")
+            return False, lease[1]
+
+        if now < self._skip_redis_until:
+            return True, 0.0
+
+        window_ms = int(policy.window * 1000)
+        now_ms = int(time.time() * 1000)
+        index = now_ms // window_ms
+        prefix = f"rl:{{{name}:{identity}}}"
+        current_key = f"{prefix}:{index}"
+        # Залишок простроченого пакета повертається у вікно, з якого його видано
+        unused, charged_key = 0, current_key
+        if lease is not None and lease[3] is not None:
+            unused, charged_key = lease[0], lease[3]
+        try:
+            granted, retry_ms = await self._sliding_window()(
+                keys=[current_key, f"{prefix}:{index - 1}", charged_key],
+                args=[policy.limit, window_ms, now_ms, policy.lease_size, unused],
+            )
+        except RedisError:
+            # Краще пропустити запит, ніж відмовити всім через збій Redis
+            self.metrics.inc("redis_errors")
+            self._skip_redis_until = now + 1.0
+            return True, 0.0
+
+        self._leases.delete(key)
+        if unused:
+            self.metrics.inc("returned", unused)
+        lease_seconds = min(self.lease_seconds, policy.lease_seconds)
+        if granted > 0:
+            self.metrics.inc("allowed_redis")
+            if granted > 1:
+                self._leases.set(key, [granted - 1, 0.0, now + lease_seconds, current_key])
+            return True, 0.0
+
+        retry_after = retry_ms / 1000
+        # Відмову теж запам'ятовуємо, щоб надлишкові запити не йшли в Redis
+        expires = now + min(retry_after, lease_seconds)
+        self._leases.set(key, [0, retry_after, expires, None])
+        self.metrics.inc("denied")
+        return False, retry_after
+
+    def clear(self) -> None:
+        self._leases.clear()
+        self._skip_redis_until = 0.0
+
+    def stats(self) -> dict:
+        """
+        Повертає статистику обмежувача
+        """
+        return {**self.metrics.snapshot(), "leases": len(self._leases)}
+
+
+rate_limiter = RateLimiter(
+    settings.RATE_LIMITS,
+    settings.RATE_LIMIT_LEASE_SECONDS,
+    settings.RATE_LIMIT_LEASE_DIVISOR,
+)
+
+
+def rate_limit(name: str):
+    """
+    Залежність FastAPI, що застосовує політику name до IP-адреси клієнта
+    :param name: Назва політики з налаштування RATE_LIMITS
+    """
+
+    async def dependency(request: Request) -> None:
+        identity = request.client.host if request.client else "unknown"
+        allowed, retry_after = await rate_limiter.hit(name, identity)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Забагато запитів, спробуйте пізніше",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    return dependency
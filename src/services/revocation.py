@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import hashlib
+import math
+import time
+from typing import Iterable, Optional, Set
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from src.conf.config import settings
+from src.database.redis import get_redis
+from src.services.metrics import Counters
+
+REVOKED_KEY_PREFIX = "revoked:jti:"
+# Відкликані jti з часом закінчення дії токена як оцінкою, для синхронізації фільтрів
+REVOKED_INDEX_KEY = "revoked:jti"
+
+
+class BloomFilter:
+    """
+    Фільтр Блума: перевірка належності без хибнонегативних відповідей.
+    Відповідь «немає» точна, «можливо є» треба підтвердити
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationStore:
+    """
+    Сховище відкликаних токенів за jti. Джерелом правди є Redis: окремий ключ
+    на кожен jti з TTL до закінчення дії токена. Кожен процес тримає фільтр
+    Блума з відкликаних jti, який періодично синхронізується з Redis, тож
+    перевірка невідкликаного токена не потребує запиту до Redis
+    """
+
+    def __init__(self, capacity: int, error_rate: float, sync_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.redis: Optional[Redis] = None
+        self.metrics = Counters(
+            "checks", "redis_checks", "redis_errors", "revoked", "syncs", "sync_errors"
+        )
+        self._filter = BloomFilter(capacity, error_rate)
+        self._revoked_since_sync: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _redis(self) -> Redis:
+        return self.redis or get_redis()
+
+    async def revoke(self, jti: str, exp: float) -> None:
+        """
+        Відкликає токен до моменту закінчення його дії
+        :param jti: Ідентифікатор токена
+        :param exp: Час закінчення дії токена (Unix time)
+        """
+        ttl = int(math.ceil(exp - time.time()))
+        if ttl <= 0:
+            return
+        pipe = self._redis().pipeline(transaction=False)
+        pipe.set(f"{REVOKED_KEY_PREFIX}{jti}", 1, ex=ttl)
+        pipe.zadd(REVOKED_INDEX_KEY, {jti: exp})
+        await pipe.execute()
+        self._filter.add(jti)
+        self._revoked_since_sync.add(jti)
+        self.metrics.inc("revoked")
+
+    async def is_revoked(self, jti: Optional[str]) -> bool:
+        """
+        Чи відкликано токен. Звертається до Redis лише тоді, коли jti є у фільтрі
+        :param jti: Ідентифікатор токена (токени без jti відкликати неможливо)
+        :return: True, якщо токен відкликано
+        """
+        self.metrics.inc("checks")
+        if jti is None or jti not in self._filter:
+            return False
+        self.metrics.inc("redis_checks")
+        try:
+            return bool(await self._redis().exists(f"{REVOKED_KEY_PREFIX}{jti}"))
+        except RedisError:
+            # Підтвердити неможливо: для токена з фільтра безпечніше відмовити
+            self.metrics.inc("redis_errors")
+            return True
+
+    async def sync(self) -> None:
+        """
+        Перебудовує фільтр з Redis, прибираючи записи прострочених токенів
+        """
+        self._revoked_since_sync = set()
+        now = time.time()
+        pipe = self._redis().pipeline(transaction=False)
+        pipe.zremrangebyscore(REVOKED_INDEX_KEY, "-inf", now)
+        pipe.zrangebyscore(REVOKED_INDEX_KEY, now, "+inf")
+        _, revoked = await pipe.execute()
+
+        bloom = BloomFilter(max(self.capacity, 2 * len(revoked)), self.error_rate)
+        # Відкликання цього процесу, зроблені під час синхронізації, не губляться
+        for jti in (*revoked, *self._revoked_since_sync):
+            bloom.add(jti)
+        self._filter = bloom
+        self.metrics.inc("syncs")
+
+    async def start(self) -> None:
+        """
+        Запускає періодичну синхронізацію фільтра
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _sync_forever(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.metrics.inc("sync_errors")
+            await asyncio.sleep(self.sync_interval)
+
+    def stats(self) -> dict:
+        """
+        Повертає статистику перевірок і стан фільтра
+        """
+        return {
+            **self.metrics.snapshot(),
+            "filter_items": self._filter.count,
+            "filter_bits": self._filter.size,
+        }
+
+
+revocation_store = RevocationStore(
+    settings.REVOCATION_FILTER_CAPACITY,
+    settings.REVOCATION_FILTER_ERROR_RATE,
+    settings.REVOCATION_SYNC_SECONDS,
+)
@@ -1,33 +1,306 @@
 import cloudinary
 import cloudinary.uploader
 import asyncio
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from PIL import Image, ImageOps
+from src.conf.config import settings
+
+# Сигнатури на початку файлу для підтримуваних форматів зображень
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+SNIFF_BYTES = 12
+# Запас на межі та заголовки частин multipart/form-data понад розмір файлу
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """
+    Визначає тип зображення за першими байтами файлу, а не за заголовком клієнта
+    :param head: Щонайменше перші 12 байтів файлу
+    :return: MIME-тип або None, якщо формат не підтримується
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class ImageTooLarge(Exception):
+    """
+    Зображення має більше пікселів, ніж дозволено для аватара
+    """
+
+
+def resize_avatar(
+    handle: BinaryIO, size: int, fmt: str, quality: int, max_pixels: int
+) -> bytes:
+    """
+    Обрізає зображення до квадрата size x size по центру і перекодовує його.
+    Виконується в пулі потоків: Pillow звільняє GIL на декодуванні й масштабуванні
+    :param handle: Файл із зображенням
+    :param size: Сторона квадрата в пікселях
+    :param fmt: Формат результату: "webp" або "jpeg"
+    :param quality: Якість стиснення
+    :param max_pixels: Найбільша дозволена кількість пікселів оригіналу
+    :return: Закодоване зображення
+    :raises ImageTooLarge: Якщо зображення більше за max_pixels
+    """
+    with Image.open(handle) as image:
+        # Image.open читає лише заголовок, тож розмір перевіряється до декодування
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ImageTooLarge(f"{width}x{height}")
+        # JPEG декодується одразу зі зменшенням, якщо оригінал значно більший
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        if fmt == "jpeg" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB" if fmt == "jpeg" else "RGBA")
+        out = io.BytesIO()
+        image.save(out, format=fmt.upper(), quality=quality)
+    return out.getvalue()
+
+
+class AvatarProcessor:
+    """
+    Готує аватари локально в обмеженому пулі потоків, щоб на Cloudinary
+    передавалось і зберігалось лише зображення потрібного розміру
+    """
+
+    def __init__(
+        self, size: int, fmt: str, quality: int, workers: int, max_pixels: int
+    ):
+        self.size = size
+        self.format = fmt
+        self.quality = quality
+        self.workers = workers
+        self.max_pixels = max_pixels
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def fingerprint(self) -> bytes:
+        """
+        Параметри обробки, що входять у хеш вмісту: після їх зміни той самий
+        файл дає новий аватар і завантажується знову
+        """
+        return f"{self.size}:{self.format}:{self.quality}".encode()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="avatar"
+                )
+            return self._executor
+
+    async def process(self, handle: BinaryIO) -> bytes:
+        """
+        Зменшує зображення в пулі
+        :param handle: Файл із зображенням, встановлений на початок
+        :return: Готовий аватар
+        :raises HTTPException: 413, якщо в зображенні забагато пікселів;
+            415, якщо його не вдалося декодувати
+        """
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(),
+                resize_avatar,
+                handle,
+                self.size,
+                self.format,
+                self.quality,
+                self.max_pixels,
+            )
+        except ImageTooLarge as err:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Зображення {err} завелике: "
+                f"максимум {self.max_pixels} пікселів",
+            )
+        except (OSError, ValueError, Image.DecompressionBombError):
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Не вдалося прочитати зображення",
+            )
+
+    def shutdown(self) -> None:
+        """
+        Зупиняє пул (під час зупинки додатку)
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+avatar_processor = AvatarProcessor(
+    settings.AVATAR_SIZE,
+    settings.AVATAR_FORMAT,
+    settings.AVATAR_QUALITY,
+    settings.AVATAR_WORKERS,
+    settings.AVATAR_MAX_PIXELS,
+)
+
+
+class BodySizeLimitMiddleware:
+    """
+    Обмежує розмір тіла запиту для вказаних шляхів ще до розбору форми:
+    FastAPI читає й зберігає все тіло multipart ще до виклику обробника,
+    тож перевірка в самому обробнику не захищає від великих запитів.
+    Запит із завеликим Content-Length відхиляється одразу, без читання тіла,
+    а тіло без Content-Length (chunked) переривається, щойно перевищить ліміт
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    @staticmethod
+    def too_large(limit: int) -> str:
+        return f"Тіло запиту завелике: максимум {limit} байтів"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit():
+            if int(content_length) > limit:
+                response = JSONResponse(
+                    {"detail": self.too_large(limit)},
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI пропускає HTTPException з розбору тіла без змін
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=self.too_large(limit),
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
 
 
 class UploadFileService:
     """
     Сервіс для завантаження файлів на Cloudinary.
     """
-    def __init__(self, cloud_name, api_key, api_secret):
+    def __init__(
+        self,
+        cloud_name,
+        api_key,
+        api_secret,
+        max_bytes: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        processor: Optional[AvatarProcessor] = None,
+    ):
         cloudinary.config(
             cloud_name=cloud_name,
             api_key=api_key,
             api_secret=api_secret,
             secure=True,
         )
+        self.max_bytes = max_bytes or settings.AVATAR_MAX_BYTES
+        self.chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+        self.processor = processor or avatar_processor
+
+    def too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Файл завеликий: максимум {self.max_bytes} байтів",
+        )
+
+    async def read_upload(self, file: UploadFile) -> Tuple[BinaryIO, str, str]:
+        """
+        Перевіряє завантажений файл, читаючи його частинами: розмір не більше
+        max_bytes, формат — зображення. Тіло запиту Starlette вже зберіг у
+        тимчасовий файл (у пам'яті лише до 1 МБ), тож файл не копіюється в пам'ять;
+        розмір самого тіла до розбору форми обмежує BodySizeLimitMiddleware.
+        Заодно рахується SHA-256 вмісту разом із параметрами обробки аватара
+        :param file: Завантажений файл
+        :return: (файловий об'єкт, встановлений на початок; MIME-тип; хеш)
+        :raises HTTPException: 413, якщо файл завеликий; 415, якщо це не зображення
+        """
+        if file.size is not None and file.size > self.max_bytes:
+            raise self.too_large()
+
+        await file.seek(0)
+        digest = hashlib.sha256(self.processor.fingerprint())
+        head, size = b"", 0
+        while chunk := await file.read(self.chunk_size):
+            if len(head) < SNIFF_BYTES:
+                head += chunk[: SNIFF_BYTES - len(head)]
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise self.too_large()
+            digest.update(chunk)
 
-    async def upload_file(self, file, username: str) -> str:
+        content_type = sniff_image_type(head)
+        if content_type is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Підтримуються лише зображення JPEG, PNG, GIF та WebP",
+            )
+        await file.seek(0)
+        return file.file, content_type, digest.hexdigest()
+
+    async def upload_file(
+        self, file: UploadFile, username: str, current_hash: Optional[str] = None
+    ) -> Tuple[Optional[str], str]:
+        """
+        Завантажує аватар на Cloudinary. Зображення спершу зменшується локально,
+        а якщо його хеш збігається з хешем поточного аватара, завантаження
+        пропускається
+        :param file: Завантажений файл
+        :param username: Ім'я користувача, визначає public_id на Cloudinary
+        :param current_hash: Хеш поточного аватара користувача
+        :return: (URL нового аватара або None, якщо він не змінився; хеш)
+        """
         public_id = f"ContactsApp/{username}"
-        content = await file.read()
+        handle, _, content_hash = await self.read_upload(file)
+        if content_hash == current_hash:
+            return None, content_hash
+
+        avatar = await self.processor.process(handle)
 
         # Завантаження в окремому потоці, щоб не блокувати event loop
         r = await asyncio.to_thread(
             cloudinary.uploader.upload,
-            content,
+            io.BytesIO(avatar),
             public_id=public_id,
             overwrite=True,
         )
 
         src_url = cloudinary.CloudinaryImage(public_id).build_url(
-            width=250, height=250, crop="fill", version=r.get("version")
+            width=self.processor.size,
+            height=self.processor.size,
+            crop="fill",
+            version=r.get("version"),
         )
-        return src_url
+        return src_url, content_hash
@@ -1,5 +1,6 @@
 from typing import Optional
 from libgravatar import Gravatar
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.repository.users import UserRepository
 from src.schemas.user import UserCreate
@@ -10,8 +11,8 @@ class UserService:
     """
     Сервіс для роботи з користувачами
     """
-    def __init__(self, db: AsyncSession):
-        self.repository = UserRepository(db)
+    def __init__(self, db: AsyncSession, redis: Optional[Redis] = None):
+        self.repository = UserRepository(db, redis)
 
     async def create_user(self, body: UserCreate):
         avatar = None
@@ -32,11 +33,16 @@ class UserService:
     async def get_user_by_email(self, email: str):
         return await self.repository.get_user_by_email(email)
 
+    async def get_principal(self, email: str) -> Optional[User]:
+        return await self.repository.get_principal(email)
+
     async def confirmed_email(self, email: str):
         return await self.repository.confirmed_email(email)
 
-    async def update_avatar_url(self, email: str, url: str):
-        return await self.repository.update_avatar_url(email, url)
+    async def update_avatar_url(
+        self, email: str, url: str, avatar_hash: Optional[str] = None
+    ):
+        return await self.repository.update_avatar_url(email, url, avatar_hash)
 
     async def update_user(self, user_id: int, data: dict):
         return await self.repository.update_user(user_id, data)
@@ -1,12 +1,17 @@
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from fastapi.testclient import TestClient
-from src.api.auth import create_password_reset_token
+from src.services.auth import create_password_reset_token
+from src.services.auth import create_access_token, create_refresh_token
 from src.tests.conftest import client
 
 
 @patch("src.api.auth.UserService")
-@patch("src.api.auth.Hash.verify_password", return_value=True)
+@patch(
+    "src.api.auth.Hash.verify_password_async",
+    new_callable=AsyncMock,
+    return_value=True,
+)
 def test_login_success(mock_verify, mock_user_service, client):
     """
     Тестує успішний логін користувача.
@@ -32,7 +37,11 @@ def test_login_success(mock_verify, mock_user_service, client):
 
 
 @patch("src.api.auth.UserService")
-@patch("src.api.auth.Hash.verify_password", return_value=False)
+@patch(
+    "src.api.auth.Hash.verify_password_async",
+    new_callable=AsyncMock,
+    return_value=False,
+)
 def test_login_invalid_password(mock_verify, mock_user_service, client):
     """
     Тестує логін користувача з неправильним паролем.
@@ -117,6 +126,18 @@ def test_password_reset_request_non_existing_user(client):
     assert "лист буде надіслано" in response.json().get("message")
 
 
+def test_password_reset_request_rate_limited(client, mock_rate_limit_redis):
+    mock_rate_limit_redis.register_script.side_effect = lambda _: AsyncMock(
+        return_value=[0, 20000]
+    )
+    response = client.post(
+        "/auth/password-reset/request", json={"email": "deadpool@example.com"}
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "20"
+    assert response.json()["detail"] == "Забагато запитів, спробуйте пізніше"
+
+
 def test_password_reset_confirm(client):
     email = "deadpool@example.com"
     token = create_password_reset_token({"sub": email})
@@ -137,3 +158,88 @@ def test_password_reset_confirm_invalid_token(client):
     )
     assert response.status_code == 400
     assert "Невірний токен" in response.json().get("detail")
+
+
+@pytest.fixture
+def revocation_redis(monkeypatch):
+    """Підміна Redis для сховища відкликаних токенів"""
+    from src.services.revocation import revocation_store
+
+    redis = MagicMock()
+    redis.exists = AsyncMock(return_value=1)
+    redis.pipeline.return_value.execute = AsyncMock(return_value=[True, 1])
+    monkeypatch.setattr(revocation_store, "redis", redis)
+    return redis
+
+
+def test_logout_revokes_tokens(client, revocation_redis):
+    """
+    Тестує вихід: після нього ні токен доступу, ні refresh токен не працюють.
+    """
+    access_token = create_access_token({"sub": "deadpool@example.com"})
+    refresh_token = create_refresh_token({"sub": "deadpool@example.com"})
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    assert client.get("/contacts/", headers=headers).status_code == 200
+
+    response = client.post(
+        "/auth/logout", headers=headers, json={"refresh_token": refresh_token}
+    )
+    assert response.status_code == 200
+    assert revocation_redis.pipeline.return_value.execute.await_count == 2
+
+    assert client.get("/contacts/", headers=headers).status_code == 401
+    response = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+
+def test_logout_ignores_foreign_refresh_token(client, revocation_redis):
+    """
+    Тестує, що вихід не відкликає refresh токен іншого користувача.
+    """
+    access_token = create_access_token({"sub": "deadpool@example.com"})
+    foreign = create_refresh_token({"sub": "someone@example.com"})
+
+    response = client.post(
+        "/auth/logout",
+        headers={"Authorization": f"Bearer {access_token}"},
+        json={"refresh_token": foreign},
+    )
+
+    assert response.status_code == 200
+    assert revocation_redis.pipeline.return_value.execute.await_count == 1
+
+
+def test_register_user_queues_verification_email(client):
+    """
+    Тестує, що реєстрація зберігає користувача і лист підтвердження разом.
+    """
+    from sqlalchemy import select
+    from src.database.models import EmailOutbox, User
+    from src.tests.conftest import TestingSessionLocal
+
+    response = client.post(
+        "/auth/register",
+        json={
+            "username": "outbox_user",
+            "email": "outbox_user@example.com",
+            "password": "12345678",
+        },
+    )
+    assert response.status_code == 201
+
+    async def stored():
+        async with TestingSessionLocal() as session:
+            user = await session.scalar(
+                select(User).where(User.email == "outbox_user@example.com")
+            )
+            letters = await session.scalars(
+                select(EmailOutbox).where(
+                    EmailOutbox.recipient == "outbox_user@example.com"
+                )
+            )
+            return user, [letter.template for letter in letters]
+
+    user, templates = client.portal.call(stored)
+    assert user is not None
+    assert templates == ["verify_email"]
@@ -1,6 +1,7 @@
 from unittest.mock import AsyncMock, MagicMock
 from datetime import date, timedelta
 import pytest
+from sqlalchemy.dialects import sqlite
 from src.repository.contacts import ContactRepository
 from src.database.models import Contact, User
 from src.schemas.contact import ContactCreate, ContactUpdate
@@ -30,7 +31,7 @@ async def test_get_contacts(repo, mock_session, test_user):
     mock_scalars = MagicMock()
     mock_scalars.all.return_value = contacts
 
-    mock_result = AsyncMock()
+    mock_result = MagicMock()
     mock_result.scalars.return_value = mock_scalars
 
     mock_session.execute.return_value = mock_result
@@ -44,7 +45,7 @@ async def test_get_contacts(repo, mock_session, test_user):
 async def test_get_contact_by_id_found(repo, mock_session, test_user):
     contact = Contact(id=1, user_id=1, first_name="Bob")
 
-    mock_result = AsyncMock()
+    mock_result = MagicMock()
     mock_result.scalar_one_or_none.return_value = contact
 
     mock_session.execute.return_value = mock_result
@@ -64,20 +65,26 @@ async def test_create_contact(repo, mock_session, test_user):
         birthday=date(1990, 1, 1),
         additional_info="info",
     )
-
-    mock_session.refresh = AsyncMock()
+    created = Contact(id=1, user_id=1, **body.model_dump())
+    mock_result = MagicMock()
+    mock_result.scalar_one.return_value = created
+    mock_session.execute.return_value = mock_result
 
     result = await repo.create_contact(body, test_user)
 
-    assert isinstance(result, Contact)
-    assert result.first_name == "New"
+    assert result is created
+    mock_session.execute.assert_awaited_once()
+    assert "RETURNING" in str(mock_session.execute.call_args.args[0])
     mock_session.commit.assert_called_once()
+    mock_session.refresh.assert_not_called()
 
 
 @pytest.mark.asyncio
 async def test_update_contact_found(repo, mock_session, test_user):
-    contact = Contact(id=1, first_name="Old", user_id=1)
-    repo.get_contact_by_id = AsyncMock(return_value=contact)
+    contact = Contact(id=1, first_name="Updated", user_id=1)
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = contact
+    mock_session.execute.return_value = mock_result
 
     body = ContactUpdate(
         first_name="Updated",
@@ -87,17 +94,22 @@ async def test_update_contact_found(repo, mock_session, test_user):
         birthday=date(1990, 1, 1),
         additional_info="info",
     )
-    mock_session.refresh = AsyncMock()
 
     result = await repo.update_contact(1, body, test_user)
 
     assert result.first_name == "Updated"
+    mock_session.execute.assert_awaited_once()
+    stmt = str(mock_session.execute.call_args.args[0])
+    assert stmt.startswith("UPDATE contacts") and "RETURNING" in stmt
+    assert "contacts.user_id = :user_id_1" in stmt
     mock_session.commit.assert_called_once()
 
 
 @pytest.mark.asyncio
-async def test_update_contact_not_found(repo, test_user):
-    repo.get_contact_by_id = AsyncMock(return_value=None)
+async def test_update_contact_not_found(repo, mock_session, test_user):
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = None
+    mock_session.execute.return_value = mock_result
 
     body = ContactUpdate(
         first_name="NoOne",
@@ -116,11 +128,15 @@ async def test_update_contact_not_found(repo, test_user):
 @pytest.mark.asyncio
 async def test_delete_contact_found(repo, mock_session, test_user):
     contact = Contact(id=1, user_id=1)
-    repo.get_contact_by_id = AsyncMock(return_value=contact)
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = contact
+    mock_session.execute.return_value = mock_result
 
     result = await repo.delete_contact(1, test_user)
 
     assert result == contact
+    mock_session.execute.assert_awaited_once()
+    assert str(mock_session.execute.call_args.args[0]).startswith("DELETE FROM contacts")
     mock_session.commit.assert_called_once()
 
 
@@ -131,7 +147,7 @@ async def test_search_contacts(repo, mock_session, test_user):
     mock_scalars = MagicMock()
     mock_scalars.all.return_value = contacts
 
-    mock_result = AsyncMock()
+    mock_result = MagicMock()
     mock_result.scalars.return_value = mock_scalars
 
     mock_session.execute.return_value = mock_result
@@ -143,22 +159,389 @@ async def test_search_contacts(repo, mock_session, test_user):
 
 @pytest.mark.asyncio
 async def test_get_upcoming_birthdays(repo, mock_session, test_user):
-    today = date.today()
-    next_week = today + timedelta(days=5)
-
-    contact_1 = Contact(id=1, user_id=1, birthday=next_week)
-    contact_2 = Contact(id=2, user_id=1, birthday=today - timedelta(days=1))
-    contact_3 = Contact(id=3, user_id=1, birthday=None)
+    contact = Contact(id=1, user_id=1, birthday=date.today() + timedelta(days=5))
 
     mock_scalars = MagicMock()
-    mock_scalars.all.return_value = [contact_1, contact_2, contact_3]
+    mock_scalars.all.return_value = [contact]
 
-    mock_result = AsyncMock()
+    mock_result = MagicMock()
     mock_result.scalars.return_value = mock_scalars
 
     mock_session.execute.return_value = mock_result
 
-    result = await repo.get_upcoming_birthdays(test_user)
+    result = await repo.get_upcoming_birthdays(test_user, days=7)
 
-    assert len(result) == 1
-    assert result[0].id == 1
+    assert result == [contact]
+    mock_session.execute.assert_awaited_once()
+    compiled = str(
+        mock_session.execute.call_args.args[0].compile(dialect=sqlite.dialect())
+    )
+    assert "strftime('%m%d', contacts.birthday)" in compiled
+    assert "contacts.user_id = ?" in compiled
+
+
+def test_list_contacts_cursor_pagination(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    for i in range(5):
+        response = client.post(
+            "/contacts/",
+            headers=headers,
+            json={
+                "first_name": f"Page{i}",
+                "last_name": "Cursor",
+                "email": f"page{i}@cursor.com",
+                "phone": f"+38050000{i:04d}",
+                "birthday": "1990-01-01",
+            },
+        )
+        assert response.status_code == 201
+
+    seen = []
+    response = client.get("/contacts/", headers=headers, params={"limit": 2})
+    assert response.status_code == 200
+    seen += [c["id"] for c in response.json()]
+    while "x-next-cursor" in response.headers:
+        response = client.get(
+            "/contacts/",
+            headers=headers,
+            params={"limit": 2, "cursor": response.headers["x-next-cursor"]},
+        )
+        assert response.status_code == 200
+        seen += [c["id"] for c in response.json()]
+
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) >= 5
+
+
+def test_list_contacts_invalid_cursor(client, get_token):
+    response = client.get(
+        "/contacts/",
+        headers={"Authorization": f"Bearer {get_token}"},
+        params={"cursor": "garbage"},
+    )
+    assert response.status_code == 400
+
+
+def test_upcoming_birthdays_endpoint(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    today = date.today()
+    offsets = {"soon": 3, "later": 20, "yesterday": -1}
+    for i, (name, offset) in enumerate(offsets.items()):
+        # 1988 — високосний рік, тож підходить і 29 лютого
+        birthday = (today + timedelta(days=offset)).replace(year=1988)
+        response = client.post(
+            "/contacts/",
+            headers=headers,
+            json={
+                "first_name": name,
+                "last_name": "Birthday",
+                "email": f"{name}@birthday.com",
+                "phone": f"+38067000{i:04d}",
+                "birthday": birthday.isoformat(),
+            },
+        )
+        assert response.status_code == 201
+
+    response = client.get("/contacts/upcoming-birthdays", headers=headers)
+    names = {c["first_name"] for c in response.json()}
+    assert response.status_code == 200
+    assert "soon" in names
+    assert not names & {"later", "yesterday"}
+
+    response = client.get(
+        "/contacts/upcoming-birthdays", headers=headers, params={"days": 30}
+    )
+    names = [c["first_name"] for c in response.json() if c["last_name"] == "Birthday"]
+    assert names == ["soon", "later"]
+
+
+def test_search_contacts_endpoint(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    people = [
+        ("Alina", "Searchable", "alina@search.io"),
+        ("Vasyl", "Malinovskyi", "vasyl@search.io"),
+        ("Olena", "Searchable", "o_100%@search.io"),
+    ]
+    for i, (first, last, email) in enumerate(people):
+        response = client.post(
+            "/contacts/",
+            headers=headers,
+            json={
+                "first_name": first,
+                "last_name": last,
+                "email": email,
+                "phone": f"+38093000{i:04d}",
+                "birthday": "1990-01-01",
+            },
+        )
+        assert response.status_code == 201
+
+    response = client.get("/contacts/search", headers=headers, params={"query": "ALIN"})
+    assert response.status_code == 200
+    assert {c["first_name"] for c in response.json()} == {"Alina", "Vasyl"}
+
+    response = client.get(
+        "/contacts/search", headers=headers, params={"query": "searchable", "limit": 1}
+    )
+    assert len(response.json()) == 1
+
+    # Короткий запит і спецсимволи LIKE обробляються без індексу та екрануються
+    response = client.get("/contacts/search", headers=headers, params={"query": "0%"})
+    assert [c["first_name"] for c in response.json()] == ["Olena"]
+
+
+def test_import_contacts_csv_and_ndjson(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    csv_body = (
+        "first_name,last_name,email,phone,birthday,additional_data\n"
+        "Imp,One,imp1@bulk.com,+380990000001,1990-05-01,\n"
+        "Imp,Two,imp2@bulk.com,+380990000002,1991-06-02,note\n"
+        "Imp,Bad,not-an-email,+380990000003,1991-06-02,\n"
+    )
+    response = client.post(
+        "/contacts/import",
+        headers={**headers, "Content-Type": "text/csv"},
+        content=csv_body.encode(),
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["conflicts"], result["invalid"]) == (2, 0, 1)
+    assert result["issues"][0]["row"] == 3
+    assert result["issues_truncated"] is False
+
+    ndjson_body = (
+        '{"first_name": "Imp", "last_name": "Dup", "email": "imp1@bulk.com", '
+        '"phone": "+380990000009", "birthday": "1990-01-01"}\n'
+        '{"first_name": "Imp", "last_name": "Three", "email": "imp3@bulk.com", '
+        '"phone": "+380990000004", "birthday": "1990-01-01"}\n'
+    )
+    response = client.post(
+        "/contacts/import",
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+        content=ndjson_body.encode(),
+    )
+    result = response.json()
+    assert (result["created"], result["conflicts"]) == (1, 1)
+    assert result["issues"] == [
+        {"row": 1, "status": "conflict", "detail": result["issues"][0]["detail"]}
+    ]
+
+
+def test_import_contacts_unsupported_media_type(client, get_token):
+    response = client.post(
+        "/contacts/import",
+        headers={"Authorization": f"Bearer {get_token}", "Content-Type": "text/plain"},
+        content=b"hello",
+    )
+    assert response.status_code == 415
+
+
+@pytest.fixture
+def export_client(client):
+    from main import app
+    from src.database.db import get_session_factory
+    from src.tests.conftest import TestingSessionLocal
+
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    yield client
+
+
+def test_export_contacts_ndjson_and_csv(export_client, get_token):
+    import csv
+    import io
+    import json
+
+    headers = {"Authorization": f"Bearer {get_token}"}
+    for i in range(3):
+        response = export_client.post(
+            "/contacts/",
+            headers=headers,
+            json={
+                "first_name": f"Export{i}",
+                "last_name": "Stream",
+                "email": f"export{i}@stream.com",
+                "phone": f"+38063000{i:04d}",
+                "birthday": "1990-01-01",
+            },
+        )
+        assert response.status_code == 201
+
+    listed = export_client.get("/contacts/", headers=headers, params={"limit": 1000}).json()
+
+    response = export_client.get("/contacts/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == listed
+
+    response = export_client.get(
+        "/contacts/export", headers=headers, params={"format": "csv"}
+    )
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(r["id"]) for r in rows] == [c["id"] for c in listed]
+
+
+def test_contact_write_roundtrip(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    payload = {
+        "first_name": "Write",
+        "last_name": "Returning",
+        "email": "write@returning.com",
+        "phone": "+380661234567",
+        "birthday": "1990-01-01",
+    }
+    created = client.post("/contacts/", headers=headers, json=payload)
+    assert created.status_code == 201
+    contact_id = created.json()["id"]
+
+    updated = client.put(
+        f"/contacts/{contact_id}",
+        headers=headers,
+        json={**payload, "first_name": "Rewritten"},
+    )
+    assert updated.status_code == 200
+    assert updated.json()["first_name"] == "Rewritten"
+    assert client.get(f"/contacts/{contact_id}", headers=headers).json()["first_name"] == "Rewritten"
+
+    assert client.delete(f"/contacts/{contact_id}", headers=headers).status_code == 204
+    assert client.delete(f"/contacts/{contact_id}", headers=headers).status_code == 404
+    assert client.get(f"/contacts/{contact_id}", headers=headers).status_code == 404
+
+
+def test_batch_update_and_delete(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    ids = []
+    for i in range(3):
+        response = client.post(
+            "/contacts/",
+            headers=headers,
+            json={
+                "first_name": f"Batch{i}",
+                "last_name": "Before",
+                "email": f"batch{i}@batch.com",
+                "phone": f"+38073000{i:04d}",
+                "birthday": "1990-01-01",
+            },
+        )
+        ids.append(response.json()["id"])
+
+    response = client.patch(
+        "/contacts/batch",
+        headers=headers,
+        json={
+            "items": [
+                {"id": ids[0], "changes": {"last_name": "After"}},
+                {"id": ids[1], "changes": {"last_name": "After"}},
+                {"id": ids[2], "changes": {"first_name": "Solo"}},
+                {"id": 999999, "changes": {"last_name": "After"}},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"id": ids[0], "status": "updated"},
+        {"id": ids[1], "status": "updated"},
+        {"id": ids[2], "status": "updated"},
+        {"id": 999999, "status": "not_found"},
+    ]
+    contact = client.get(f"/contacts/{ids[1]}", headers=headers).json()
+    assert contact["last_name"] == "After"
+
+    # Однаковий email для двох контактів порушує унікальність — відкат усього пакета
+    response = client.patch(
+        "/contacts/batch",
+        headers=headers,
+        json={
+            "items": [
+                {"id": ids[0], "changes": {"first_name": "Rolled"}},
+                {"id": ids[1], "changes": {"email": "batch2@batch.com"}},
+            ]
+        },
+    )
+    assert response.status_code == 409
+    assert client.get(f"/contacts/{ids[0]}", headers=headers).json()["first_name"] == "Batch0"
+
+    response = client.patch(
+        "/contacts/batch", headers=headers, json={"items": [{"id": ids[0], "changes": {}}]}
+    )
+    assert response.status_code == 422
+
+    # Явний null для обов'язкового поля і повторювані id відхиляються схемою
+    response = client.patch(
+        "/contacts/batch",
+        headers=headers,
+        json={"items": [{"id": ids[0], "changes": {"first_name": None}}]},
+    )
+    assert response.status_code == 422
+    response = client.patch(
+        "/contacts/batch",
+        headers=headers,
+        json={
+            "items": [
+                {"id": ids[0], "changes": {"first_name": "A"}},
+                {"id": ids[0], "changes": {"last_name": "B"}},
+            ]
+        },
+    )
+    assert response.status_code == 422
+
+    # additional_data може бути NULL
+    response = client.patch(
+        "/contacts/batch",
+        headers=headers,
+        json={"items": [{"id": ids[0], "changes": {"additional_data": None}}]},
+    )
+    assert response.status_code == 200
+
+    response = client.request(
+        "DELETE", "/contacts/batch", headers=headers, json={"ids": [ids[0], ids[2], 999999]}
+    )
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == [
+        "deleted",
+        "deleted",
+        "not_found",
+    ]
+    assert client.get(f"/contacts/{ids[0]}", headers=headers).status_code == 404
+
+
+def test_batch_update_swaps_unique_fields(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    ids = []
+    for i in range(2):
+        response = client.post(
+            "/contacts/",
+            headers=headers,
+            json={
+                "first_name": f"Swap{i}",
+                "last_name": "Swap",
+                "email": f"swap{i}@swap.com",
+                "phone": f"+38074000{i:04d}",
+                "birthday": "1990-01-01",
+            },
+        )
+        ids.append(response.json()["id"])
+
+    # Обмін email і телефонами між контактами: кінцевий стан коректний
+    response = client.patch(
+        "/contacts/batch",
+        headers=headers,
+        json={
+            "items": [
+                {
+                    "id": ids[0],
+                    "changes": {"email": "swap1@swap.com", "phone": "+380740000001"},
+                },
+                {
+                    "id": ids[1],
+                    "changes": {"email": "swap0@swap.com", "phone": "+380740000000"},
+                },
+            ]
+        },
+    )
+    assert response.status_code == 200
+    first = client.get(f"/contacts/{ids[0]}", headers=headers).json()
+    second = client.get(f"/contacts/{ids[1]}", headers=headers).json()
+    assert (first["email"], first["phone"]) == ("swap1@swap.com", "+380740000001")
+    assert (second["email"], second["phone"]) == ("swap0@swap.com", "+380740000000")
@@ -15,6 +15,7 @@ mock_user_obj = SimpleNamespace(
     username="deadpool",
     confirmed=True,  # обязательно!
     avatar_url="https://example.com/avatar.jpg",
+    avatar_hash=None,
 )
 
 
@@ -53,8 +54,8 @@ def test_update_avatar(mock_upload_service, mock_user_service, client):
     """
     Тестує оновлення аватара користувача.
     """
-    mock_upload_service.return_value.upload_file.return_value = (
-        "https://cdn.cloud/avatar.png"
+    mock_upload_service.return_value.upload_file = AsyncMock(
+        return_value=("https://cdn.cloud/avatar.png", "f00d")
     )
 
     mock_user_service.return_value.update_avatar_url = AsyncMock(
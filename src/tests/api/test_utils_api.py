@@ -51,3 +51,59 @@ def test_healthchecker_db_failure(client, monkeypatch):
     response = client.get("/utils/healthchecker")  
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert response.json()["detail"] == "Error connecting to the database"
+
+
+def test_metrics_pool_stats(client):
+    """
+    Адміністратор отримує статистику пулу з'єднань.
+    """
+    from main import app
+    from src.services.auth import get_current_admin_user
+
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+
+    response = client.get("/utils/metrics")
+    assert response.status_code == 200
+    pool = response.json()["db_pool"]
+    assert pool["pool"] == "InstrumentedAsyncQueuePool"
+    assert {"size", "checked_out", "overflow", "wait_time"} <= pool.keys()
+    assert "le_inf" in pool["wait_time"]["buckets"]
+
+
+def test_metrics_redis_pool_stats(client):
+    """
+    Пул Redis відкривається в lifespan і показує зайняті та вільні з'єднання.
+    """
+    from main import app
+    from src.services.auth import get_current_admin_user
+
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+
+    response = client.get("/utils/metrics")
+    assert response.status_code == 200
+    pool = response.json()["redis_pool"]
+    assert pool["pool"] == "BlockingConnectionPool"
+    assert pool["in_use"] == 0
+    assert {"idle", "max_connections"} <= pool.keys()
+
+
+def test_job_status(client):
+    """
+    Адміністратор бачить стан фонової задачі; невідома задача — 404.
+    """
+    from main import app
+    from src.services.auth import get_current_admin_user
+    from src.services.jobs import job_queue
+
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    job_queue.handlers["test.noop"] = AsyncMock()
+
+    job_id = client.portal.call(lambda: job_queue.enqueue("test.noop"))
+    response = client.get(f"/utils/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "test.noop"
+    assert response.json()["status"] in ("queued", "running", "succeeded")
+
+    assert client.get("/utils/jobs/missing").status_code == 404
+    assert "jobs" in client.get("/utils/metrics").json()
+    del job_queue.handlers["test.noop"]
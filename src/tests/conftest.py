@@ -6,9 +6,15 @@ from sqlalchemy.pool import StaticPool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 from main import app
+from src.conf.config import settings
 from src.database.models import Base, User
 from src.database.db import get_db
+from src.repository.users import user_l1_cache
 from src.services.auth import create_access_token, Hash
+from src.services.rate_limit import rate_limiter
+
+# Листи в тестах не відправляються: фоновий процес черги не запускається
+settings.EMAIL_OUTBOX_WORKER = False
 
 # Використання бази даних SQLite для тестування
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
@@ -74,11 +80,35 @@ def client():
 # Фікстура для мокання Redis
 @pytest.fixture(autouse=True)
 def mock_redis():
-    with patch("src.repository.users.Redis") as mock_redis_class:
+    with patch("src.repository.users.get_redis") as mock_get_redis:
         mock_redis_instance = MagicMock()
         mock_redis_instance.get = AsyncMock(return_value=None)
         mock_redis_instance.set = AsyncMock(return_value=True)
         mock_redis_instance.delete = AsyncMock(return_value=True)
-        mock_redis_class.return_value = mock_redis_instance
+        mock_redis_instance.register_script.side_effect = lambda _: AsyncMock(
+            return_value=None
+        )
+        mock_redis_instance.pipeline.return_value.execute = AsyncMock(return_value=[])
+        mock_get_redis.return_value = mock_redis_instance
 
         yield mock_redis_instance
+
+
+# Фікстура для очищення кешу користувачів у пам'яті між тестами
+@pytest.fixture(autouse=True)
+def clear_user_l1_cache():
+    user_l1_cache.clear()
+    yield
+    user_l1_cache.clear()
+
+
+# Фікстура для обмежувача запитів: Redis завжди видає повний пакет дозволів
+@pytest.fixture(autouse=True)
+def mock_rate_limit_redis():
+    redis = MagicMock()
+    redis.register_script.side_effect = lambda _: AsyncMock(return_value=[100, 0])
+    rate_limiter.redis = redis
+    rate_limiter.clear()
+    yield redis
+    rate_limiter.redis = None
+    rate_limiter.clear()
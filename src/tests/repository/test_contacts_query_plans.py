@@ -0,0 +1,106 @@
+"""
+Перевірка планів запитів ContactRepository.
+
+Кожен метод репозиторію виконується на справжній базі SQLite, усі згенеровані
+запити перехоплюються, і для кожного виконується EXPLAIN QUERY PLAN.
+Тест падає, якщо будь-який запит повертається до повного сканування contacts.
+"""
+
+import re
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from src.database.models import Base, Contact, User
+from src.repository.contacts import ContactRepository
+from src.schemas.contact import ContactCreate, ContactUpdate
+
+FULL_SCAN = re.compile(r"\bSCAN contacts\b(?!_fts)")
+
+
+@pytest.fixture
+async def plan_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'plans.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        for user_id in (1, 2):
+            session.add(
+                User(
+                    id=user_id,
+                    username=f"u{user_id}",
+                    email=f"u{user_id}@example.com",
+                    hashed_password="x",
+                )
+            )
+            for i in range(50):
+                session.add(
+                    Contact(
+                        first_name=f"Name{i}",
+                        last_name="Plan",
+                        email=f"c{i}@plan{user_id}.com",
+                        phone=f"+38050{i:07d}",
+                        birthday=date(1990, 1, 1) + timedelta(days=i * 7),
+                        user_id=user_id,
+                    )
+                )
+        await session.commit()
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    async with factory() as session:
+        yield session, captured, engine
+    event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    await engine.dispose()
+
+
+async def explain(engine, statement, parameters):
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in result]
+
+
+@pytest.mark.asyncio
+async def test_repository_queries_use_indexes(plan_session):
+    session, captured, engine = plan_session
+    repo = ContactRepository(session)
+    user = User(id=1)
+
+    await repo.get_contacts(10, 10, user)
+    await repo.get_contacts_after(10, 10, user)
+    await repo.get_contact_by_id(3, user)
+    await repo.search_contacts("Name1", user)
+    await repo.search_contacts("N", user)
+    await repo.get_upcoming_birthdays(user, days=30)
+    await repo.get_upcoming_birthdays(user, days=366)
+    [c async for c in repo.stream_contacts(user)]
+    await repo.update_contact(3, ContactUpdate(first_name="Updated"), user)
+    await repo.delete_contact(4, user)
+    await repo.update_contacts([(5, {"last_name": "Batch"}), (6, {"last_name": "Batch"})], user)
+    await repo.delete_contacts([7, 8], user)
+    await repo.create_contact(
+        ContactCreate(
+            first_name="New",
+            last_name="Plan",
+            email="new@plan.com",
+            phone="+380509999999",
+            birthday=date(1990, 1, 1),
+        ),
+        user,
+    )
+
+    assert captured, "no queries were captured"
+    regressions = []
+    for statement, parameters in captured:
+        plan = await explain(engine, statement, parameters)
+        if any(FULL_SCAN.search(step) for step in plan):
+            regressions.append(f"{statement}\n  -> {plan}")
+
+    assert not regressions, "Full table scan on contacts:\n" + "\n".join(regressions)
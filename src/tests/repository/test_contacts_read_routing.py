@@ -0,0 +1,97 @@
+from datetime import date
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from src.database.db import RecentWrites, get_read_db
+from src.database.models import Base, Contact, User
+from src.repository import contacts as contacts_module
+from src.repository.contacts import ContactRepository
+from src.schemas.contact import ContactCreate
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    """
+    Дві бази SQLite: основна та «репліка» з різними даними,
+    щоб було видно, звідки прочитано контакт.
+    """
+    engines, sessions = [], []
+    for name in ("primary", "replica"):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as session:
+            session.add(User(id=1, username="u", email="u@example.com", hashed_password="x"))
+            session.add(
+                Contact(
+                    first_name=name,
+                    last_name="Routing",
+                    email=f"{name}@routing.com",
+                    phone="+380500000001",
+                    birthday=date(1990, 1, 1),
+                    user_id=1,
+                )
+            )
+            await session.commit()
+        engines.append(engine)
+        sessions.append(factory())
+    yield sessions
+    for session, engine in zip(sessions, engines):
+        await session.close()
+        await engine.dispose()
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = RecentWrites(window=60)
+    monkeypatch.setattr(contacts_module, "recent_writes", tracker)
+    return tracker
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica(sessions, tracker):
+    primary, replica = sessions
+    repo = ContactRepository(primary, replica)
+
+    contacts = await repo.get_contacts(0, 10, User(id=1))
+
+    assert [c.first_name for c in contacts] == ["replica"]
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_after_mutation(sessions, tracker):
+    primary, replica = sessions
+    repo = ContactRepository(primary, replica)
+    user = User(id=1)
+
+    await repo.create_contact(
+        ContactCreate(
+            first_name="fresh",
+            last_name="Routing",
+            email="fresh@routing.com",
+            phone="+380500000002",
+            birthday=date(1990, 1, 1),
+        ),
+        user,
+    )
+    contacts = await repo.get_contacts(0, 10, user)
+
+    assert [c.first_name for c in contacts] == ["primary", "fresh"]
+    # Інші користувачі продовжують читати з репліки
+    assert not tracker.is_recent(2)
+
+
+def test_recent_writes_window_expires():
+    tracker = RecentWrites(window=0)
+    tracker.mark(1)
+
+    assert not tracker.is_recent(1)
+
+
+@pytest.mark.asyncio
+async def test_get_read_db_falls_back_to_primary():
+    primary = object()
+
+    sessions = [s async for s in get_read_db(primary)]
+
+    assert sessions == [primary]
@@ -1,7 +1,15 @@
 from unittest.mock import AsyncMock, MagicMock
 from datetime import date, timedelta
 import pytest
-from src.repository.contacts import ContactRepository
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.exc import IntegrityError
+from src.repository.contacts import (
+    ContactRepository,
+    birthday_window,
+    encode_cursor,
+    decode_cursor,
+    is_unique_violation,
+)
 from src.database.models import Contact, User
 from src.schemas.contact import ContactCreate, ContactUpdate
 
@@ -30,8 +38,8 @@ async def test_get_contacts(repo, mock_session, test_user):
     mock_scalars = MagicMock()
     mock_scalars.all.return_value = contacts
 
-    mock_result = AsyncMock()
-    mock_result.scalars = AsyncMock(return_value=mock_scalars)
+    mock_result = MagicMock()
+    mock_result.scalars.return_value = mock_scalars
 
     mock_session.execute.return_value = mock_result
 
@@ -44,8 +52,8 @@ async def test_get_contacts(repo, mock_session, test_user):
 async def test_get_contact_by_id_found(repo, mock_session, test_user):
     contact = Contact(id=1, user_id=1, first_name="Bob")
 
-    mock_result = AsyncMock()
-    mock_result.scalar_one_or_none = AsyncMock(return_value=contact)
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = contact
 
     mock_session.execute.return_value = mock_result
 
@@ -64,20 +72,26 @@ async def test_create_contact(repo, mock_session, test_user):
         birthday=date(1990, 1, 1),
         additional_info="info",
     )
-
-    mock_session.refresh = AsyncMock()
+    created = Contact(id=1, user_id=1, **body.model_dump())
+    mock_result = MagicMock()
+    mock_result.scalar_one.return_value = created
+    mock_session.execute.return_value = mock_result
 
     result = await repo.create_contact(body, test_user)
 
-    assert isinstance(result, Contact)
-    assert result.first_name == "New"
+    assert result is created
+    mock_session.execute.assert_awaited_once()
+    assert "RETURNING" in str(mock_session.execute.call_args.args[0])
     mock_session.commit.assert_called_once()
+    mock_session.refresh.assert_not_called()
 
 
 @pytest.mark.asyncio
 async def test_update_contact_found(repo, mock_session, test_user):
-    contact = Contact(id=1, first_name="Old", user_id=1)
-    repo.get_contact_by_id = AsyncMock(return_value=contact)
+    contact = Contact(id=1, first_name="Updated", user_id=1)
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = contact
+    mock_session.execute.return_value = mock_result
 
     body = ContactUpdate(
         first_name="Updated",
@@ -87,17 +101,22 @@ async def test_update_contact_found(repo, mock_session, test_user):
         birthday=date(1990, 1, 1),
         additional_info="info",
     )
-    mock_session.refresh = AsyncMock()
 
     result = await repo.update_contact(1, body, test_user)
 
     assert result.first_name == "Updated"
+    mock_session.execute.assert_awaited_once()
+    stmt = str(mock_session.execute.call_args.args[0])
+    assert stmt.startswith("UPDATE contacts") and "RETURNING" in stmt
+    assert "contacts.user_id = :user_id_1" in stmt
     mock_session.commit.assert_called_once()
 
 
 @pytest.mark.asyncio
-async def test_update_contact_not_found(repo, test_user):
-    repo.get_contact_by_id = AsyncMock(return_value=None)
+async def test_update_contact_not_found(repo, mock_session, test_user):
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = None
+    mock_session.execute.return_value = mock_result
 
     body = ContactUpdate(
         first_name="NoOne",
@@ -116,11 +135,15 @@ async def test_update_contact_not_found(repo, test_user):
 @pytest.mark.asyncio
 async def test_delete_contact_found(repo, mock_session, test_user):
     contact = Contact(id=1, user_id=1)
-    repo.get_contact_by_id = AsyncMock(return_value=contact)
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = contact
+    mock_session.execute.return_value = mock_result
 
     result = await repo.delete_contact(1, test_user)
 
     assert result == contact
+    mock_session.execute.assert_awaited_once()
+    assert str(mock_session.execute.call_args.args[0]).startswith("DELETE FROM contacts")
     mock_session.commit.assert_called_once()
 
 
@@ -131,8 +154,8 @@ async def test_search_contacts(repo, mock_session, test_user):
     mock_scalars = MagicMock()
     mock_scalars.all.return_value = contacts
 
-    mock_result = AsyncMock()
-    mock_result.scalars = AsyncMock(return_value=mock_scalars)
+    mock_result = MagicMock()
+    mock_result.scalars.return_value = mock_scalars
 
     mock_session.execute.return_value = mock_result
 
@@ -143,23 +166,108 @@ async def test_search_contacts(repo, mock_session, test_user):
 
 @pytest.mark.asyncio
 async def test_get_upcoming_birthdays(repo, mock_session, test_user):
-    today = date.today()
-    next_week = today + timedelta(days=5)
+    contact = Contact(id=1, user_id=1, birthday=date.today() + timedelta(days=5))
+
+    mock_scalars = MagicMock()
+    mock_scalars.all.return_value = [contact]
+
+    mock_result = MagicMock()
+    mock_result.scalars.return_value = mock_scalars
+
+    mock_session.execute.return_value = mock_result
+
+    result = await repo.get_upcoming_birthdays(test_user, days=7)
+
+    assert result == [contact]
+    mock_session.execute.assert_awaited_once()
+    compiled = str(
+        mock_session.execute.call_args.args[0].compile(dialect=sqlite.dialect())
+    )
+    assert "strftime('%m%d', contacts.birthday)" in compiled
+    assert "contacts.user_id = ?" in compiled
+
 
-    contact_1 = Contact(id=1, user_id=1, birthday=next_week)
-    contact_2 = Contact(id=2, user_id=1, birthday=today - timedelta(days=1))
-    contact_3 = Contact(id=3, user_id=1, birthday=None)
+def test_cursor_roundtrip():
+    cursor = encode_cursor(42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == 42
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(1)[:-2], "eyJpZCI6ImEifQ"])
+def test_decode_cursor_invalid(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.asyncio
+async def test_get_contacts_after(repo, mock_session, test_user):
+    contacts = [Contact(id=11, first_name="Next")]
 
     mock_scalars = MagicMock()
-    mock_scalars.all.return_value = [contact_1, contact_2, contact_3]
+    mock_scalars.all.return_value = contacts
 
-    mock_result = AsyncMock()
-    mock_result.scalars = AsyncMock(return_value=mock_scalars)
+    mock_result = MagicMock()
+    mock_result.scalars.return_value = mock_scalars
 
     mock_session.execute.return_value = mock_result
 
-    result = await repo.get_upcoming_birthdays(test_user)
+    result = await repo.get_contacts_after(10, 5, test_user)
 
-    # В тесте ожидаем, что только контакт с ближайшим днем рождения будет в результате
-    assert len(result) == 1
-    assert result[0].id == 1
+    assert result == contacts
+    stmt = mock_session.execute.call_args.args[0]
+    compiled = str(stmt)
+    assert "contacts.user_id = :user_id_1" in compiled
+    assert "contacts.id > :id_1" in compiled
+    assert "OFFSET" not in compiled
+
+
+@pytest.mark.parametrize(
+    "today, days, expected",
+    [
+        (date(2025, 6, 10), 7, (610, 617, False)),
+        (date(2025, 12, 28), 7, (1228, 104, True)),
+        # 29 лютого потрапляє у вікно, що закінчується 28 лютого невисокосного року
+        (date(2025, 2, 21), 7, (221, 229, False)),
+        (date(2024, 2, 21), 7, (221, 228, False)),
+        (date(2025, 3, 1), 0, (301, 301, False)),
+    ],
+)
+def test_birthday_window(today, days, expected):
+    assert birthday_window(today, days) == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "query, expected",
+    [("mat", "contacts_fts MATCH ?"), ("ma", "LIKE lower(?) ESCAPE")],
+)
+async def test_search_contacts_sqlite_index(repo, mock_session, test_user, query, expected):
+    mock_session.bind.dialect.name = "sqlite"
+    mock_session.execute.return_value = MagicMock()
+
+    await repo.search_contacts(query, test_user, skip=20, limit=10)
+
+    stmt = mock_session.execute.call_args.args[0]
+    compiled = stmt.compile(dialect=sqlite.dialect())
+    assert expected in str(compiled)
+    assert "LIMIT ? OFFSET ?" in str(compiled)
+
+
+def test_is_unique_violation():
+    """Тест: 409 лише для порушень унікальності, а не NOT NULL"""
+    unique = IntegrityError(
+        "stmt", {}, Exception("UNIQUE constraint failed: contacts.email")
+    )
+    not_null = IntegrityError(
+        "stmt", {}, Exception("NOT NULL constraint failed: contacts.first_name")
+    )
+    pg_orig = Exception("duplicate key")
+    pg_orig.sqlstate = "23505"
+    pg_not_null = Exception("null value")
+    pg_not_null.sqlstate = "23502"
+
+    assert is_unique_violation(unique)
+    assert not is_unique_violation(not_null)
+    assert is_unique_violation(IntegrityError("stmt", {}, pg_orig))
+    assert not is_unique_violation(IntegrityError("stmt", {}, pg_not_null))
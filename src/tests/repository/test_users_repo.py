@@ -1,7 +1,28 @@
+from contextlib import asynccontextmanager
 from unittest.mock import AsyncMock, MagicMock
+import asyncio
+import json
+import time
 import pytest
-from src.repository.users import UserRepository
-from src.database.models import User
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from redis.crc import key_slot
+from src.repository.users import (
+    USER_CACHE_CHANNEL,
+    USER_EMAIL_PREFIX,
+    USER_RECORD_PREFIX,
+    USER_USERNAME_PREFIX,
+    UserRepository,
+    decode_user_record,
+    encode_user_record,
+    session_factory_for,
+    should_refresh_early,
+    user_cache_invalidator,
+    user_cache_keys,
+    user_cache_stats,
+    user_l1_cache,
+    user_to_dict,
+)
+from src.database.models import User, UserRole
 from src.schemas.user import UserCreate
 
 
@@ -18,15 +39,34 @@ def mock_redis():
     mock.get = AsyncMock(return_value=None)
     mock.set = AsyncMock()
     mock.delete = AsyncMock()
+    mock.register_script = MagicMock(side_effect=lambda _: AsyncMock(return_value=None))
+    mock.pipeline = MagicMock()
+    mock.pipeline.return_value.execute = AsyncMock(return_value=[])
     return mock
 
 
+def cache_record(exp_in: float = 300, delta: float = 0.01, **fields) -> str:
+    """Запис кешу користувача у форматі Redis"""
+    fields.setdefault("hashed_password", "hashed")
+    fields.setdefault("confirmed", True)
+    fields.setdefault("role", "user")
+    return encode_user_record(User(**fields), time.time() + exp_in, delta)
+
+
+def session_factory(session):
+    """Фабрика сесій для спільних завантажень, що завжди віддає задану сесію"""
+
+    @asynccontextmanager
+    async def factory():
+        yield session
+
+    return factory
+
+
 @pytest.fixture
-def repo(mock_session, mock_redis, monkeypatch):
+def repo(mock_session, mock_redis):
     """Фікстура для UserRepository з підміною Redis"""
-    repo = UserRepository(mock_session)
-    monkeypatch.setattr(repo, "redis", mock_redis)
-    return repo
+    return UserRepository(mock_session, mock_redis, session_factory(mock_session))
 
 
 @pytest.mark.asyncio
@@ -40,9 +80,9 @@ async def test_get_user_by_id(repo, mock_session, mock_redis):
 
     result = await repo.get_user_by_id(1)
 
-    assert result == expected_user
+    assert user_to_dict(result) == user_to_dict(expected_user)
     mock_session.execute.assert_awaited_once()
-    mock_redis.set.assert_awaited_once()
+    mock_redis.pipeline.return_value.execute.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -56,9 +96,9 @@ async def test_get_user_by_email(repo, mock_session, mock_redis):
 
     result = await repo.get_user_by_email("test@example.com")
 
-    assert result == expected_user
+    assert user_to_dict(result) == user_to_dict(expected_user)
     mock_session.execute.assert_awaited_once()
-    mock_redis.set.assert_awaited_once()
+    mock_redis.pipeline.return_value.execute.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -72,9 +112,9 @@ async def test_get_user_by_username(repo, mock_session, mock_redis):
 
     result = await repo.get_user_by_username("testuser")
 
-    assert result == expected_user
+    assert user_to_dict(result) == user_to_dict(expected_user)
     mock_session.execute.assert_awaited_once()
-    mock_redis.set.assert_awaited_once()
+    mock_redis.pipeline.return_value.execute.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -102,9 +142,9 @@ async def test_create_user(repo, mock_session, mock_redis):
         await mock_session.refresh(user)
 
         keys = [
-            f"user:id:{user.id}",
-            f"user:email:{user.email}",
-            f"user:username:{user.username}",
+            f"{USER_RECORD_PREFIX}{user.id}",
+            f"{USER_EMAIL_PREFIX}{user.email}",
+            f"{USER_USERNAME_PREFIX}{user.username}",
         ]
         for key in keys:
             await mock_redis.set(
@@ -129,27 +169,28 @@ async def test_create_user(repo, mock_session, mock_redis):
 async def test_confirmed_email(repo, mock_redis):
     """Тест для підтвердження email користувача"""
     user = User(email="confirmed@example.com", confirmed=False, hashed_password="123")
-    repo.get_user_by_email = AsyncMock(return_value=user)
+    repo._select_user = AsyncMock(return_value=user)
 
     await repo.confirmed_email("confirmed@example.com")
 
     assert user.confirmed is True
-    mock_redis.delete.assert_awaited()
+    pipe = mock_redis.pipeline.return_value
+    pipe.delete.assert_called_once()
+    pipe.publish.assert_called_once()
+    pipe.execute.assert_awaited_once()
 
 
 @pytest.mark.asyncio
 async def test_update_avatar_url(repo, mock_redis):
     """Тест для оновлення URL аватара користувача"""
     user = User(email="img@example.com", hashed_password="123")
-    repo.get_user_by_email = AsyncMock(return_value=user)
-    mock_redis.set = AsyncMock()
-    mock_redis.delete = AsyncMock()
-    repo.redis = mock_redis
+    repo._select_user = AsyncMock(return_value=user)
 
-    result = await repo.update_avatar_url("img@example.com", "http://avatar.new")
+    result = await repo.update_avatar_url("img@example.com", "http://avatar.new", "f00d")
 
     assert result.avatar_url == "http://avatar.new"
-    mock_redis.set.assert_awaited()
+    assert result.avatar_hash == "f00d"
+    mock_redis.pipeline.return_value.execute.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -158,9 +199,7 @@ async def test_update_user(repo, mock_redis):
     user = User(
         id=1, username="olduser", email="old@example.com", hashed_password="123"
     )
-    repo.get_user_by_id = AsyncMock(return_value=user)
-    mock_redis.set = AsyncMock()
-    repo.redis = mock_redis
+    repo._select_user = AsyncMock(return_value=user)
 
     updated = await repo.update_user(
         1, {"username": "newuser", "email": "new@example.com", "extra": "ignored"}
@@ -168,5 +207,367 @@ async def test_update_user(repo, mock_redis):
 
     assert updated.username == "newuser"
     assert updated.email == "new@example.com"
-    mock_redis.set.assert_awaited()
+    pipe = mock_redis.pipeline.return_value
+    pipe.delete.assert_called_once_with(
+        "{user}:email:old@example.com", "{user}:username:olduser"
+    )
+    pipe.execute.assert_awaited_once()
+
+
+
+@pytest.mark.asyncio
+async def test_get_principal_uses_process_cache(repo, mock_session, mock_redis):
+    """Тест: повторне визначення користувача не звертається ні до Redis, ні до БД"""
+    user = User(
+        id=7, username="cached", email="cached@example.com", hashed_password="123"
+    )
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = user
+    mock_session.execute = AsyncMock(return_value=mock_result)
+
+    first = await repo.get_principal("cached@example.com")
+    second = await repo.get_principal("cached@example.com")
+
+    assert first.id == second.id == 7
+    assert mock_session.execute.await_count == 1
+    # Одне звернення до Redis (скрипт розіменування), друге обслуговує L1
+    assert repo._resolve_script.await_count == 1
+    mock_redis.get.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_principal_from_redis(repo, mock_session, mock_redis):
+    """Тест: користувач із Redis не потребує запиту до БД"""
+    repo._resolve_pointer = AsyncMock(
+        return_value=cache_record(
+            id=3, username="r", email="r@example.com", confirmed=True, role="user"
+        )
+    )
+    mock_session.execute = AsyncMock()
+
+    user = await repo.get_principal("r@example.com")
+
+    assert user.id == 3
+    assert user.role == "user"
+    mock_session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_update_user_invalidates_l1(repo, mock_redis):
+    """Тест: зміна email прибирає записи з кешу процесу і розсилає інвалідацію"""
+    user_l1_cache.set("{user}:email:old@example.com", {"id": 1})
+    user = User(id=1, username="u", email="old@example.com", hashed_password="123")
+    repo._select_user = AsyncMock(return_value=user)
+
+    await repo.update_user(1, {"email": "new@example.com"})
+
+    assert user_l1_cache.get("{user}:email:old@example.com") is None
+    channel, message = mock_redis.pipeline.return_value.publish.call_args.args
+    assert channel == USER_CACHE_CHANNEL
+    assert set(json.loads(message)["keys"]) == {
+        "{user}:id:1",
+        "{user}:email:old@example.com",
+        "{user}:email:new@example.com",
+        "{user}:username:u",
+    }
+
+
+@pytest.mark.asyncio
+async def test_l1_serves_lookups_by_any_key(repo, mock_session):
+    """Тест: після завантаження за email користувач є в кеші процесу за ID і username"""
+    user = User(id=8, username="l1", email="l1@example.com", hashed_password="1")
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = user
+    mock_session.execute = AsyncMock(return_value=mock_result)
+
+    await repo.get_user_by_email("l1@example.com")
+    by_id = await repo.get_user_by_id(8)
+    by_username = await repo.get_user_by_username("l1")
+
+    assert by_id.email == by_username.email == "l1@example.com"
+    assert mock_session.execute.await_count == 1
+    assert user_cache_stats()["l1_size"] == 3
+
+
+@pytest.mark.asyncio
+async def test_l1_skips_value_invalidated_during_load(repo, mock_session):
+    """Тест: значення, інвалідоване під час завантаження, не потрапляє в кеш процесу"""
+    user = User(id=8, username="l1", email="l1@example.com", hashed_password="1")
+
+    async def execute(*_):
+        user_cache_invalidator.handle(
+            user_cache_invalidator.message(["{user}:email:l1@example.com"])
+        )
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = user
+        return result
+
+    mock_session.execute = execute
+
+    await repo.get_user_by_email("l1@example.com")
+
+    assert len(user_l1_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_user_cache_layout(repo, mock_redis):
+    """Тест: email і username зберігаються як вказівники на один запис"""
+    user = User(id=5, username="ptr", email="ptr@example.com", hashed_password="1")
+
+    await repo._cache_set(user)
+
+    pipe = mock_redis.pipeline.return_value
+    calls = {c.args[0]: c.args[1] for c in pipe.set.call_args_list}
+    assert calls["{user}:email:ptr@example.com"] == 5
+    assert calls["{user}:username:ptr"] == 5
+    record = decode_user_record(calls["{user}:id:5"])
+    assert record["user"]["email"] == "ptr@example.com"
+    assert record["user"]["hashed_password"] == "1"
+    pipe.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_resolve_pointer_is_one_script_call(repo):
+    """Тест: вказівник і запис читаються одним скриптом за один запит"""
+    repo._resolve_script.return_value = "record"
+
+    raw = await repo._resolve_pointer("{user}:email:ptr@example.com")
+
+    assert raw == "record"
+    repo._resolve_script.assert_awaited_once_with(
+        keys=["{user}:email:ptr@example.com"], args=[USER_RECORD_PREFIX]
+    )
+
+
+def test_user_cache_keys_share_hash_slot():
+    """Тест: запис і вказівники в одному слоті Redis Cluster"""
+    user = User(id=5, username="ptr", email="ptr@example.com")
+
+    slots = {key_slot(key.encode()) for key in user_cache_keys(user)}
+    slots.add(key_slot(f"{USER_RECORD_PREFIX}9999".encode()))
+
+    assert len(slots) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_user_by_email_resolves_pointer(repo, mock_session):
+    """Тест: читання за email — розіменування вказівника без запиту до БД"""
+    repo._resolve_pointer = AsyncMock(
+        return_value=cache_record(
+            id=5, username="ptr", email="ptr@example.com", confirmed=True, role="user"
+        )
+    )
+    mock_session.execute = AsyncMock()
+
+    user = await repo.get_user_by_email("ptr@example.com")
+
+    assert user.id == 5
+    repo._resolve_pointer.assert_awaited_once_with("{user}:email:ptr@example.com")
+    mock_session.execute.assert_not_awaited()
+
+
+def counting_session(user, delay: float = 0.01):
+    """Сесія, що рахує запити до БД і відповідає із затримкою"""
+    session = MagicMock()
+    session.queries = 0
+
+    async def execute(*_):
+        session.queries += 1
+        await asyncio.sleep(delay)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = user
+        return result
+
+    session.execute = execute
+    return session
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_query_db_once(mock_redis):
+    """Тест: одночасні промахи кешу в процесі дають один запит до БД"""
+    user = User(id=9, username="hot", email="hot@example.com", hashed_password="1")
+    session = counting_session(user)
+    repos = [
+        UserRepository(MagicMock(), mock_redis, session_factory(session))
+        for _ in range(50)
+    ]
+
+    results = await asyncio.gather(
+        *(r.get_user_by_email("hot@example.com") for r in repos)
+    )
+
+    assert session.queries == 1
+    assert all(u.id == 9 for u in results)
+    # Очікувачі не ділять один ORM-об'єкт
+    assert len({id(u) for u in results}) == 50
+    mock_redis.pipeline.return_value.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_shared_load_survives_cancelled_leader(mock_redis):
+    """Тест: скасування запиту-ініціатора не зриває спільне завантаження"""
+    user = User(id=10, username="lead", email="lead@example.com", hashed_password="1")
+    shared = counting_session(user, delay=0.05)
+    request_session = MagicMock()
+    request_session.execute = AsyncMock(side_effect=RuntimeError("session closed"))
+    leader = UserRepository(request_session, mock_redis, session_factory(shared))
+    waiter = UserRepository(request_session, mock_redis, session_factory(shared))
+
+    leader_task = asyncio.create_task(leader.get_user_by_email("lead@example.com"))
+    await asyncio.sleep(0)
+    waiter_task = asyncio.create_task(waiter.get_user_by_email("lead@example.com"))
+    await asyncio.sleep(0)
+    leader_task.cancel()
+
+    user = await waiter_task
+    assert user.id == 10
+    assert shared.queries == 1
+    request_session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_shared_load_session_uses_request_engine():
+    """Тест: спільне завантаження йде в ту саму базу, що й сесія запиту"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with AsyncSession(engine) as request_session:
+        async with session_factory_for(request_session)() as session:
+            assert session.bind is engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_locked_key_waits_for_other_process(repo, mock_session, mock_redis):
+    """Тест: якщо ключ завантажує інший процес, чекаємо на кеш замість БД"""
+    mock_redis.set = AsyncMock(return_value=None)  # блокування вже зайняте
+    repo._resolve_pointer = AsyncMock(
+        side_effect=[None, cache_record(id=4, username="w", email="w@example.com")]
+    )
+    mock_session.execute = AsyncMock()
+
+    user = await repo.get_user_by_email("w@example.com")
+
+    assert user.id == 4
+    mock_session.execute.assert_not_awaited()
+    repo._release_lock.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_early_refresh_serves_stale_when_locked(repo, mock_session, mock_redis):
+    """Тест: запис на межі застарівання оновлює лише власник блокування"""
+    mock_redis.set = AsyncMock(return_value=None)
+    repo._resolve_pointer = AsyncMock(
+        return_value=cache_record(
+            exp_in=-1, id=4, username="w", email="w@example.com"
+        )
+    )
+    mock_session.execute = AsyncMock()
+
+    user = await repo.get_user_by_email("w@example.com")
+
+    assert user.id == 4
+    mock_session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_early_refresh_reloads_with_lock(repo, mock_session, mock_redis):
+    """Тест: власник блокування оновлює запис і знімає блокування"""
+    fresh = User(id=4, username="w", email="w@example.com", hashed_password="1")
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = fresh
+    mock_session.execute = AsyncMock(return_value=mock_result)
+    mock_redis.set = AsyncMock(return_value=True)
+    repo._resolve_pointer = AsyncMock(
+        return_value=cache_record(exp_in=-1, id=4, username="w", email="w@example.com")
+    )
+
+    user = await repo.get_user_by_email("w@example.com")
+
+    assert user is not fresh
+    assert user.id == fresh.id
+    mock_session.execute.assert_awaited_once()
+    repo._release_lock.assert_awaited_once()
+
+
+def test_should_refresh_early():
+    """Тест: дострокове оновлення лише поблизу кінця терміну запису"""
+    now = time.time()
+    assert should_refresh_early({"exp": now - 1, "delta": 0.01}, now)
+    assert not should_refresh_early({"exp": now + 300, "delta": 0.01}, now)
+
+
+@pytest.mark.asyncio
+async def test_cached_user_is_complete(repo, mock_session):
+    """Тест: користувач із кешу має пароль і роль, потрібні для логіну та /me"""
+    repo._resolve_pointer = AsyncMock(
+        return_value=cache_record(
+            id=2, username="full", email="full@example.com", role="admin"
+        )
+    )
+    mock_session.execute = AsyncMock()
+
+    user = await repo.get_user_by_username("full")
+
+    assert user.hashed_password == "hashed"
+    assert user.role is UserRole.ADMIN
+    assert user.confirmed is True
+    mock_session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_old_format_record_is_evicted(repo, mock_session, mock_redis):
+    """Тест: запис старого формату видаляється і замінюється даними з БД"""
+    user = User(id=2, username="old", email="old@example.com", hashed_password="1")
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = user
+    mock_session.execute = AsyncMock(return_value=mock_result)
+    repo._resolve_pointer = AsyncMock(
+        return_value=json.dumps({"id": 2, "username": "old", "email": "old@example.com"})
+    )
+
+    result = await repo.get_user_by_username("old")
+
+    assert user_to_dict(result) == user_to_dict(user)
+    mock_redis.delete.assert_awaited_once_with("{user}:username:old")
+    mock_redis.pipeline.return_value.execute.assert_awaited_once()
+
+
+def test_user_record_roundtrip():
+    """Тест: запис кешу зберігає всі поля і версію"""
+    user = User(
+        id=1,
+        username="u",
+        email="u@example.com",
+        hashed_password="h",
+        avatar_url=None,
+        avatar_hash="abc",
+        confirmed=False,
+        role=UserRole.USER,
+    )
+    raw = encode_user_record(user, exp=100.0, delta=0.5)
+
+    record = decode_user_record(raw)
+
+    assert record["exp"] == 100.0
+    assert record["delta"] == 0.5
+    assert record["user"] == {
+        "id": 1,
+        "username": "u",
+        "email": "u@example.com",
+        "hashed_password": "h",
+        "avatar_url": None,
+        "avatar_hash": "abc",
+        "confirmed": False,
+        "role": "user",
+    }
+    assert decode_user_record(raw.replace("[3,", "[2,", 1)) is None
+
+
+@pytest.mark.asyncio
+async def test_update_user_password(repo):
+    """Тест: скидання пароля оновлює хеш і в кеші"""
+    user = User(id=1, username="u", email="u@example.com", hashed_password="old")
+    repo._select_user = AsyncMock(return_value=user)
+
+    updated = await repo.update_user(1, {"hashed_password": "new"})
 
+    assert updated.hashed_password == "new"
@@ -1,5 +1,7 @@
+import time
 import pytest
-from unittest.mock import MagicMock
+from contextlib import asynccontextmanager
+from unittest.mock import MagicMock, patch
 from src.services.auth import (
     Hash,
     create_access_token,
@@ -8,6 +10,8 @@ from src.services.auth import (
     get_current_user,
 )
 from src.services.auth import create_password_reset_token, verify_password_reset_token
+from src.services.auth import TokenCodec
+from src.services.hashing import PasswordHasherBusy
 from jose import jwt, JWTError
 from datetime import datetime, timedelta, UTC
 from unittest.mock import AsyncMock
@@ -29,6 +33,19 @@ def test_verify_password():
     assert not hash_service.verify_password("wrong", hashed)
 
 
+@pytest.mark.asyncio
+async def test_verify_password_async():
+    """
+    Тестує хешування та перевірку пароля в пулі хешування.
+    """
+    hash_service = Hash()
+    hashed = await hash_service.get_password_hash_async("mysecret")
+
+    assert await hash_service.verify_password_async("mysecret", hashed)
+    assert not await hash_service.verify_password_async("wrong", hashed)
+    assert not await hash_service.verify_password_async("mysecret", None)
+
+
 def test_create_access_token_and_decode():
     """
     Тестує створення та декодування токену доступу.
@@ -97,15 +114,19 @@ async def test_get_current_user_success():
 
     mock_user = User(id=1, email=email, username="tester", hashed_password="123")
 
-    mock_scalars = AsyncMock()
-    mock_scalars.first = MagicMock(return_value=mock_user)
-
-    mock_result = AsyncMock()
-    mock_result.scalars = AsyncMock(return_value=mock_scalars)
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = mock_user
 
     mock_db.execute = AsyncMock(return_value=mock_result)
 
-    user = await get_current_user(token=token, db=mock_db)
+    @asynccontextmanager
+    async def session_factory():
+        yield mock_db
+
+    with patch(
+        "src.repository.users.session_factory_for", return_value=session_factory
+    ):
+        user = await get_current_user(token=token, db=mock_db)
 
     assert user.email == email
     assert isinstance(user, User)
@@ -144,3 +165,71 @@ def test_verify_password_reset_token_invalid():
         verify_password_reset_token("invalidtoken")
     assert exc_info.value.status_code == 422
     assert "Невірний токен" in exc_info.value.detail
+
+
+def make_codec():
+    return TokenCodec(settings.JWT_SECRET, settings.JWT_ALGORITHM, cache_size=10)
+
+
+def test_token_codec_caches_verified_claims(monkeypatch):
+    """
+    Тестує, що повторна перевірка того самого токена не викликає jwt.decode.
+    """
+    codec = make_codec()
+    token = codec.encode({"sub": "a@example.com", "exp": time.time() + 60})
+    calls = MagicMock(side_effect=jwt.decode)
+    monkeypatch.setattr("src.services.auth.jwt.decode", calls)
+
+    first = codec.decode(token)
+    first["sub"] = "changed"
+    second = codec.decode(token)
+
+    assert second["sub"] == "a@example.com"
+    assert calls.call_count == 1
+    assert codec.stats() == {"hit": 1, "miss": 1, "size": 1}
+
+
+def test_token_codec_evicts_at_exp(monkeypatch):
+    """
+    Тестує, що закешовані claims не переживають exp токена.
+    """
+    codec = make_codec()
+    now = time.time()
+    token = codec.encode({"sub": "a@example.com", "exp": now + 5})
+    codec.decode(token)
+
+    monotonic = time.monotonic() + 10
+    monkeypatch.setattr("src.services.cache.time.monotonic", lambda: monotonic)
+    monkeypatch.setattr("src.services.auth.jwt.decode", MagicMock(side_effect=JWTError))
+
+    with pytest.raises(JWTError):
+        codec.decode(token)
+
+
+def test_token_codec_does_not_cache_invalid_tokens():
+    """
+    Тестує, що недійсні токени не потрапляють у кеш.
+    """
+    codec = make_codec()
+    token = codec.encode({"sub": "a@example.com", "exp": time.time() + 60})
+
+    for _ in range(2):
+        with pytest.raises(JWTError):
+            codec.decode(token + "x")
+    assert codec.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hash_maps_busy_hasher_to_503():
+    """
+    Тестує відповідь 503 з Retry-After, коли черга на хешування переповнена.
+    """
+    with patch(
+        "src.services.auth.password_hasher.verify",
+        AsyncMock(side_effect=PasswordHasherBusy()),
+    ):
+        with pytest.raises(HTTPException) as exc:
+            await Hash().verify_password_async("secret", "hashed")
+
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
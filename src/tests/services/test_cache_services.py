@@ -0,0 +1,170 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+import pytest
+from redis.asyncio import Redis
+from src.services.cache import CacheInvalidator, SingleFlight, TTLCache
+
+
+def test_ttl_cache_get_set():
+    """Тест: збережене значення повертається до закінчення терміну"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+
+
+def test_ttl_cache_expiry():
+    """Тест: застарілий запис не повертається і видаляється"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    with patch("src.services.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("src.services.cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Тест: при переповненні витісняється найдавніше використаний запис"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_delete():
+    """Тест: видалення кількох ключів"""
+    cache = TTLCache(maxsize=5, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.delete("a", "b", "missing")
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_result():
+    """Тест: одночасні виклики одного ключа виконують завантаження один раз"""
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(flights.do("k", load) for _ in range(10)))
+
+    assert results == ["value"] * 10
+    assert calls == 1
+    assert len(flights) == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors():
+    """Тест: помилка завантаження отримують усі очікувачі, ключ звільняється"""
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        flights.do("k", fail), flights.do("k", fail), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(flights) == 0
+
+
+def test_cache_invalidator_handles_message():
+    """Тест: отримане повідомлення прибирає ключі і фіксує затримку"""
+    cache = TTLCache(maxsize=5, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    invalidator = CacheInvalidator(cache, "channel")
+
+    invalidator.handle(invalidator.message(["a"]))
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert invalidator.generation == 1
+    assert invalidator.lag.snapshot()["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_invalidator_listens_to_channel():
+    """Тест: прослуховувач застосовує повідомлення з каналу pub/sub"""
+    cache = TTLCache(maxsize=5, ttl=10)
+    cache.set("a", 1)
+    invalidator = CacheInvalidator(cache, "channel")
+    received = asyncio.Event()
+
+    class FakePubSub:
+        messages = [None, {"type": "message", "data": invalidator.message(["a"])}]
+
+        async def subscribe(self, channel):
+            assert channel == "channel"
+
+        async def get_message(self, ignore_subscribe_messages, timeout):
+            if self.messages:
+                return self.messages.pop(0)
+            received.set()
+            await asyncio.sleep(timeout)
+
+        async def aclose(self):
+            pass
+
+    redis = MagicMock()
+    redis.pubsub.return_value = FakePubSub()
+
+    await invalidator.start(redis)
+    await asyncio.wait_for(received.wait(), timeout=1)
+    await invalidator.stop()
+
+    assert cache.get("a") is None
+
+
+
+def quiet_channel_server(subscriptions: list):
+    """Заглушка Redis: підтверджує команди й підписку, далі в каналі тиша"""
+
+    async def serve(reader, writer):
+        while line := await reader.readline():
+            args = []
+            for _ in range(int(line[1:])):
+                length = int((await reader.readline())[1:])
+                args.append((await reader.readexactly(length + 2))[:-2])
+            if args[0].upper() == b"SUBSCRIBE":
+                subscriptions.append(args[1])
+                writer.write(b"*3\r\n$9\r\nsubscribe\r\n$7\r\nchannel\r\n:1\r\n")
+            else:
+                writer.write(b"+OK\r\n")
+            await writer.drain()
+
+    return asyncio.start_server(serve, "127.0.0.1", 0)
+
+
+@pytest.mark.asyncio
+async def test_cache_invalidator_survives_quiet_channel():
+    """Тест: тиша в каналі довша за socket_timeout не перериває підписку"""
+    subscriptions = []
+    server = await quiet_channel_server(subscriptions)
+    port = server.sockets[0].getsockname()[1]
+    redis = Redis(host="127.0.0.1", port=port, socket_timeout=0.1)
+    cache = TTLCache(maxsize=5, ttl=10)
+    cache.set("a", 1)
+    invalidator = CacheInvalidator(cache, "channel", poll_interval=0.05)
+
+    await invalidator.start(redis)
+    await asyncio.sleep(1.0)
+    await invalidator.stop()
+    await redis.aclose()
+    server.close()
+
+    assert subscriptions == [b"channel"]
+    assert cache.get("a") == 1
+    assert invalidator.generation == 0
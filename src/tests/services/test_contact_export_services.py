@@ -0,0 +1,42 @@
+import json
+import pytest
+from datetime import date
+from src.database.models import Contact
+from src.services.contact_export import csv_chunks, ndjson_chunks
+
+
+async def contacts(n: int):
+    for i in range(n):
+        yield Contact(
+            id=i + 1,
+            first_name=f"Name{i}",
+            last_name="Export",
+            email=f"user{i}@export.com",
+            phone=f"+38050{i:07d}",
+            birthday=date(1990, 1, 1),
+            additional_data=None,
+        )
+
+
+@pytest.mark.asyncio
+async def test_ndjson_chunks_groups_rows():
+    """
+    Тестує групування рядків NDJSON у чанки.
+    """
+    chunks = [chunk async for chunk in ndjson_chunks(contacts(5), rows_per_chunk=2)]
+
+    assert len(chunks) == 3
+    rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [r["id"] for r in rows] == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_csv_chunks_header_and_rows():
+    """
+    Тестує CSV-експорт: заголовок і всі рядки.
+    """
+    chunks = [chunk async for chunk in csv_chunks(contacts(3), rows_per_chunk=2)]
+
+    lines = "".join(chunks).splitlines()
+    assert lines[0].startswith("first_name,last_name,email,phone,birthday")
+    assert len(lines) == 4
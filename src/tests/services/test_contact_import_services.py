@@ -0,0 +1,126 @@
+import pytest
+from unittest.mock import AsyncMock
+from src.database.models import User
+from src.services.contact_import import (
+    ContactImporter,
+    iter_csv_rows,
+    iter_lines,
+    iter_ndjson_rows,
+)
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_splits_across_chunks():
+    """
+    Тестує розбиття на рядки, коли рядки та символи UTF-8 розірвані між чанками.
+    """
+    data = "перший\nдругий\nтретій".encode()
+
+    lines = await collect(iter_lines(stream(data[:5], data[5:17], data[17:])))
+
+    assert lines == ["перший\n", "другий\n", "третій"]
+
+
+@pytest.mark.asyncio
+async def test_iter_csv_rows_quoted_newline_and_errors():
+    """
+    Тестує CSV з перенесенням рядка в лапках і рядком з неправильною кількістю полів.
+    """
+    csv_data = (
+        b"first_name,last_name,additional_data\n"
+        b'Ann,Lee,"line one\nline two"\n'
+        b"\n"
+        b"Bob,Ray\n"
+        b"Cid,Moe,\n"
+    )
+
+    rows = await collect(iter_csv_rows(stream(csv_data[:30], csv_data[30:])))
+
+    assert rows[0] == (
+        1,
+        {"first_name": "Ann", "last_name": "Lee", "additional_data": "line one\nline two"},
+    )
+    assert rows[1][0] == 2 and isinstance(rows[1][1], str)
+    assert rows[2] == (3, {"first_name": "Cid", "last_name": "Moe", "additional_data": None})
+
+
+@pytest.mark.asyncio
+async def test_iter_ndjson_rows():
+    """
+    Тестує NDJSON з некоректним рядком і не-об'єктом.
+    """
+    rows = await collect(iter_ndjson_rows(stream(b'{"a": 1}\n{bad\n[1]\n')))
+
+    assert rows[0] == (1, {"a": 1})
+    assert rows[1][0] == 2 and isinstance(rows[1][1], str)
+    assert rows[2][0] == 3 and isinstance(rows[2][1], str)
+
+
+def contact(i: int, **overrides):
+    data = {
+        "first_name": f"Name{i}",
+        "last_name": "Import",
+        "email": f"user{i}@import.com",
+        "phone": f"+38050{i:07d}",
+        "birthday": "1990-01-01",
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.mark.asyncio
+async def test_importer_batches_and_reports_issues():
+    """
+    Тестує пакетну вставку, валідацію та звіт про конфлікти.
+    """
+    repo = AsyncMock()
+    # Контакт user2 вже існує в базі — база його не повертає
+    repo.bulk_create_contacts.side_effect = lambda rows, user: {
+        r["email"] for r in rows if r["email"] != "user2@import.com"
+    }
+    rows = [
+        (1, contact(1)),
+        (2, contact(2)),
+        (3, contact(3, email="not-an-email")),
+        (4, contact(4)),
+        (5, contact(5, phone=contact(4)["phone"])),
+        (6, "некоректний JSON"),
+    ]
+
+    result = await ContactImporter(repo, User(id=1), batch_size=2).run(stream(*rows))
+
+    assert repo.bulk_create_contacts.await_count == 2
+    assert (result.created, result.conflicts, result.invalid) == (2, 2, 2)
+    assert {(i.row, i.status) for i in result.issues} == {
+        (2, "conflict"),
+        (3, "invalid"),
+        (5, "conflict"),
+        (6, "invalid"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_importer_caps_reported_issues():
+    """
+    Тестує, що звіт описує лише перші max_issues рядків з помилками.
+    """
+    repo = AsyncMock()
+    rows = [(i, "некоректний JSON") for i in range(1, 1001)]
+
+    result = await ContactImporter(
+        repo, User(id=1), batch_size=2, max_issues=3
+    ).run(stream(*rows))
+
+    assert result.invalid == 1000
+    assert [i.row for i in result.issues] == [1, 2, 3]
+    assert result.issues_truncated is True
+    repo.bulk_create_contacts.assert_not_awaited()
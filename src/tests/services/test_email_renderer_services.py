@@ -0,0 +1,58 @@
+from email import message_from_bytes
+from email.policy import default
+import pytest
+from src.services.email_renderer import EmailRenderer, static_segments
+
+
+@pytest.fixture
+def templates(tmp_path):
+    (tmp_path / "plain.html").write_text("<p>Hi {{ username }},</p>\n<a href=\"{{host}}x\">go</a>\n")
+    (tmp_path / "loop.html").write_text("{% for item in items %}<li>{{ item }}</li>{% endfor %}")
+    return tmp_path
+
+
+@pytest.fixture
+def renderer(templates):
+    return EmailRenderer(
+        templates,
+        {"plain": "Вітаємо", "loop": "List"},
+        "Contacts App",
+        "noreply@example.com",
+    )
+
+
+def test_static_segments_match_jinja(renderer):
+    """Тест: рендер за статичними частинами збігається з рендером Jinja"""
+    context = {"username": "<b>Bob</b> & co", "host": "http://localhost/"}
+    compiled = renderer._compiled["plain"]
+
+    assert compiled.segments is not None
+    assert compiled.render_html(context) == compiled.template.render(**context)
+    assert "&lt;b&gt;Bob&lt;/b&gt; &amp; co" in renderer.render_html("plain", context)
+
+
+def test_templates_with_logic_fall_back_to_jinja(renderer):
+    """Тест: шаблон з блоками керування рендериться через Jinja"""
+    assert static_segments(renderer.env, "{% if x %}{{ x }}{% endif %}") is None
+    assert renderer._compiled["loop"].segments is None
+    assert renderer.render_html("loop", {"items": [1, 2]}) == "<li>1</li><li>2</li>"
+
+
+def test_render_builds_mime_message(renderer):
+    """Тест: повний лист у форматі MIME з кешованими заголовками"""
+    raw = renderer.render("plain", "user@example.com", {"username": "Bob", "host": "h/"})
+    message = message_from_bytes(raw, policy=default)
+
+    assert message["To"] == "user@example.com"
+    assert message["From"] == "Contacts App <noreply@example.com>"
+    assert message["Subject"] == "Вітаємо"
+    assert message["Message-ID"].endswith("@example.com>")
+    assert message.get_content_type() == "text/html"
+    assert "Hi Bob" in message.get_content()
+    assert b"\n" not in raw.replace(b"\r\n", b"")
+
+
+def test_render_rejects_header_injection(renderer):
+    """Тест: адреса з переведенням рядка не потрапляє в заголовки"""
+    with pytest.raises(ValueError):
+        renderer.render("plain", "user@example.com\r\nBcc: x@example.com", {})
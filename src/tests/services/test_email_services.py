@@ -1,27 +1,230 @@
+import json
+import socket
+from email import message_from_bytes
+from email.policy import default
+from datetime import timedelta
+from unittest.mock import patch
 import pytest
-from unittest.mock import AsyncMock, patch, MagicMock
-from src.services.email import send_email
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.database.models import EmailOutbox, EmailStatus
+from src.repository.email_outbox import EmailOutboxRepository, utcnow
+from src.services.email import (
+    OutboxWorker,
+    SMTPPool,
+    queue_password_reset_email,
+    queue_verification_email,
+    render_email,
+)
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(EmailOutbox.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Inbox:
+    """Обробник aiosmtpd, що зберігає отримані листи або відхиляє їх"""
+
+    def __init__(self, reply="250 OK"):
+        self.reply = reply
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reply.startswith("250"):
+            self.messages.append(envelope)
+        return self.reply
+
+
+@pytest.fixture
+def smtp_server():
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    inbox = Inbox()
+    controller = controller_module.Controller(inbox, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller, inbox
+    controller.stop()
+
+
+def make_worker(session_factory, port, pool_size=2, **options):
+    options = {
+        "batch_size": 50,
+        "lease_seconds": 60,
+        "max_attempts": 3,
+        "retry_base": 5,
+        "retry_max": 60,
+        **options,
+    }
+    pool = SMTPPool(pool_size, "127.0.0.1", port, timeout=2)
+    return OutboxWorker(session_factory, pool, **options)
+
+
+async def outbox_rows(session_factory):
+    async with session_factory() as session:
+        return (await session.execute(select(EmailOutbox).order_by(EmailOutbox.id))).scalars().all()
 
 
 @pytest.mark.asyncio
-@patch("src.services.email.FastMail")
-@patch("src.services.email.create_email_token", return_value="fake-token")
-async def test_send_email_success(mock_token, mock_fastmail):
+async def test_queue_email_joins_caller_transaction(session_factory):
+    """
+    Тестує, що лист з commit=False фіксується лише разом з транзакцією викликача
+    """
+    async with session_factory() as session:
+        await queue_verification_email(
+            session, "lost@example.com", "lost", "http://localhost:8000/", commit=False
+        )
+        await session.rollback()
+    assert await outbox_rows(session_factory) == []
+
+    async with session_factory() as session:
+        await queue_verification_email(
+            session, "kept@example.com", "kept", "http://localhost:8000/", commit=False
+        )
+        assert await outbox_rows(session_factory) == []
+        await session.commit()
+    assert [row.recipient for row in await outbox_rows(session_factory)] == [
+        "kept@example.com"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_queue_emails_store_no_tokens(session_factory):
     """
-    Тестує успішну відправку електронного листа.
+    Тестує постановку листів у чергу: зберігаються лише дані для шаблону,
+    токени створюються під час відправлення
     """
-    # Arrange
-    mock_instance = MagicMock()
-    mock_instance.send_message = AsyncMock()  
-    mock_fastmail.return_value = mock_instance
+    async with session_factory() as session:
+        await queue_verification_email(
+            session, "test@example.com", "testuser", "http://localhost:8000/"
+        )
+        await queue_password_reset_email(session, "test@example.com", "http://localhost:8000/")
 
-    # Act
-    await send_email(
-        email="test@example.com", username="testuser", host="http://localhost:8000"
+    verify, reset = await outbox_rows(session_factory)
+    assert verify.template == "verify_email"
+    assert json.loads(verify.payload) == {
+        "username": "testuser",
+        "host": "http://localhost:8000/",
+    }
+    assert reset.template == "reset_password"
+    assert verify.status == EmailStatus.PENDING.value
+    assert verify.next_attempt_at <= utcnow()
+
+
+@patch("src.services.email.create_email_token", return_value="fake-token")
+def test_render_verification_email(mock_token):
+    """
+    Тестує формування листа для підтвердження електронної пошти
+    """
+    entry = EmailOutbox(
+        template="verify_email",
+        recipient="test@example.com",
+        payload=json.dumps({"username": "testuser", "host": "http://localhost:8000/"}),
     )
 
-    # Assert
+    message = message_from_bytes(render_email(entry), policy=default)
+
     mock_token.assert_called_once_with("test@example.com")
-    mock_instance.send_message.assert_awaited_once()
-    args, kwargs = mock_instance.send_message.call_args
-    assert kwargs["template_name"] == "verify_email.html"
+    assert message["To"] == "test@example.com"
+    assert message["Subject"] == "Confirm your email"
+    body = message.get_content()
+    assert "Hi testuser" in body
+    assert "http://localhost:8000/api/auth/confirmed_email/fake-token" in body
+
+
+@pytest.mark.asyncio
+async def test_worker_sends_batch_over_pooled_connections(session_factory, smtp_server):
+    """
+    Тестує відправлення партії: листи йдуть через кілька постійних з'єднань
+    """
+    controller, inbox = smtp_server
+    async with session_factory() as session:
+        for i in range(10):
+            await EmailOutboxRepository(session).enqueue(
+                "reset_password", f"user{i}@example.com", {"host": "http://test/"}
+            )
+    worker = make_worker(session_factory, controller.port)
+
+    assert await worker.run_once() == 10
+    await worker.pool.close()
+
+    assert len(inbox.messages) == 10
+    assert worker.pool.metrics.get("connects") <= 2
+    assert worker.metrics.get("sent") == 10
+    assert all(row.status == EmailStatus.SENT.value for row in await outbox_rows(session_factory))
+    assert await worker.run_once() == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_retries_with_backoff(session_factory):
+    """
+    Тестує повторні спроби: недоступний сервер відкладає лист, а після
+    вичерпання спроб лист позначається як невдалий
+    """
+    async with session_factory() as session:
+        await EmailOutboxRepository(session).enqueue(
+            "reset_password", "user@example.com", {"host": "http://test/"}
+        )
+    worker = make_worker(session_factory, free_port(), max_attempts=2)
+
+    assert await worker.run_once() == 1
+    (row,) = await outbox_rows(session_factory)
+    assert row.status == EmailStatus.PENDING.value
+    assert row.attempts == 1
+    assert row.next_attempt_at >= utcnow() + timedelta(seconds=2)
+    assert row.last_error
+
+    # Лист ще не готовий до повтору
+    assert await worker.run_once() == 0
+
+    async with session_factory() as session:
+        entry = await session.get(EmailOutbox, row.id)
+        entry.next_attempt_at = utcnow()
+        await session.commit()
+    assert await worker.run_once() == 1
+    (row,) = await outbox_rows(session_factory)
+    assert row.status == EmailStatus.FAILED.value
+    assert worker.metrics.get("retried") == 1
+    assert worker.metrics.get("failed") == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_does_not_retry_permanent_rejection(session_factory, smtp_server):
+    """
+    Тестує постійну відмову сервера (5xx): лист не повторюється
+    """
+    controller, inbox = smtp_server
+    inbox.reply = "550 Mailbox unavailable"
+    async with session_factory() as session:
+        await EmailOutboxRepository(session).enqueue(
+            "reset_password", "user@example.com", {"host": "http://test/"}
+        )
+    worker = make_worker(session_factory, controller.port)
+
+    await worker.run_once()
+    await worker.pool.close()
+
+    (row,) = await outbox_rows(session_factory)
+    assert row.status == EmailStatus.FAILED.value
+    assert row.last_error.startswith("550")
+
+
+def test_retry_delay_grows_and_is_capped():
+    """
+    Тестує експоненційну затримку повторів з обмеженням зверху
+    """
+    worker = make_worker(None, 25, retry_base=5, retry_max=60)
+
+    assert 2.5 <= worker.retry_delay(1) <= 5
+    assert 10 <= worker.retry_delay(3) <= 20
+    assert 30 <= worker.retry_delay(10) <= 60
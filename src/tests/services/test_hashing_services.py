@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import pytest
+from src.services import hashing
+from src.services.hashing import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_runs_off_event_loop(monkeypatch):
+    """Тест: bcrypt виконується не в потоці циклу подій"""
+    threads = []
+
+    def fake_hash(password):
+        threads.append(threading.current_thread())
+        return f"hashed:{password}"
+
+    monkeypatch.setattr(hashing, "hash_password", fake_hash)
+    hasher = PasswordHasher("thread", workers=2, max_queued=10)
+
+    assert await hasher.hash("secret") == "hashed:secret"
+    assert threads[0] is not threading.current_thread()
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_caps_concurrency(monkeypatch):
+    """Тест: одночасно виконується не більше workers обчислень, решта в черзі"""
+    release = threading.Event()
+    running = []
+
+    def slow_verify(plain, hashed):
+        running.append(plain)
+        release.wait(timeout=5)
+        return True
+
+    monkeypatch.setattr(hashing, "verify_password", slow_verify)
+    hasher = PasswordHasher("thread", workers=2, max_queued=10)
+
+    tasks = [asyncio.create_task(hasher.verify(str(i), "h")) for i in range(5)]
+    while len(running) < 2:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+
+    stats = hasher.stats()
+    assert len(running) == 2
+    assert stats["running"] == 2
+    assert stats["queued"] == 3
+
+    release.set()
+    assert await asyncio.gather(*tasks) == [True] * 5
+    stats = hasher.stats()
+    assert stats["queued"] == 0
+    assert stats["peak_queued"] == 3
+    assert stats["duration"]["count"] == 5
+    assert stats["queue_wait"]["count"] == 5
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_queue_full(monkeypatch):
+    """Тест: понад max_queued очікувань нові обчислення відхиляються одразу"""
+    release = threading.Event()
+    monkeypatch.setattr(
+        hashing, "verify_password", lambda plain, hashed: release.wait(timeout=5)
+    )
+    hasher = PasswordHasher("thread", workers=1, max_queued=2)
+
+    tasks = [asyncio.create_task(hasher.verify(str(i), "h")) for i in range(3)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(PasswordHasherBusy):
+        await hasher.verify("extra", "h")
+    assert hasher.stats()["rejected"] == 1
+
+    release.set()
+    assert await asyncio.gather(*tasks) == [True] * 3
+    hasher.shutdown()
+
+
+def test_password_hasher_rejects_unknown_executor():
+    """Тест: невідомий тип пулу"""
+    with pytest.raises(ValueError):
+        PasswordHasher("fiber", workers=1, max_queued=1)
@@ -0,0 +1,211 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from src.services.jobs import Job, JobQueue, JobQueueFull, MemoryBackend, RedisBackend
+
+
+def make_queue(workers=2, maxsize=10, max_attempts=3, backend=None):
+    return JobQueue(
+        backend or MemoryBackend(maxsize),
+        workers=workers,
+        max_attempts=max_attempts,
+        retry_base=0.01,
+        status_ttl=60,
+    )
+
+
+async def wait_for_status(queue, job_id, expected, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        status = await queue.status(job_id)
+        if status and status["status"] == expected:
+            return status
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Задача не перейшла в стан {expected}: {status}")
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_with_bounded_concurrency():
+    """Тест: одночасно виконується не більше задач, ніж обробників"""
+    queue = make_queue(workers=2)
+    running, peak = 0, 0
+
+    @queue.job("sleep")
+    async def sleep(seconds):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(seconds)
+        running -= 1
+
+    await queue.start()
+    ids = [await queue.enqueue("sleep", seconds=0.02) for _ in range(6)]
+    for job_id in ids:
+        await wait_for_status(queue, job_id, "succeeded")
+    await queue.stop()
+
+    assert peak == 2
+    assert queue.metrics.get("succeeded") == 6
+    assert queue.wait_time.snapshot()["count"] == 6
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_jobs():
+    """Тест: переповнена черга відхиляє нові задачі"""
+    queue = make_queue(maxsize=2)
+    queue.handlers["noop"] = AsyncMock()
+
+    await queue.enqueue("noop")
+    await queue.enqueue("noop")
+    with pytest.raises(JobQueueFull):
+        await queue.enqueue("noop")
+
+    assert queue.metrics.get("rejected") == 1
+    assert (await queue.stats())["depth"] == 2
+
+
+@pytest.mark.asyncio
+async def test_duplicate_key_is_not_enqueued():
+    """Тест: поки задача з ключем чекає в черзі, така сама не додається"""
+    queue = make_queue()
+    queue.handlers["noop"] = AsyncMock()
+
+    assert await queue.enqueue("noop", key="k") is not None
+    assert await queue.enqueue("noop", key="k") is None
+    assert queue.metrics.get("duplicates") == 1
+
+    await queue.start()
+    await asyncio.sleep(0.05)
+    assert await queue.enqueue("noop", key="k") is not None
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_key_is_held_while_job_runs():
+    """Тест: поки задача з ключем виконується, така сама не додається"""
+    queue = make_queue()
+    release = asyncio.Event()
+    started = asyncio.Event()
+
+    @queue.job("drain")
+    async def drain():
+        started.set()
+        await release.wait()
+
+    await queue.start()
+    job_id = await queue.enqueue("drain", key="drain")
+    await started.wait()
+    assert await queue.enqueue("drain", key="drain") is None
+
+    release.set()
+    await wait_for_status(queue, job_id, "succeeded")
+    assert await queue.enqueue("drain", key="drain") is not None
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_dropped_retry_is_marked_failed():
+    """Тест: повтор, що не вмістився в переповнену чергу, позначається невдалим"""
+    backend = MemoryBackend(maxsize=1)
+    queue = make_queue(backend=backend)
+    queue.handlers.update(
+        flaky=AsyncMock(side_effect=RuntimeError("boom")), noop=AsyncMock()
+    )
+
+    job_id = await queue.enqueue("flaky", key="flaky")
+    await queue.run_job(await backend.pop())
+    assert (await queue.status(job_id))["status"] == "retrying"
+    await queue.enqueue("noop")
+
+    status = await wait_for_status(queue, job_id, "failed")
+
+    assert status["error"] == "queue full"
+    assert queue.metrics.get("rejected") == 1
+    assert await backend.depth() == 1
+    assert "flaky" not in backend._keys
+    backend.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_marked_failed():
+    """Тест: невдала задача повторюється, а після max_attempts — невдала"""
+    queue = make_queue(max_attempts=2)
+    flaky = AsyncMock(side_effect=[RuntimeError("boom"), None])
+    broken = AsyncMock(side_effect=RuntimeError("always"))
+    queue.handlers.update(flaky=flaky, broken=broken)
+
+    await queue.start()
+    flaky_id = await queue.enqueue("flaky")
+    broken_id = await queue.enqueue("broken")
+    flaky_status = await wait_for_status(queue, flaky_id, "succeeded")
+    broken_status = await wait_for_status(queue, broken_id, "failed")
+    await queue.stop()
+
+    assert flaky_status["attempts"] == 2
+    assert broken.await_count == 2
+    assert "always" in broken_status["error"]
+    assert queue.metrics.get("retried") == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_job_is_rejected():
+    """Тест: незареєстровану задачу поставити в чергу неможливо"""
+    with pytest.raises(ValueError):
+        await make_queue().enqueue("missing")
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_push():
+    """Тест: задача додається скриптом з ключем унікальності та лімітом черги"""
+    backend = RedisBackend(maxsize=5, visibility_timeout=30, poll_interval=0.1)
+    script = AsyncMock(return_value=1)
+    backend.redis = MagicMock()
+    backend.redis.register_script.return_value = script
+    job = Job("send", {"to": "a"}, key="send:a")
+
+    assert await backend.push(job) is True
+    kwargs = script.await_args.kwargs
+    assert kwargs["keys"] == ["jobs:pending", "jobs:key:send:a"]
+    assert kwargs["args"][1:] == [5, 30]
+    assert Job.loads(kwargs["args"][0]).kwargs == {"to": "a"}
+
+    script.return_value = -1
+    with pytest.raises(JobQueueFull):
+        await backend.push(job)
+    backend.redis.register_script.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_releases_key_on_ack():
+    """Тест: ключ унікальності знімається після завершення задачі, а не під час вибору"""
+    backend = RedisBackend(maxsize=5, visibility_timeout=30, poll_interval=0.1)
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    backend.redis = MagicMock()
+    backend.redis.pipeline.return_value = pipe
+    job = Job.loads(Job("send", key="send:a").dumps())
+
+    await backend.retry(job, 10)
+    pipe.delete.assert_not_called()
+    pipe.expire.assert_called_once_with("jobs:key:send:a", 40)
+
+    await backend.ack(job)
+    pipe.zrem.assert_called_with("jobs:processing", job.payload)
+    pipe.delete.assert_called_once_with("jobs:key:send:a")
+
+
+@pytest.mark.asyncio
+async def test_outbox_drain_is_scheduled_once():
+    """Тест: нові листи ставлять у чергу одну задачу відправлення"""
+    from src.services import email
+
+    queue = make_queue()
+    queue.handlers[email.DRAIN_OUTBOX_JOB] = AsyncMock()
+    with patch.object(email, "job_queue", queue), patch.object(
+        email.settings, "EMAIL_OUTBOX_WORKER", True
+    ):
+        await email.schedule_outbox_drain()
+        await email.schedule_outbox_drain()
+
+    assert queue.metrics.get("enqueued") == 1
+    assert queue.metrics.get("duplicates") == 1
@@ -0,0 +1,140 @@
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError as RedisConnectionError
+from src.services.rate_limit import RateLimiter, RatePolicy, rate_limit, rate_limiter
+
+
+@pytest.fixture
+def script():
+    return AsyncMock(return_value=[1, 0])
+
+
+@pytest.fixture
+def limiter(script):
+    limiter = RateLimiter(
+        {"small": "5/minute", "large": "1000/minute"},
+        lease_seconds=60,
+        lease_divisor=20,
+    )
+    limiter.redis = MagicMock()
+    limiter.redis.register_script.return_value = script
+    return limiter
+
+
+def test_policy_parse():
+    """Тест: розбір ліміту з налаштувань і розмір пакета дозволів"""
+    policy = RatePolicy.parse("login", "100/minute", lease_divisor=20)
+
+    assert policy.limit == 100
+    assert policy.window == 60
+    assert policy.lease_size == 5
+    assert RatePolicy.parse("me", "10/minute", lease_divisor=20).lease_size == 1
+
+    with pytest.raises(ValueError):
+        RatePolicy.parse("bad", "10/fortnight", lease_divisor=20)
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_script_arguments(limiter, script):
+    """Тест: ключі поточного й попереднього вікна та аргументи скрипта"""
+    assert await limiter.hit("small", "1.2.3.4") == (True, 0.0)
+
+    kwargs = script.await_args.kwargs
+    current, previous, charged = kwargs["keys"]
+    index = int(current.rsplit(":", 1)[1])
+    assert current.startswith("rl:{small:1.2.3.4}:")
+    assert previous == f"rl:{{small:1.2.3.4}}:{index - 1}"
+    assert charged == current
+    assert kwargs["args"][:2] == [5, 60000]
+    assert kwargs["args"][3:] == [1, 0]
+
+
+@pytest.mark.asyncio
+async def test_lease_serves_requests_locally(limiter, script):
+    """Тест: пакет дозволів витрачається без звернень до Redis"""
+    script.return_value = [50, 0]
+
+    results = [await limiter.hit("large", "1.2.3.4") for _ in range(50)]
+
+    assert all(allowed for allowed, _ in results)
+    script.assert_awaited_once()
+    assert limiter.metrics.get("allowed_redis") == 1
+    assert limiter.metrics.get("allowed_local") == 49
+
+    await limiter.hit("large", "1.2.3.4")
+    assert script.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_returns_unused_permits(limiter, script):
+    """Тест: залишок простроченого пакета повертається у вікно, з якого видано"""
+    script.return_value = [50, 0]
+    for _ in range(3):
+        await limiter.hit("large", "1.2.3.4")
+    granted_from = script.await_args.kwargs["keys"][0]
+    limiter._leases.get(("large", "1.2.3.4"))[2] = 0.0  # пакет сплив
+
+    await limiter.hit("large", "1.2.3.4")
+
+    assert script.await_count == 2
+    kwargs = script.await_args.kwargs
+    assert kwargs["keys"][2] == granted_from
+    assert kwargs["args"][4] == 47
+    assert limiter.metrics.get("returned") == 47
+
+
+def test_lease_lifetime_is_short_relative_to_window():
+    """Тест: пакет живе не довше за window / lease_divisor"""
+    assert RatePolicy.parse("s", "100/second", lease_divisor=20).lease_seconds == 0.05
+    assert RatePolicy.parse("m", "1000/minute", lease_divisor=20).lease_seconds == 3
+
+
+@pytest.mark.asyncio
+async def test_denial_is_cached_locally(limiter, script):
+    """Тест: після відмови повторні запити відхиляються без Redis"""
+    script.return_value = [0, 30000]
+
+    assert await limiter.hit("small", "1.2.3.4") == (False, 30.0)
+    assert await limiter.hit("small", "1.2.3.4") == (False, 30.0)
+
+    script.assert_awaited_once()
+    assert limiter.metrics.get("denied") == 2
+    assert (await limiter.hit("small", "5.6.7.8"))[0] is False
+    assert script.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_policy_is_not_limited(limiter, script):
+    """Тест: маршрут без політики не обмежується"""
+    assert await limiter.hit("missing", "1.2.3.4") == (True, 0.0)
+    script.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_fails_open_when_redis_is_down(limiter, script):
+    """Тест: якщо Redis недоступний, запити пропускаються без повторних спроб"""
+    script.side_effect = RedisConnectionError("down")
+
+    assert await limiter.hit("small", "1.2.3.4") == (True, 0.0)
+    assert await limiter.hit("small", "1.2.3.4") == (True, 0.0)
+
+    script.assert_awaited_once()
+    assert limiter.metrics.get("redis_errors") == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_dependency_raises_429(mock_rate_limit_redis):
+    """Тест: залежність повертає 429 з заголовком Retry-After"""
+    mock_rate_limit_redis.register_script.side_effect = lambda _: AsyncMock(
+        return_value=[0, 12500]
+    )
+    rate_limiter.clear()
+    request = MagicMock()
+    request.client.host = "1.2.3.4"
+
+    with pytest.raises(HTTPException) as exc_info:
+        await rate_limit("auth.login")(request)
+
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers == {"Retry-After": "13"}
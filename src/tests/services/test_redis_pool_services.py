@@ -0,0 +1,40 @@
+import pytest
+from src.database import redis as redis_db
+
+
+@pytest.mark.asyncio
+async def test_redis_clients_share_pool(monkeypatch):
+    """Тест: клієнти Redis використовують один спільний пул"""
+    monkeypatch.setattr(redis_db, "redis_pool", None)
+    monkeypatch.setattr(redis_db, "redis_client", None)
+    await redis_db.init_redis()
+    pool = redis_db.redis_pool
+
+    first = redis_db.get_redis()
+    second = redis_db.get_redis()
+
+    assert first is second
+    assert first.connection_pool is pool
+    assert pool.max_connections == redis_db.settings.REDIS_MAX_CONNECTIONS
+
+    await redis_db.close_redis()
+    assert redis_db.redis_pool is None
+    assert redis_db.get_redis_pool_stats() == {"pool": None}
+
+
+@pytest.mark.asyncio
+async def test_redis_pool_stats_counts_connections(monkeypatch):
+    """Тест: статистика рахує зайняті та вільні з'єднання"""
+    monkeypatch.setattr(redis_db, "redis_pool", None)
+    await redis_db.init_redis()
+    pool = redis_db.redis_pool
+    monkeypatch.setattr(pool, "_in_use_connections", {object(), object()})
+    pool._available_connections[:] = [object()]
+
+    stats = redis_db.get_redis_pool_stats()
+
+    assert stats["in_use"] == 2
+    assert stats["idle"] == 1
+    pool._available_connections[:] = []
+    monkeypatch.setattr(pool, "_in_use_connections", set())
+    await redis_db.close_redis()
@@ -0,0 +1,84 @@
+import time
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from src.services.revocation import BloomFilter, RevocationStore
+
+
+@pytest.fixture
+def redis():
+    mock = MagicMock()
+    mock.exists = AsyncMock(return_value=1)
+    mock.pipeline.return_value.execute = AsyncMock(return_value=[0, []])
+    return mock
+
+
+@pytest.fixture
+def store(redis):
+    store = RevocationStore(capacity=1000, error_rate=0.001, sync_interval=60)
+    store.redis = redis
+    return store
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Тест: доданий елемент завжди знаходиться, хибних збігів мало"""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.asyncio
+async def test_not_revoked_check_skips_redis(store, redis):
+    """Тест: перевірка невідкликаного токена не звертається до Redis"""
+    assert not await store.is_revoked("fresh")
+    assert not await store.is_revoked(None)
+    redis.exists.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_revoke_writes_key_and_index(store, redis):
+    """Тест: відкликання записує ключ з TTL і індекс за exp"""
+    exp = time.time() + 100
+
+    await store.revoke("gone", exp)
+
+    pipe = redis.pipeline.return_value
+    key, value = pipe.set.call_args.args
+    assert key == "revoked:jti:gone"
+    assert 99 <= pipe.set.call_args.kwargs["ex"] <= 101
+    pipe.zadd.assert_called_once_with("revoked:jti", {"gone": exp})
+    assert await store.is_revoked("gone")
+    redis.exists.assert_awaited_once_with("revoked:jti:gone")
+
+
+@pytest.mark.asyncio
+async def test_expired_token_is_not_stored(store, redis):
+    """Тест: прострочений токен відкликати не потрібно"""
+    await store.revoke("old", time.time() - 1)
+
+    redis.pipeline.return_value.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_sync_loads_revocations_from_other_workers(store, redis):
+    """Тест: синхронізація додає у фільтр jti, відкликані іншими процесами"""
+    redis.pipeline.return_value.execute = AsyncMock(return_value=[1, ["remote"]])
+
+    await store.sync()
+
+    assert await store.is_revoked("remote")
+    assert store.stats()["filter_items"] == 1
+
+
+@pytest.mark.asyncio
+async def test_filter_hit_fails_closed_without_redis(store, redis):
+    """Тест: якщо Redis недоступний, токен з фільтра вважається відкликаним"""
+    await store.revoke("gone", time.time() + 100)
+    redis.exists = AsyncMock(side_effect=RedisConnectionError())
+
+    assert await store.is_revoked("gone")
+    assert store.stats()["redis_errors"] == 1
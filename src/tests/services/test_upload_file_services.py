@@ -1,6 +1,22 @@
+import io
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
-from src.services.upload_file import UploadFileService
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+from src.services.upload_file import (
+    AvatarProcessor,
+    BodySizeLimitMiddleware,
+    UploadFileService,
+    resize_avatar,
+    sniff_image_type,
+)
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+def make_upload(content: bytes, size=None) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename="avatar.png", size=size)
 
 
 @pytest.mark.asyncio
@@ -17,16 +33,211 @@ async def test_upload_file_success(mock_upload, mock_cloud_image):
     )
     mock_cloud_image.return_value = mock_cloud_image_instance
 
-    mock_file = AsyncMock()
-    mock_file.read.return_value = b"fake image data"
+    upload = make_upload(PNG_BYTES)
 
-    service = UploadFileService("demo_cloud", "demo_key", "demo_secret")
+    processor = AvatarProcessor(250, "webp", 85, 1, 10_000_000)
+    processor.process = AsyncMock(return_value=b"small avatar")
+    service = UploadFileService(
+        "demo_cloud", "demo_key", "demo_secret", chunk_size=16, processor=processor
+    )
 
     # Act
-    result = await service.upload_file(mock_file, "testuser")
+    result, content_hash = await service.upload_file(upload, "testuser")
 
     # Assert
-    mock_file.read.assert_awaited_once()
     mock_upload.assert_called_once()
+    handle = processor.process.await_args.args[0]
+    assert handle is upload.file
+    assert handle.tell() == 0
     mock_cloud_image_instance.build_url.assert_called_once()
     assert result == "http://res.cloudinary.com/avatar.jpg"
+    assert len(content_hash) == 64
+
+
+@pytest.mark.asyncio
+@patch("src.services.upload_file.cloudinary.CloudinaryImage")
+@patch("src.services.upload_file.cloudinary.uploader.upload")
+async def test_upload_file_sends_processed_avatar(mock_upload, mock_cloud_image):
+    mock_upload.return_value = {"version": "1"}
+    processor = AvatarProcessor(250, "webp", 85, 1, 10_000_000)
+    processor.process = AsyncMock(return_value=b"small avatar")
+    service = UploadFileService(
+        "demo_cloud", "demo_key", "demo_secret", processor=processor
+    )
+
+    await service.upload_file(make_upload(PNG_BYTES), "testuser")
+
+    assert mock_upload.call_args.args[0].getvalue() == b"small avatar"
+
+
+@pytest.mark.asyncio
+@patch("src.services.upload_file.cloudinary.CloudinaryImage")
+@patch("src.services.upload_file.cloudinary.uploader.upload")
+async def test_upload_file_skips_same_avatar(mock_upload, mock_cloud_image):
+    mock_upload.return_value = {"version": "1"}
+    processor = AvatarProcessor(250, "webp", 85, 1, 10_000_000)
+    processor.process = AsyncMock(return_value=b"small avatar")
+    service = UploadFileService(
+        "demo_cloud", "demo_key", "demo_secret", processor=processor
+    )
+
+    _, first_hash = await service.upload_file(make_upload(PNG_BYTES), "testuser")
+    url, second_hash = await service.upload_file(
+        make_upload(PNG_BYTES), "testuser", first_hash
+    )
+
+    assert url is None
+    assert second_hash == first_hash
+    mock_upload.assert_called_once()
+    processor.process.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_content_hash_depends_on_processing_settings():
+    webp = UploadFileService(
+        "demo_cloud", "demo_key", "demo_secret",
+        processor=AvatarProcessor(250, "webp", 85, 1, 10_000_000),
+    )
+    jpeg = UploadFileService(
+        "demo_cloud", "demo_key", "demo_secret",
+        processor=AvatarProcessor(250, "jpeg", 85, 1, 10_000_000),
+    )
+
+    _, _, webp_hash = await webp.read_upload(make_upload(PNG_BYTES))
+    _, _, jpeg_hash = await jpeg.read_upload(make_upload(PNG_BYTES))
+
+    assert webp_hash != jpeg_hash
+
+
+@pytest.mark.parametrize("fmt", ["webp", "jpeg"])
+def test_resize_avatar(fmt):
+    source = io.BytesIO()
+    Image.new("RGBA", (800, 400), (255, 0, 0, 128)).save(source, format="PNG")
+    source.seek(0)
+
+    avatar = resize_avatar(source, 250, fmt, 85, 10_000_000)
+
+    with Image.open(io.BytesIO(avatar)) as image:
+        assert image.size == (250, 250)
+        assert image.format == fmt.upper()
+
+
+@pytest.mark.asyncio
+async def test_processor_rejects_broken_image():
+    processor = AvatarProcessor(250, "webp", 85, 1, 10_000_000)
+
+    with pytest.raises(HTTPException) as exc:
+        await processor.process(io.BytesIO(PNG_BYTES))
+
+    assert exc.value.status_code == 415
+    processor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_processor_rejects_too_many_pixels():
+    processor = AvatarProcessor(250, "webp", 85, 1, 10_000)
+    source = io.BytesIO()
+    Image.new("L", (200, 100)).save(source, format="PNG")
+    source.seek(0)
+
+    with patch("src.services.upload_file.ImageOps.fit") as fit:
+        with pytest.raises(HTTPException) as exc:
+            await processor.process(source)
+
+    assert exc.value.status_code == 413
+    fit.assert_not_called()
+    processor.shutdown()
+
+
+@pytest.mark.asyncio
+@patch("src.services.upload_file.cloudinary.uploader.upload")
+async def test_upload_file_too_large(mock_upload):
+    service = UploadFileService(
+        "demo_cloud", "demo_key", "demo_secret", max_bytes=64, chunk_size=16
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        await service.upload_file(make_upload(PNG_BYTES), "testuser")
+
+    assert exc.value.status_code == 413
+    mock_upload.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_read_upload_rejects_declared_size():
+    service = UploadFileService("demo_cloud", "demo_key", "demo_secret", max_bytes=64)
+    upload = make_upload(PNG_BYTES, size=10_000)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.read_upload(upload)
+
+    assert exc.value.status_code == 413
+    assert upload.file.tell() == 0
+
+
+@pytest.mark.asyncio
+@patch("src.services.upload_file.cloudinary.uploader.upload")
+async def test_upload_file_not_image(mock_upload):
+    service = UploadFileService("demo_cloud", "demo_key", "demo_secret")
+
+    with pytest.raises(HTTPException) as exc:
+        await service.upload_file(make_upload(b"<svg></svg>"), "testuser")
+
+    assert exc.value.status_code == 415
+    mock_upload.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (b"\xff\xd8\xff\xe0rest", "image/jpeg"),
+        (PNG_BYTES[:12], "image/png"),
+        (b"GIF89a", "image/gif"),
+        (b"RIFF\x00\x00\x00\x00WEBP", "image/webp"),
+        (b"RIFF\x00\x00\x00\x00WAVE", None),
+        (b"", None),
+    ],
+)
+def test_sniff_image_type(head, expected):
+    assert sniff_image_type(head) == expected
+
+
+def make_limited_app(limit: int):
+    app = FastAPI()
+    handler = MagicMock()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File()):
+        handler()
+        return {"size": file.size}
+
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/upload": limit})
+    return app, handler
+
+
+def test_body_limit_rejects_content_length_before_parsing():
+    app, handler = make_limited_app(1024)
+    client = TestClient(app)
+
+    response = client.post("/upload", files={"file": ("a.png", b"x" * 4096)})
+    assert response.status_code == 413
+    handler.assert_not_called()
+
+    response = client.post("/upload", files={"file": ("a.png", b"x" * 100)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+
+def test_body_limit_stops_chunked_body():
+    app, handler = make_limited_app(1024)
+    client = TestClient(app)
+    body = (b"x" * 512 for _ in range(8))
+
+    response = client.post(
+        "/upload",
+        content=body,
+        headers={"Content-Type": "multipart/form-data; boundary=b"},
+    )
+
+    assert response.status_code == 413
+    handler.assert_not_called()
@@ -109,10 +109,10 @@ async def test_update_avatar_url(service, mock_repo):
     """
     Тестує оновлення URL аватара користувача.
     """
-    await service.update_avatar_url("test@example.com", "http://avatar")
+    await service.update_avatar_url("test@example.com", "http://avatar", "f00d")
 
     mock_repo.update_avatar_url.assert_awaited_once_with(
-        "test@example.com", "http://avatar"
+        "test@example.com", "http://avatar", "f00d"
     )
 
 